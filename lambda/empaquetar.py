@@ -0,0 +1,65 @@
+import argparse
+import subprocess
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+# Solo la lógica pura de las tools (las rutas se conservan: rules_engine busca data/criterios)
+COMUNES = [
+    "src/lambda_handlers.py",
+    "src/rules_engine.py",
+    "src/evidence_index.py",
+    "src/tools/__init__.py",
+    "src/tools/risk_tool.py",
+    "src/tools/validate_tool.py",
+    "data/criterios/criterios.json",
+]
+
+FUNCIONES = {
+    "risk-lambda": {"handler": "lambda/risk_lambda/lambda_function.py", "archivos": COMUNES},
+    # Evidencia de PM.2.2.2 precalculada en la ingesta: validate no necesita el índice FAISS
+    "validate-lambda": {
+        "handler": "lambda/validate_lambda/lambda_function.py",
+        "archivos": COMUNES + ["data/faiss_index/evidencia.json"]
+    },
+}
+
+def empaquetar(nombre: str, destino: Path, dependencias: bool = True) -> Path:
+    """Zip de despliegue: handler en la raíz, src/ y data/ con las mismas rutas que el repo"""
+    funcion = FUNCIONES[nombre]
+    destino.mkdir(parents=True, exist_ok=True)
+    zip_path = destino / f"{nombre}.zip"
+
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.write(RAIZ / funcion["handler"], "lambda_function.py")
+        for archivo in funcion["archivos"]:
+            zf.write(RAIZ / archivo, archivo)
+
+        if dependencias:
+            with tempfile.TemporaryDirectory() as tmp:
+                subprocess.run(
+                    [sys.executable, "-m", "pip", "install", "-q", "-r", str(RAIZ / "lambda/requirements.txt"),
+                     "-t", tmp, "--platform", "manylinux2014_x86_64", "--only-binary=:all:",
+                     "--python-version", "3.12", "--implementation", "cp"],
+                    check=True
+                )
+                for path in sorted(Path(tmp).rglob("*")):
+                    if path.is_file() and "__pycache__" not in path.parts:
+                        zf.write(path, path.relative_to(tmp).as_posix())
+
+    return zip_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Empaqueta risk-lambda y validate-lambda")
+    parser.add_argument("funciones", nargs="*", default=list(FUNCIONES), help="Por defecto, ambas")
+    parser.add_argument("--destino", default=str(RAIZ / "lambda" / "dist"))
+    parser.add_argument("--sin-dependencias", action="store_true",
+                        help="Sin pydantic (si ya está en una Layer)")
+    args = parser.parse_args()
+
+    for nombre in args.funciones:
+        zip_path = empaquetar(nombre, Path(args.destino), dependencias=not args.sin_dependencias)
+        print(f"📦 {nombre}: {zip_path} ({zip_path.stat().st_size / 1024:.0f} KB)")
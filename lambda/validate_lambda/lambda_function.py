@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# En el paquete src/ va junto a este archivo (lambda/empaquetar.py); en el repositorio, en ../../src
+RAIZ = Path(__file__).resolve().parent
+sys.path.insert(0, str(RAIZ / "src" if (RAIZ / "src").exists() else RAIZ.parent.parent / "src"))
+
+from lambda_handlers import validate_handler as handler
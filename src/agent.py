@@ -1,23 +1,26 @@
-from langchain_openai import ChatOpenAI
 from langchain.agents import AgentExecutor, create_react_agent
 from langchain.prompts import PromptTemplate
+from langchain_core.agents import AgentAction
 from tools.search_tool import SearchMedicalTool
 from tools.risk_tool import RiskStratificationTool
 from tools.validate_tool import ValidateTelecolposcopiaTool
 from tools.template_tool import GenerateTemplateTool
+from answer_cache import SemanticAnswerCache
+from tool_cache import crear_tool_cache
+from router import FastPathRouter
+from backends import crear_llm
+from telemetry import TracingCallbackHandler
+import asyncio
 import os
+from typing import AsyncIterator
 from dotenv import load_dotenv
 
 load_dotenv()
 
 class MedicalAssistantAgent:
-    def __init__(self):
-        # Inicializar LLM
-        self.llm = ChatOpenAI(
-            model="gpt-4o-mini",
-            temperature=0,
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
+    def __init__(self, llm=None):
+        # Inicializar LLM: LLM_BACKEND (openai, servidor local compatible o guionizado)
+        self.llm = llm or crear_llm()
 
         # Inicializar tools
         search_tool_obj = SearchMedicalTool()
@@ -25,12 +28,32 @@ class MedicalAssistantAgent:
         validate_tool_obj = ValidateTelecolposcopiaTool()
         template_tool_obj = GenerateTemplateTool()
 
+        # Caché semántica de respuestas (se invalida al cambiar el índice FAISS)
+        self.vectorstore = search_tool_obj.vectorstore
+        self.answer_cache = SemanticAnswerCache(
+            self.vectorstore.embeddings,
+            umbral=float(os.getenv("ANSWER_CACHE_UMBRAL", 0.95)),
+            ttl=float(os.getenv("ANSWER_CACHE_TTL", 3600)),
+            max_entradas=int(os.getenv("ANSWER_CACHE_MAX_ENTRADAS", 500))
+        )
+
+        # Resultados de tools memoizados por argumentos normalizados (búsqueda ligada a la versión del índice)
+        self.tool_cache = crear_tool_cache(self.vectorstore.index_version)
         self.tools = [
-            search_tool_obj.as_tool(),
-            risk_tool_obj.as_tool(),
-            validate_tool_obj.as_tool(),
-            template_tool_obj.as_tool()
+            self.tool_cache.memoizar(tool)
+            for tool in (
+                search_tool_obj.as_tool(),
+                risk_tool_obj.as_tool(),
+                validate_tool_obj.as_tool(),
+                template_tool_obj.as_tool()
+            )
         ]
+        self.tools_por_nombre = {tool.name: tool for tool in self.tools}
+
+        # Router determinista: consultas estructuradas van directo a la tool
+        self.router = FastPathRouter(
+            confianza_minima=float(os.getenv("ROUTER_CONFIANZA_MIN", 0.9))
+        )
 
         # Prompt ReAct
         self.prompt = PromptTemplate.from_template("""
@@ -78,33 +101,239 @@ Thought: {agent_scratchpad}
             prompt=self.prompt
         )
 
-        # Crear executor
+        # Crear executor (la traza va por callbacks; AGENT_VERBOSE=1 vuelve a imprimir los pasos)
         self.agent_executor = AgentExecutor(
             agent=self.agent,
             tools=self.tools,
-            verbose=True,
+            verbose=os.getenv("AGENT_VERBOSE", "0") == "1",
             handle_parsing_errors=True,
             max_iterations=5,
             return_intermediate_steps=True
         )
 
-    def query(self, question: str) -> dict:
-        """Procesa una consulta y retorna la respuesta"""
+        # Spans por iteración ReAct, llamada al LLM y tool (ver telemetry.py)
+        self.tracer = TracingCallbackHandler()
+        self.config = {"callbacks": [self.tracer]}
+
+        # Ejecución async: coalescing de preguntas en curso + límite de concurrencia
+        self.max_concurrencia = int(os.getenv("AGENT_MAX_CONCURRENCIA", 4))
+        self._limite = None  # asyncio.Semaphore, se crea dentro del event loop
+        self._en_vuelo = {}
+        self.coalesced = 0
+
+    @staticmethod
+    def _formatear_respuesta(tool_name: str, resultado: dict) -> str:
+        """Respuesta en texto para el resultado directo de una tool"""
+        if tool_name == "estratificar_riesgo_cronico":
+            lineas = ["📊 Estratificación de riesgo:"]
+            lineas += [f"- {categoria.capitalize()}: {nivel}" for categoria, nivel in resultado["evaluacion"].items()]
+            lineas.append("\n⚠️ Recomendaciones:")
+            lineas += [f"- {rec}" for rec in resultado["recomendaciones"]]
+        elif tool_name == "validar_criterios_telecolposcopia":
+            estado = "✅ Elegible" if resultado["elegible"] else "❌ No elegible"
+            lineas = [f"{estado} para telecolposcopía."]
+            lineas += [f"- {criterio}" for criterio in resultado["criterios_cumplidos"]]
+            lineas.append(f"Detalles: {resultado['detalles']}")
+        else:
+            lineas = [resultado.get("plantilla") or resultado.get("error", "")]
+        lineas.append(f"\nFuente: Según {resultado.get('fuente', 'N/A')}")
+        return "\n".join(lineas)
+
+    def _fast_path(self, question: str) -> dict:
+        """Ejecuta la tool elegida por el router, sin pasar por el LLM"""
+        ruta = self.router.route(question)
+        if not ruta:
+            return None
+
         try:
-            result = self.agent_executor.invoke({"input": question})
+            tool = self.tools_por_nombre[ruta["tool"]]
+            resultado = tool.invoke(ruta["args"], config=self.config)
+        except Exception as e:
+            print(f"⚠️  Fast-path falló, se usará el agente: {e}")
+            return None
 
-            return {
-                "output": result.get("output", ""),
-                "intermediate_steps": result.get("intermediate_steps", []),
-                "tool_calls": len(result.get("intermediate_steps", []))
-            }
+        accion = AgentAction(tool=ruta["tool"], tool_input=ruta["args"], log="fast-path router")
+        return {
+            "output": self._formatear_respuesta(ruta["tool"], resultado),
+            "intermediate_steps": [(accion, resultado)],
+            "tool_calls": 1,
+            "router": ruta
+        }
 
+    def _buscar_en_cache(self, question: str, version) -> dict:
+        try:
+            cached = self.answer_cache.buscar(question, version)
         except Exception as e:
-            return {
-                "output": f"❌ Error al procesar la consulta: {str(e)}",
-                "tool_calls": 0,
-                "error": str(e)
+            print(f"⚠️  Caché de respuestas no disponible: {e}")
+            return None
+
+        if not cached:
+            return None
+
+        return {
+            **cached["respuesta"],
+            "cache": {
+                "hit": True,
+                "similitud": cached["similitud"],
+                "pregunta_original": cached["pregunta_original"]
             }
+        }
+
+    def _guardar_en_cache(self, question: str, respuesta: dict, version):
+        try:
+            self.answer_cache.guardar(question, respuesta, version)
+        except Exception as e:
+            print(f"⚠️  No se pudo guardar en caché: {e}")
+
+    @staticmethod
+    def _formatear_resultado(result: dict) -> dict:
+        return {
+            "output": result.get("output", ""),
+            "intermediate_steps": result.get("intermediate_steps", []),
+            "tool_calls": len(result.get("intermediate_steps", []))
+        }
+
+    @staticmethod
+    def _formatear_error(e: Exception) -> dict:
+        return {
+            "output": f"❌ Error al procesar la consulta: {str(e)}",
+            "tool_calls": 0,
+            "error": str(e)
+        }
+
+    def query(self, question: str) -> dict:
+        """Procesa una consulta y retorna la respuesta"""
+        respuesta_directa = self._fast_path(question)
+        if respuesta_directa:
+            return respuesta_directa
+
+        version = self.vectorstore.index_version()
+        cached = self._buscar_en_cache(question, version)
+        if cached:
+            return cached
+
+        try:
+            result = self.agent_executor.invoke({"input": question}, config=self.config)
+            respuesta = self._formatear_resultado(result)
+        except Exception as e:
+            return self._formatear_error(e)
+
+        self._guardar_en_cache(question, respuesta, version)
+        return respuesta
+
+    async def aquery(self, question: str) -> dict:
+        """Versión async de query.
+
+        Preguntas idénticas en curso comparten una sola ejecución y el número
+        de ejecuciones simultáneas del agente está limitado por un semáforo.
+        """
+        respuesta_directa = self._fast_path(question)
+        if respuesta_directa:
+            return respuesta_directa
+
+        clave = " ".join(question.lower().split())
+        tarea = self._en_vuelo.get(clave)
+        if tarea is None:
+            tarea = asyncio.ensure_future(self._aquery_agente(question))
+            self._en_vuelo[clave] = tarea
+            tarea.add_done_callback(lambda _: self._en_vuelo.pop(clave, None))
+        else:
+            self.coalesced += 1
+
+        # shield: si un cliente cancela, la ejecución compartida sigue para el resto
+        return await asyncio.shield(tarea)
+
+    async def astream(self, question: str) -> AsyncIterator[dict]:
+        """Emite los pasos del agente a medida que ocurren.
+
+        Eventos (campo "tipo"):
+        - pensamiento: tokens del LLM antes de "Final Answer:"
+        - accion / observacion: llamada a una tool y su resultado
+        - respuesta: tokens de la respuesta final
+        - final: resultado completo (mismo formato que query)
+        - error
+        """
+        respuesta_directa = self._fast_path(question)
+        if respuesta_directa:
+            for accion, observacion in respuesta_directa["intermediate_steps"]:
+                yield {"tipo": "accion", "tool": accion.tool, "tool_input": accion.tool_input}
+                yield {"tipo": "observacion", "tool": accion.tool, "output": observacion}
+            yield {"tipo": "final", **respuesta_directa}
+            return
+
+        version = self.vectorstore.index_version()
+        cached = await asyncio.to_thread(self._buscar_en_cache, question, version)
+        if cached:
+            yield {"tipo": "final", **cached}
+            return
+
+        if self._limite is None:
+            self._limite = asyncio.Semaphore(self.max_concurrencia)
+
+        marcador = "Final Answer:"
+        textos = {}  # run_id del LLM -> texto acumulado
+        emitido = {}  # run_id del LLM -> caracteres de respuesta ya emitidos
+        result = None
+
+        async with self._limite:
+            try:
+                async for evento in self.agent_executor.astream_events({"input": question}, config=self.config, version="v2"):
+                    tipo = evento["event"]
+
+                    if tipo == "on_chat_model_stream":
+                        token = evento["data"]["chunk"].content
+                        if not token:
+                            continue
+                        run_id = evento["run_id"]
+                        textos[run_id] = textos.get(run_id, "") + token
+
+                        # Todo lo que sigue al marcador es la respuesta final
+                        inicio = textos[run_id].find(marcador)
+                        if inicio == -1:
+                            yield {"tipo": "pensamiento", "texto": token}
+                            continue
+                        respuesta = textos[run_id][inicio + len(marcador):].lstrip()
+                        nuevo = respuesta[emitido.get(run_id, 0):]
+                        if nuevo:
+                            emitido[run_id] = len(respuesta)
+                            yield {"tipo": "respuesta", "texto": nuevo}
+
+                    elif tipo == "on_chain_stream" and evento["name"] == "AgentExecutor":
+                        chunk = evento["data"]["chunk"]
+                        for accion in chunk.get("actions", []):
+                            yield {"tipo": "accion", "tool": accion.tool, "tool_input": accion.tool_input}
+                        for paso in chunk.get("steps", []):
+                            yield {"tipo": "observacion", "tool": paso.action.tool, "output": paso.observation}
+
+                    elif tipo == "on_chain_end" and evento["name"] == "AgentExecutor":
+                        result = evento["data"]["output"]
+
+            except Exception as e:
+                yield {"tipo": "error", **self._formatear_error(e)}
+                return
+
+        respuesta = self._formatear_resultado(result or {})
+        await asyncio.to_thread(self._guardar_en_cache, question, respuesta, version)
+        yield {"tipo": "final", **respuesta}
+
+    async def _aquery_agente(self, question: str) -> dict:
+        version = self.vectorstore.index_version()
+        cached = await asyncio.to_thread(self._buscar_en_cache, question, version)
+        if cached:
+            return cached
+
+        if self._limite is None:
+            self._limite = asyncio.Semaphore(self.max_concurrencia)
+
+        async with self._limite:
+            try:
+                result = await self.agent_executor.ainvoke({"input": question}, config=self.config)
+                respuesta = self._formatear_resultado(result)
+            except Exception as e:
+                return self._formatear_error(e)
+
+        await asyncio.to_thread(self._guardar_en_cache, question, respuesta, version)
+        return respuesta
 
 # Test del agente
 if __name__ == "__main__":
@@ -0,0 +1,162 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from router import PATRON_CLASE_PAP, PATRON_VPH
+
+def _normalizar(texto: str) -> str:
+    return " ".join(texto.lower().split())
+
+def _numeros(texto: str) -> tuple:
+    """Valores numéricos de la pregunta (A1C, PA, edad...), normalizados"""
+    return tuple(float(n.replace(",", ".")) for n in re.findall(r"\d+(?:[.,]\d+)?", texto))
+
+def _marcadores(texto: str) -> tuple:
+    """Categorías clínicas de la pregunta (clase de PAP, VPH positivo/negativo), normalizadas"""
+    clases = tuple(m.group(1).upper() for m in PATRON_CLASE_PAP.finditer(texto))
+    vph = tuple("+" in m.group(1) or m.group(1).lower() == "positivo" for m in PATRON_VPH.finditer(texto))
+    return clases, vph
+
+class SemanticAnswerCache:
+    """Caché de respuestas del agente por similitud semántica.
+
+    Una pregunta nueva reutiliza la respuesta de una anterior si la similitud
+    coseno de sus embeddings supera el umbral y ambas tienen exactamente los
+    mismos valores numéricos y las mismas categorías clínicas (para no mezclar
+    pacientes con A1C 8.5 y 9.5, ni PAP ASC-H con LIE-BG o VPH + con VPH -).
+    Las entradas expiran por TTL, se eliminan por LRU al superar el máximo y
+    se invalidan todas cuando cambia la versión del índice FAISS.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        umbral: float = 0.95,
+        ttl: float = 3600,
+        max_entradas: int = 500
+    ):
+        self.embeddings = embeddings
+        self.umbral = umbral
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        # pregunta normalizada -> {vector, numeros, marcadores, respuesta, creado}
+        self._entradas: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _embed(self, pregunta: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(pregunta), dtype=np.float32)
+        norma = np.linalg.norm(vector)
+        return vector / norma if norma else vector
+
+    def _sincronizar_version(self, version: Optional[str]):
+        if version != self.version:
+            self._entradas.clear()
+            self.version = version
+
+    def _purgar_expirados(self):
+        limite = time.time() - self.ttl
+        for clave in [c for c, e in self._entradas.items() if e["creado"] < limite]:
+            del self._entradas[clave]
+
+    def buscar(self, pregunta: str, version: Optional[str] = None) -> Optional[Dict]:
+        """Retorna {"respuesta", "pregunta_original", "similitud"} o None"""
+        clave = _normalizar(pregunta)
+
+        with self._lock:
+            self._sincronizar_version(version)
+            self._purgar_expirados()
+
+            # Coincidencia exacta: no requiere embedding
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                self.hits += 1
+                return {
+                    "respuesta": self._entradas[clave]["respuesta"],
+                    "pregunta_original": clave,
+                    "similitud": 1.0
+                }
+
+            numeros, marcadores = _numeros(pregunta), _marcadores(pregunta)
+            candidatas = [
+                (c, e) for c, e in self._entradas.items()
+                if e["numeros"] == numeros and e["marcadores"] == marcadores
+            ]
+
+        if not candidatas:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        vector = self._embed(pregunta)
+        matriz = np.stack([e["vector"] for _, e in candidatas])
+        similitudes = matriz @ vector
+        mejor = int(np.argmax(similitudes))
+
+        with self._lock:
+            clave_mejor, entrada = candidatas[mejor]
+            if similitudes[mejor] < self.umbral or clave_mejor not in self._entradas:
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(clave_mejor)
+            self.hits += 1
+            return {
+                "respuesta": entrada["respuesta"],
+                "pregunta_original": clave_mejor,
+                "similitud": round(float(similitudes[mejor]), 4)
+            }
+
+    def guardar(self, pregunta: str, respuesta: Dict, version: Optional[str] = None):
+        vector = self._embed(pregunta)
+        with self._lock:
+            self._sincronizar_version(version)
+            clave = _normalizar(pregunta)
+            self._entradas[clave] = {
+                "vector": vector,
+                "numeros": _numeros(pregunta),
+                "marcadores": _marcadores(pregunta),
+                "respuesta": respuesta,
+                "creado": time.time()
+            }
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / consultas, 4) if consultas else 0.0,
+                "entradas": len(self._entradas),
+                "version_indice": self.version
+            }
+
+if __name__ == "__main__":
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    print("=" * 80)
+    print("🧪 TEST: CACHÉ SEMÁNTICA DE RESPUESTAS")
+    print("=" * 80)
+
+    cache = SemanticAnswerCache(DeterministicFakeEmbedding(size=64), max_entradas=2)
+    cache.guardar("Paciente con A1C de 8.5%", {"output": "Riesgo alto"}, version="v1")
+
+    print(f"\n✅ Misma pregunta (otro formato): {cache.buscar('  paciente con a1c de 8.5% ', 'v1') is not None}")
+    print(f"❌ Otro valor numérico: {cache.buscar('Paciente con A1C de 9.5%', 'v1') is not None}")
+    cache.guardar("¿Paciente con PAP ASC-H y VPH positivo es elegible?", {"output": "Elegible"}, version="v1")
+    print(f"❌ Otra clase de PAP: {cache.buscar('¿Paciente con PAP LIE-BG y VPH positivo es elegible?', 'v1') is not None}")
+    print(f"❌ Índice actualizado: {cache.buscar('Paciente con A1C de 8.5%', 'v2') is not None}")
+    print(f"📊 Stats: {cache.stats()}")
+
+    print("\n" + "=" * 80)
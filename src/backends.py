@@ -0,0 +1,116 @@
+import os
+from typing import Dict, List, Optional
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+
+EMBEDDING_BACKENDS = ("openai", "sentence-transformers", "hashing")
+LLM_BACKENDS = ("openai", "local", "scripted")
+
+MODELOS_EMBEDDINGS = {
+    "openai": "text-embedding-3-small",
+    "sentence-transformers": "intfloat/multilingual-e5-small",
+    "hashing": "hashing-1536",
+}
+
+# Índices sin "embeddings" en el manifest se crearon con OpenAI
+EMBEDDINGS_LEGADO = {"backend": "openai", "modelo": "text-embedding-3-small"}
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """Embeddings locales en CPU con sentence-transformers (opcionalmente ONNX).
+
+    El modelo se carga en el primer uso; si sentence-transformers no está
+    instalado se lanza ImportError al embeber. Los modelos E5 necesitan los
+    prefijos "query: " / "passage: ", que se añaden automáticamente.
+    """
+
+    def __init__(self, modelo: str, onnx: bool = False, tamaño_lote: int = 32):
+        self.modelo = modelo
+        self.onnx = onnx
+        self.tamaño_lote = tamaño_lote
+        self._modelo = None
+        self._e5 = "e5" in modelo.lower()
+
+    def _encoder(self):
+        if self._modelo is None:
+            from sentence_transformers import SentenceTransformer
+            kwargs = {"backend": "onnx"} if self.onnx else {}
+            self._modelo = SentenceTransformer(self.modelo, device="cpu", **kwargs)
+        return self._modelo
+
+    def _embed(self, textos: List[str]) -> List[List[float]]:
+        vectores = self._encoder().encode(
+            textos, batch_size=self.tamaño_lote, normalize_embeddings=True, show_progress_bar=False
+        )
+        return vectores.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed([f"passage: {t}" if self._e5 else t for t in texts])
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self._embed([f"query: {t}" if self._e5 else t for t in texts])
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+def config_embeddings() -> Dict[str, str]:
+    """Backend y modelo de embeddings configurados (EMBEDDING_BACKEND, EMBEDDING_MODEL)"""
+    backend = os.getenv("EMBEDDING_BACKEND", "openai")
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"EMBEDDING_BACKEND inválido: {backend} (opciones: {', '.join(EMBEDDING_BACKENDS)})")
+    return {"backend": backend, "modelo": os.getenv("EMBEDDING_MODEL", MODELOS_EMBEDDINGS[backend])}
+
+def clave_modelo(config: Dict[str, str]) -> str:
+    """Identificador del modelo para cachés y checkpoints (no mezcla vectores de backends distintos)"""
+    if config["backend"] == "openai":
+        return config["modelo"]  # compatible con las cachés existentes
+    return f"{config['backend']}:{config['modelo']}"
+
+def crear_embeddings(config: Optional[Dict[str, str]] = None) -> Embeddings:
+    config = config or config_embeddings()
+    backend, modelo = config["backend"], config["modelo"]
+
+    if backend == "sentence-transformers":
+        return SentenceTransformerEmbeddings(modelo, onnx=os.getenv("EMBEDDING_ONNX", "0") == "1")
+
+    if backend == "hashing":
+        from stub_backends import HashingEmbeddings
+        return HashingEmbeddings()
+
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        model=modelo,
+        # Servidores compatibles (OPENAI_BASE_URL) reciben texto, no tokens de tiktoken
+        check_embedding_ctx_length=not os.getenv("OPENAI_BASE_URL")
+    )
+
+def crear_llm() -> BaseChatModel:
+    """Chat model del agente según LLM_BACKEND.
+
+    - openai: API de OpenAI (LLM_MODEL, por defecto gpt-4o-mini)
+    - local: servidor compatible con OpenAI (llama.cpp, vLLM, Ollama...) en LLM_BASE_URL
+    - scripted: LLM guionizado sin red (pruebas y benchmark offline)
+    """
+    backend = os.getenv("LLM_BACKEND", "openai")
+    if backend not in LLM_BACKENDS:
+        raise ValueError(f"LLM_BACKEND inválido: {backend} (opciones: {', '.join(LLM_BACKENDS)})")
+
+    if backend == "scripted":
+        from stub_backends import ScriptedReActLLM
+        return ScriptedReActLLM()
+
+    from langchain_openai import ChatOpenAI
+    if backend == "local":
+        return ChatOpenAI(
+            model=os.getenv("LLM_MODEL", "local"),
+            temperature=0,
+            base_url=os.getenv("LLM_BASE_URL", "http://localhost:8080/v1"),
+            api_key=os.getenv("LLM_API_KEY", "local"),
+            timeout=float(os.getenv("LLM_TIMEOUT", 120))
+        )
+
+    return ChatOpenAI(
+        model=os.getenv("LLM_MODEL", "gpt-4o-mini"),
+        temperature=0,
+        api_key=os.getenv("OPENAI_API_KEY")
+    )
@@ -0,0 +1,359 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unicodedata
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+
+GOLDEN_FILE = "data/benchmark/golden_queries.json"
+SECCIONES = ("busqueda", "agente", "endpoints", "arranque")
+
+# Módulos que los endpoints de lógica pura no deberían importar
+MODULOS_PESADOS = ("langchain_openai", "langchain.agents", "langchain_community.vectorstores", "faiss")
+
+# Métricas comparables entre ejecuciones: True si más alto es mejor
+METRICAS = {
+    "recall@k": True,
+    "mrr": True,
+    "p50_ms": False,
+    "p99_ms": False,
+    "tool_accuracy": True,
+    "respuesta_accuracy": True,
+    "tool_calls_promedio": False,
+    "tokens_promedio": False,
+    "rps": True,
+    "import_ms": False,
+    "primera_peticion_ms": False,
+}
+
+def _normalizar(texto: str) -> str:
+    """Minúsculas, sin acentos y con espacios colapsados (el texto de los PDF viene partido)"""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    return " ".join("".join(c for c in texto if not unicodedata.combining(c)).split())
+
+def _contiene(texto: str, claves: List[str]) -> bool:
+    normalizado = _normalizar(texto)
+    return all(_normalizar(clave) in normalizado for clave in claves)
+
+def _percentiles(latencias: List[float]) -> Dict:
+    return {
+        "p50_ms": round(float(np.percentile(latencias, 50)), 2),
+        "p99_ms": round(float(np.percentile(latencias, 99)), 2)
+    }
+
+def cargar_golden(path: str = GOLDEN_FILE) -> Dict:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+def evaluar_busqueda(vectorstore, casos: List[Dict], k: int, modo: str) -> Dict:
+    """recall@k (¿algún chunk relevante en el top k?) y MRR de MedicalVectorStore.search"""
+    latencias, rangos, detalle = [], [], []
+    # Calentamiento: el índice BM25 se construye en la primera consulta
+    vectorstore.search(casos[0]["pregunta"], n_results=k, modo=modo)
+    for caso in casos:
+        inicio = time.perf_counter()
+        resultados = vectorstore.search(caso["pregunta"], n_results=k, modo=modo)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+        rango = next((
+            i for i, r in enumerate(resultados, 1)
+            if str(r["metadata"].get("source", "")).startswith(caso["fuente"]) and _contiene(r["content"], caso["contiene"])
+        ), None)
+        rangos.append(rango)
+        detalle.append({"id": caso["id"], "rango": rango})
+
+    return {
+        "consultas": len(casos),
+        "recall@k": round(sum(r is not None for r in rangos) / len(casos), 4),
+        "mrr": round(sum(1 / r for r in rangos if r) / len(casos), 4),
+        **_percentiles(latencias),
+        "detalle": detalle
+    }
+
+def evaluar_agente(agent, casos: List[Dict], contador) -> Dict:
+    """Latencia de punta a punta, tool calls y tokens de MedicalAssistantAgent.query"""
+    latencias, detalle = [], []
+    for caso in casos:
+        # Sin cachés entre casos: se mide el agente, no la caché
+        agent.answer_cache.invalidar()
+        agent.tool_cache.invalidar()
+        contador.reiniciar()
+
+        inicio = time.perf_counter()
+        respuesta = agent.query(caso["pregunta"])
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+        tools = [accion.tool for accion, _ in respuesta.get("intermediate_steps", [])]
+        detalle.append({
+            "id": caso["id"],
+            "tools": tools,
+            "tool_ok": caso["tool"] in tools,
+            "respuesta_ok": _contiene(respuesta.get("output", ""), caso["contiene"]),
+            "fast_path": "router" in respuesta,
+            "tool_calls": respuesta.get("tool_calls", 0),
+            "llamadas_llm": contador.llamadas,
+            "tokens": contador.tokens["total_tokens"],
+            "error": respuesta.get("error")
+        })
+
+    n = len(casos)
+    return {
+        "consultas": n,
+        "tool_accuracy": round(sum(d["tool_ok"] for d in detalle) / n, 4),
+        "respuesta_accuracy": round(sum(d["respuesta_ok"] for d in detalle) / n, 4),
+        "fast_path": sum(d["fast_path"] for d in detalle),
+        "errores": sum(d["error"] is not None for d in detalle),
+        "tool_calls_promedio": round(sum(d["tool_calls"] for d in detalle) / n, 2),
+        "tokens_promedio": round(sum(d["tokens"] for d in detalle) / n, 1),
+        **_percentiles(latencias),
+        "detalle": detalle
+    }
+
+async def evaluar_endpoints(app, payloads: Dict[str, List[Dict]], peticiones: int, concurrencia: int) -> Dict:
+    """Throughput de los endpoints (ASGI en proceso, sin red ni servidor)"""
+    import httpx
+
+    resultados = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as cliente:
+        for ruta, cuerpos in payloads.items():
+            semaforo = asyncio.Semaphore(concurrencia)
+            latencias, errores = [], 0
+
+            async def enviar(i: int):
+                nonlocal errores
+                async with semaforo:
+                    inicio = time.perf_counter()
+                    respuesta = await cliente.post(ruta, json=cuerpos[i % len(cuerpos)])
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+                    errores += respuesta.status_code != 200
+
+            # Calentamiento (carga perezosa del índice, evidencia, etc.)
+            await enviar(0)
+            latencias.clear()
+
+            inicio = time.perf_counter()
+            await asyncio.gather(*(enviar(i) for i in range(peticiones)))
+            total = time.perf_counter() - inicio
+
+            resultados[ruta] = {
+                "peticiones": peticiones,
+                "concurrencia": concurrencia,
+                "errores": errores,
+                "rps": round(peticiones / total, 1),
+                **_percentiles(latencias)
+            }
+    return resultados
+
+# Proceso nuevo: importa main y hace la primera petición a cada endpoint de lógica pura
+SCRIPT_ARRANQUE = """
+import asyncio, json, sys, time
+sys.path.insert(0, "src")
+inicio = time.perf_counter()
+import main
+import_ms = (time.perf_counter() - inicio) * 1000
+
+import httpx
+
+async def primeras(payloads):
+    tiempos = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://arranque") as cliente:
+        for ruta, cuerpo in payloads.items():
+            inicio = time.perf_counter()
+            respuesta = await (cliente.post(ruta, json=cuerpo) if cuerpo is not None else cliente.get(ruta))
+            assert respuesta.status_code == 200, (ruta, respuesta.status_code)
+            tiempos[ruta] = (time.perf_counter() - inicio) * 1000
+    return tiempos
+
+tiempos = asyncio.run(primeras(json.loads(sys.argv[1])))
+pesados = [m for m in json.loads(sys.argv[2]) if m in sys.modules]
+print(json.dumps({"import_ms": import_ms, "primeras": tiempos, "pesados": pesados}))
+"""
+
+def evaluar_arranque(payloads: Dict[str, List[Dict]], repeticiones: int) -> Dict:
+    """Arranque en frío: import de main y primera petición por endpoint (un proceso por repetición)"""
+    rutas = {ruta: cuerpos[0] for ruta, cuerpos in payloads.items()}
+    rutas.update({"/template/cenacron": None, "/health": None})
+    entorno = {**os.environ, "WARMUP": "0"}
+
+    imports, primeras, pesados = [], {ruta: [] for ruta in rutas}, set()
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, "-c", SCRIPT_ARRANQUE, json.dumps(rutas), json.dumps(MODULOS_PESADOS)],
+            capture_output=True, text=True, check=True, env=entorno
+        ).stdout
+        medicion = json.loads(salida.strip().splitlines()[-1])
+        imports.append(medicion["import_ms"])
+        for ruta, ms in medicion["primeras"].items():
+            primeras[ruta].append(ms)
+        pesados.update(medicion["pesados"])
+
+    return {
+        "repeticiones": repeticiones,
+        "import_ms": round(float(np.median(imports)), 1),
+        "primeras": {ruta: {"primera_peticion_ms": round(float(np.median(ms)), 2)} for ruta, ms in primeras.items()},
+        "modulos_pesados": sorted(pesados)
+    }
+
+def preparar_offline(directorio: str):
+    """Índice FAISS temporal con embeddings por hashing y LLM guionizado (sin red).
+
+    Debe llamarse antes de importar main o agent: las tools usan el índice
+    de FAISS_INDEX_PATH y los backends de EMBEDDING_BACKEND / LLM_BACKEND.
+    """
+    os.environ["EMBEDDING_BACKEND"] = "hashing"
+    os.environ["LLM_BACKEND"] = "scripted"
+    os.environ["FAISS_INDEX_PATH"] = str(Path(directorio) / "faiss_index")
+    os.environ["EMBEDDING_CACHE_PATH"] = str(Path(directorio) / "embedding_cache.sqlite")
+    os.environ["EMBEDDING_CHECKPOINT_DIR"] = str(Path(directorio) / "checkpoints")
+
+    from data_processor import PDFProcessor
+    from vectorstore import get_vectorstore
+
+    vectorstore = get_vectorstore()
+    vectorstore.add_documents(PDFProcessor().process_all_pdfs())
+    return vectorstore
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def comparar(actual: Dict, base: Dict, tolerancia: float) -> List[str]:
+    """Regresiones (> tolerancia relativa) de actual respecto a base"""
+    regresiones = []
+
+    def recorrer(a: Dict, b: Dict, ruta: str):
+        for clave, valor in a.items():
+            if clave not in b:
+                continue
+            if isinstance(valor, dict):
+                recorrer(valor, b[clave], f"{ruta}.{clave}" if ruta else clave)
+            elif clave in METRICAS and isinstance(valor, (int, float)) and b[clave]:
+                cambio = (valor - b[clave]) / abs(b[clave])
+                peor = -cambio if METRICAS[clave] else cambio
+                print(f"   {ruta}.{clave}: {b[clave]} → {valor} ({cambio:+.1%})")
+                if peor > tolerancia:
+                    regresiones.append(f"{ruta}.{clave}: {b[clave]} → {valor}")
+
+    for seccion in SECCIONES:
+        recorrer(actual.get(seccion, {}), base.get(seccion, {}), seccion)
+    return regresiones
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de búsqueda, agente, endpoints y arranque con preguntas de referencia")
+    parser.add_argument("--golden", default=GOLDEN_FILE)
+    parser.add_argument("--offline", action="store_true",
+                        help="EMBEDDING_BACKEND=hashing y LLM_BACKEND=scripted: sin red (índice temporal)")
+    parser.add_argument("--secciones", default=",".join(SECCIONES))
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--modos", default="hibrido,vector", help="Modos de búsqueda a evaluar")
+    parser.add_argument("--peticiones", type=int, default=500, help="Peticiones por endpoint")
+    parser.add_argument("--concurrencia", type=int, default=16)
+    parser.add_argument("--repeticiones", type=int, default=5, help="Procesos nuevos para medir el arranque")
+    parser.add_argument("--json", help="Guardar resultados en este archivo")
+    parser.add_argument("--comparar", help="Resultados anteriores (JSON) contra los que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.1, help="Empeoramiento relativo tolerado al comparar")
+    args = parser.parse_args()
+
+    secciones = [s.strip() for s in args.secciones.split(",")]
+    golden = cargar_golden(args.golden)
+
+    print("=" * 80)
+    print(f"📏 BENCHMARK CENATE ({'offline' if args.offline else 'OpenAI'})")
+    print("=" * 80)
+
+    temporal = tempfile.TemporaryDirectory(prefix="cenate-bench-") if args.offline else None
+    if temporal:
+        print("\n🧪 Construyendo índice temporal con embeddings offline...")
+        vectorstore = preparar_offline(temporal.name)
+    else:
+        from vectorstore import get_vectorstore
+        vectorstore = get_vectorstore()
+
+    resultados = {
+        "meta": {
+            "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _commit(),
+            "offline": args.offline,
+            "k": args.k,
+            "golden": args.golden,
+            "chunks": vectorstore.vectorstore.index.ntotal if vectorstore.vectorstore else 0
+        }
+    }
+
+    if "busqueda" in secciones:
+        print(f"\n🔍 Búsqueda: {len(golden['busqueda'])} consultas, k={args.k}")
+        resultados["busqueda"] = {}
+        for modo in [m.strip() for m in args.modos.split(",")]:
+            r = evaluar_busqueda(vectorstore, golden["busqueda"], args.k, modo)
+            resultados["busqueda"][modo] = r
+            print(f"   {modo:<8} recall@{args.k}={r['recall@k']:.3f}  MRR={r['mrr']:.3f}  "
+                  f"p50={r['p50_ms']:.1f} ms  p99={r['p99_ms']:.1f} ms")
+            fallos = [d["id"] for d in r["detalle"] if d["rango"] is None]
+            if fallos:
+                print(f"            sin chunk relevante: {', '.join(fallos)}")
+
+    if "agente" in secciones:
+        from agent import MedicalAssistantAgent
+        from stub_backends import TokenCounter
+
+        print(f"\n🤖 Agente: {len(golden['agente'])} consultas")
+        agent = MedicalAssistantAgent()
+        agent.agent_executor.verbose = False
+        contador = TokenCounter()
+        agent.llm.callbacks = [contador]
+        r = evaluar_agente(agent, golden["agente"], contador)
+        resultados["agente"] = r
+        print(f"   tools correctas={r['tool_accuracy']:.2f}  respuestas correctas={r['respuesta_accuracy']:.2f}  "
+              f"fast-path={r['fast_path']}  errores={r['errores']}")
+        print(f"   tool calls={r['tool_calls_promedio']}  tokens={r['tokens_promedio']}  "
+              f"p50={r['p50_ms']:.1f} ms  p99={r['p99_ms']:.1f} ms")
+
+    if "endpoints" in secciones:
+        from main import app
+
+        print(f"\n⚡ Endpoints: {args.peticiones} peticiones, concurrencia {args.concurrencia}")
+        r = asyncio.run(evaluar_endpoints(app, golden["endpoints"], args.peticiones, args.concurrencia))
+        resultados["endpoints"] = r
+        for ruta, m in r.items():
+            print(f"   {ruta:<10} {m['rps']:>8.1f} req/s  p50={m['p50_ms']:.2f} ms  "
+                  f"p99={m['p99_ms']:.2f} ms  errores={m['errores']}")
+
+    if "arranque" in secciones:
+        print(f"\n🚀 Arranque en frío: {args.repeticiones} procesos (WARMUP=0)")
+        r = evaluar_arranque(golden["endpoints"], args.repeticiones)
+        resultados["arranque"] = r
+        print(f"   import main  {r['import_ms']:.0f} ms")
+        for ruta, m in r["primeras"].items():
+            print(f"   1ª {ruta:<19} {m['primera_peticion_ms']:.2f} ms")
+        print(f"   módulos pesados cargados: {', '.join(r['modulos_pesados']) or 'ninguno'}")
+
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.json).write_text(json.dumps(resultados, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n💾 Resultados guardados en {args.json}")
+
+    codigo = 0
+    if args.comparar:
+        print(f"\n📊 Comparación con {args.comparar}:")
+        regresiones = comparar(resultados, json.loads(Path(args.comparar).read_text(encoding="utf-8")), args.tolerancia)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} regresiones (tolerancia {args.tolerancia:.0%}):")
+            for regresion in regresiones:
+                print(f"   - {regresion}")
+            codigo = 1
+        else:
+            print("\n✅ Sin regresiones")
+
+    if temporal:
+        temporal.cleanup()
+    print("\n" + "=" * 80)
+    sys.exit(codigo)
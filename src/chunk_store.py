@@ -0,0 +1,132 @@
+import json
+import mmap
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Tuple, Union
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+CHUNKS_FILE = "chunks.bin"
+OFFSETS_FILE = "chunks_offsets.npy"
+
+class Posiciones(Mapping):
+    """index_to_docstore_id de solo lectura: la posición en FAISS es la clave del chunk"""
+
+    def __init__(self, total: int):
+        self.total = total
+
+    def __getitem__(self, posicion: int) -> int:
+        posicion = int(posicion)
+        if not 0 <= posicion < self.total:
+            raise KeyError(posicion)
+        return posicion
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.total))
+
+    def __len__(self) -> int:
+        return self.total
+
+class ChunkStore(Docstore):
+    """Chunks en disco: tabla de offsets + blob UTF-8 contiguo, mapeados en memoria.
+
+    El registro i (JSON con id, texto y metadata) corresponde al vector i del
+    índice FAISS y solo se decodifica cuando se pide, así que abrir el store
+    no cuesta nada y la memoria residente depende de los chunks leídos.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        path = Path(path)
+        self.offsets = np.load(path / OFFSETS_FILE, mmap_mode="r")
+        self._archivo = open(path / CHUNKS_FILE, "rb")
+        tamaño = path.joinpath(CHUNKS_FILE).stat().st_size
+        self._blob = mmap.mmap(self._archivo.fileno(), 0, access=mmap.ACCESS_READ) if tamaño else b""
+
+    @staticmethod
+    def existe(path: Union[str, Path]) -> bool:
+        path = Path(path)
+        return (path / CHUNKS_FILE).exists() and (path / OFFSETS_FILE).exists()
+
+    @staticmethod
+    def escribir(path: Union[str, Path], registros: Iterable[Tuple[str, Document]]):
+        """Escribe los chunks en orden de posición FAISS"""
+        path = Path(path)
+        offsets = [0]
+        with open(path / CHUNKS_FILE, "wb") as f:
+            for doc_id, doc in registros:
+                datos = json.dumps(
+                    {"id": doc_id, "texto": doc.page_content, "metadata": doc.metadata},
+                    ensure_ascii=False
+                ).encode("utf-8")
+                f.write(datos)
+                offsets.append(offsets[-1] + len(datos))
+        np.save(path / OFFSETS_FILE, np.asarray(offsets, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def _registro(self, posicion: int) -> Dict:
+        inicio, fin = int(self.offsets[posicion]), int(self.offsets[posicion + 1])
+        return json.loads(self._blob[inicio:fin].decode("utf-8"))
+
+    def posiciones(self) -> Posiciones:
+        return Posiciones(len(self))
+
+    def search(self, search: Union[int, str]) -> Union[Document, str]:
+        """Documento por posición (la clave que entrega Posiciones)"""
+        try:
+            posicion = int(search)
+        except (TypeError, ValueError):
+            return f"ID {search} not found."
+        if not 0 <= posicion < len(self):
+            return f"ID {search} not found."
+        registro = self._registro(posicion)
+        return Document(page_content=registro["texto"], metadata=registro["metadata"], id=registro["id"])
+
+    def a_memoria(self) -> Tuple[InMemoryDocstore, Dict[int, str]]:
+        """Copia editable (docstore + index_to_docstore_id) para la ingesta"""
+        documentos, ids = {}, {}
+        for posicion in range(len(self)):
+            registro = self._registro(posicion)
+            documentos[registro["id"]] = Document(
+                page_content=registro["texto"], metadata=registro["metadata"], id=registro["id"]
+            )
+            ids[posicion] = registro["id"]
+        return InMemoryDocstore(documentos), ids
+
+    def close(self):
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
+        self._archivo.close()
+
+def migrar_pickle(path: Union[str, Path]) -> int:
+    """Convierte index.pkl (docstore de LangChain) al formato de ChunkStore"""
+    import pickle
+
+    path = Path(path)
+    with open(path / "index.pkl", "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    registros = [(index_to_docstore_id[i], docstore.search(index_to_docstore_id[i]))
+                 for i in range(len(index_to_docstore_id))]
+    ChunkStore.escribir(path, registros)
+    return len(registros)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migra el docstore pickle de un índice FAISS a ChunkStore")
+    parser.add_argument("indice", nargs="?", default="data/faiss_index")
+    parser.add_argument("--borrar-pickle", action="store_true", help="Eliminar index.pkl tras migrar")
+    args = parser.parse_args()
+
+    total = migrar_pickle(args.indice)
+    store = ChunkStore(args.indice)
+    assert len(store) == total
+    print(f"✅ {total} chunks migrados a {args.indice}/{CHUNKS_FILE}")
+    print(f"📄 Chunk 0: {store.search(0).page_content[:100]!r}")
+
+    if args.borrar_pickle:
+        Path(args.indice, "index.pkl").unlink()
+        print("🗑️  index.pkl eliminado")
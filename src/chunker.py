@@ -0,0 +1,191 @@
+import re
+from typing import Dict, List, Optional, Tuple
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+# Marcas y encabezados del formato PM.x.x.x que emite PDFProcessor
+PATRON_PAGINA = re.compile(r"^--- Página (\d+) ---$")
+PATRON_SECCION = re.compile(r"^(?P<num>[IVX]+)\.\s+(?P<titulo>[A-ZÁÉÍÓÚÑ][A-ZÁÉÍÓÚÑ ,]+)$")
+PATRON_SUBSECCION = re.compile(r"^(?P<num>[IVX]+\.(?:[IVX]+|\d+))\.?\s+(?P<titulo>[A-ZÁÉÍÓÚÑ]{3,}[A-ZÁÉÍÓÚÑ ]*)$")
+PATRON_ANEXO = re.compile(r"^ANEXO\s+(?P<num>\d+)\b[.:\s–-]*(?P<titulo>.*)$", re.IGNORECASE)
+# Fila numerada de tabla de actividades ("3 Explicar procedimiento y ...")
+PATRON_FILA = re.compile(r"^\d{1,2}\.?\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]")
+
+Linea = Tuple[int, str]  # (página, texto)
+
+def _normalizar(titulo: str) -> str:
+    return " ".join(titulo.split())
+
+def _seccion_comun(a: str, b: str) -> str:
+    """Sección de un chunk que une dos secciones: su prefijo común (o la primera)"""
+    comun = []
+    for x, y in zip(a.split(" > "), b.split(" > ")):
+        if x != y:
+            break
+        comun.append(x)
+    return " > ".join(comun) if comun else a
+
+class ProcedureChunker:
+    """Chunker para los procedimientos PM.x.x.x de CENATE.
+
+    Corta en secciones (I., II., V.1...), en cada Anexo y entre filas de
+    tabla o páginas, nunca a mitad de fila. Cada chunk lleva la ruta de la
+    sección y las páginas que abarca; las secciones muy cortas se unen a la
+    siguiente y no hay solapamiento entre chunks.
+    """
+
+    def __init__(self, max_chars: int = 1500, min_chars: int = 300):
+        self.max_chars = max_chars
+        self.min_chars = min_chars
+        self._respaldo = RecursiveCharacterTextSplitter(
+            chunk_size=max_chars,
+            chunk_overlap=0,
+            separators=["\n\n", "\n", ". ", " ", ""]
+        )
+
+    def _encabezado(self, linea: str, ruta: List[str], en_anexos: bool) -> Optional[List[str]]:
+        """Nueva ruta de sección si la línea es un encabezado"""
+        match = PATRON_SUBSECCION.match(linea)
+        if match and ruta:
+            return [ruta[0], _normalizar(linea)]
+
+        match = PATRON_SECCION.match(linea)
+        if match:
+            titulo = _normalizar(linea)
+            # El encabezado de tabla se repite en cada página: no es una sección nueva
+            if ruta and ruta[0] == titulo:
+                return None
+            return [titulo]
+
+        # Los Anexos solo se reconocen dentro de la sección de anexos (antes
+        # son referencias dentro de las tablas)
+        match = PATRON_ANEXO.match(linea)
+        if match and en_anexos:
+            return [ruta[0], _normalizar(linea)]
+
+        return None
+
+    def _bloques(self, texto: str) -> List[Tuple[List[str], List[Linea]]]:
+        """Divide el documento en (ruta de sección, líneas)"""
+        bloques: List[Tuple[List[str], List[Linea]]] = []
+        ruta: List[str] = ["Inicio"]
+        lineas: List[Linea] = []
+        pagina = 1
+        en_blanco = False
+
+        for cruda in texto.split("\n"):
+            linea = cruda.strip()
+            match = PATRON_PAGINA.match(linea)
+            if match:
+                pagina = int(match.group(1))
+            elif not linea:
+                # Colapsar líneas vacías consecutivas
+                if en_blanco:
+                    continue
+                en_blanco = True
+            else:
+                en_blanco = False
+                nueva = self._encabezado(linea, ruta, en_anexos="ANEXOS" in ruta[0])
+                if nueva is not None:
+                    if lineas:
+                        bloques.append((ruta, lineas))
+                    ruta, lineas = nueva, []
+            lineas.append((pagina, linea))
+
+        if lineas:
+            bloques.append((ruta, lineas))
+        return bloques
+
+    @staticmethod
+    def _segmentos(lineas: List[Linea]) -> List[List[Linea]]:
+        """Unidades indivisibles: se corta antes de cada página, fila de tabla o párrafo"""
+        segmentos: List[List[Linea]] = []
+        for linea in lineas:
+            texto = linea[1]
+            if not segmentos or PATRON_PAGINA.match(texto) or PATRON_FILA.match(texto) or not texto:
+                segmentos.append([])
+            segmentos[-1].append(linea)
+        return segmentos
+
+    @staticmethod
+    def _texto(lineas: List[Linea]) -> str:
+        return "\n".join(texto for _, texto in lineas).strip()
+
+    def _partir(self, lineas: List[Linea]) -> List[Tuple[str, int, int]]:
+        """(texto, página inicial, página final) de un bloque, respetando max_chars"""
+        texto = self._texto(lineas)
+        if len(texto) <= self.max_chars:
+            return [(texto, lineas[0][0], lineas[-1][0])]
+
+        piezas: List[Tuple[str, int, int]] = []
+        actual: List[Linea] = []
+        for segmento in self._segmentos(lineas):
+            if actual and len(self._texto(actual + segmento)) > self.max_chars:
+                piezas.append((self._texto(actual), actual[0][0], actual[-1][0]))
+                actual = []
+            actual += segmento
+
+            # Un solo segmento (p. ej. una fila enorme) mayor que el máximo
+            if len(self._texto(actual)) > self.max_chars:
+                for parte in self._respaldo.split_text(self._texto(actual)):
+                    piezas.append((parte, actual[0][0], actual[-1][0]))
+                actual = []
+
+        if actual:
+            piezas.append((self._texto(actual), actual[0][0], actual[-1][0]))
+        return [p for p in piezas if p[0]]
+
+    def split(self, texto: str) -> List[Tuple[str, Dict]]:
+        """[(texto del chunk, {"section", "page", "page_end"})]"""
+        chunks: List[Tuple[str, Dict]] = []
+        pendiente: Optional[Tuple[str, Dict]] = None
+
+        for ruta, lineas in self._bloques(texto):
+            seccion = " > ".join(ruta)
+            for n, (pieza, inicio, fin) in enumerate(self._partir(lineas)):
+                if n > 0:
+                    # Continuación: repetir la sección para que el chunk se entienda solo
+                    pieza = f"[{seccion}]\n{pieza}"
+                metadata = {"section": seccion, "page": inicio, "page_end": fin}
+
+                # Secciones muy cortas (un título, un índice de anexos) se unen a la siguiente
+                if pendiente is not None:
+                    unido = f"{pendiente[0]}\n\n{pieza}"
+                    if len(unido) <= self.max_chars:
+                        pieza = unido
+                        metadata = {
+                            "section": _seccion_comun(pendiente[1]["section"], seccion),
+                            "page": pendiente[1]["page"],
+                            "page_end": fin
+                        }
+                    else:
+                        chunks.append(pendiente)
+                    pendiente = None
+
+                if len(pieza) < self.min_chars:
+                    pendiente = (pieza, metadata)
+                else:
+                    chunks.append((pieza, metadata))
+
+        if pendiente is not None:
+            chunks.append(pendiente)
+        return chunks
+
+if __name__ == "__main__":
+    from data_processor import PDFProcessor
+
+    print("=" * 80)
+    print("🧪 TEST: CHUNKER POR ESTRUCTURA (PM.x.x.x)")
+    print("=" * 80)
+
+    chunker = ProcedureChunker()
+    genérico = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    for doc in PDFProcessor().process_all_pdfs():
+        chunks = chunker.split(doc["content"])
+        anterior = genérico.split_text(doc["content"])
+        print(f"\n📄 {doc['source']}")
+        print(f"   Estructura: {len(chunks)} chunks, {sum(len(t) for t, _ in chunks)} caracteres")
+        print(f"   Genérico:   {len(anterior)} chunks, {sum(len(t) for t in anterior)} caracteres")
+        for texto, metadata in chunks[:40]:
+            print(f"   - p.{metadata['page']}-{metadata['page_end']} {metadata['section'][:70]} ({len(texto)})")
+
+    print("\n" + "=" * 80)
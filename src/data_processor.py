@@ -1,52 +1,224 @@
+import hashlib
+import io
+import os
 import pypdf
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional, Iterator, Tuple
+
+def _format_page(page_num: int, page_text: str) -> str:
+    return f"\n--- Página {page_num} ---\n{page_text}\n"
+
+# Lectores de cada worker: uno que recibe varios rangos del mismo PDF lo parsea una sola vez
+# (el proceso principal no los usa; se liberan al cerrar el pool)
+_LECTORES: "OrderedDict[Tuple[str, int, int], Tuple[str, pypdf.PdfReader]]" = OrderedDict()
+_MAX_LECTORES = 4
+
+def _lector(pdf_path: str) -> Tuple[str, pypdf.PdfReader]:
+    """(sha256, PdfReader) del archivo, reutilizado mientras no cambien tamaño ni mtime"""
+    info = os.stat(pdf_path)
+    clave = (pdf_path, info.st_size, info.st_mtime_ns)
+    if clave in _LECTORES:
+        _LECTORES.move_to_end(clave)
+        return _LECTORES[clave]
+
+    data = Path(pdf_path).read_bytes()
+    _LECTORES[clave] = (hashlib.sha256(data).hexdigest(), pypdf.PdfReader(io.BytesIO(data)))
+    while len(_LECTORES) > _MAX_LECTORES:
+        _LECTORES.popitem(last=False)
+    return _LECTORES[clave]
+
+def _extract_pages(pdf_path: str, inicio: int = 0, fin: Optional[int] = None) -> Tuple[int, str, List[Tuple[int, str]]]:
+    """Extrae un rango de páginas [inicio, fin) en un proceso worker.
+
+    Retorna (total de páginas, sha256 del archivo, [(número de página, texto)]).
+    """
+    sha256, reader = _lector(pdf_path)
+    total = len(reader.pages)
+    fin = total if fin is None else min(fin, total)
+    paginas = [(n + 1, reader.pages[n].extract_text()) for n in range(inicio, fin)]
+    return total, sha256, paginas
 
 class PDFProcessor:
-    def __init__(self, pdf_folder: str = "data/raw"):
+    def __init__(self, pdf_folder: str = "data/raw", workers: int = 1, pages_per_task: Optional[int] = None):
+        """
+        workers: procesos para la extracción (1 = serial, 0 = uno por CPU)
+        pages_per_task: divide cada PDF en rangos de páginas (None = un PDF por tarea)
+        """
         self.pdf_folder = Path(pdf_folder)
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.pages_per_task = pages_per_task
+
+    @staticmethod
+    def file_hash(pdf_path: Path) -> str:
+        """SHA-256 del contenido del archivo"""
+        sha = hashlib.sha256()
+        with open(pdf_path, "rb") as f:
+            for bloque in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(bloque)
+        return sha.hexdigest()
 
     def extract_text_from_pdf(self, pdf_path: Path) -> str:
         """Extrae texto de un PDF"""
         try:
             reader = pypdf.PdfReader(pdf_path)
-            text = ""
-            for page_num, page in enumerate(reader.pages, 1):
-                page_text = page.extract_text()
-                text += f"\n--- Página {page_num} ---\n{page_text}\n"
-            return text
+            return self._extract_text(reader)
         except Exception as e:
             print(f"❌ Error procesando {pdf_path.name}: {e}")
             return ""
 
-    def process_all_pdfs(self) -> List[Dict[str, str]]:
-        """Procesa todos los PDFs de la carpeta"""
-        documents = []
+    @staticmethod
+    def _extract_text(reader: pypdf.PdfReader) -> str:
+        return "".join(
+            _format_page(page_num, page.extract_text())
+            for page_num, page in enumerate(reader.pages, 1)
+        )
 
-        pdf_files = list(self.pdf_folder.glob("*.pdf"))
-        if not pdf_files:
-            print(f"⚠️  No se encontraron PDFs en {self.pdf_folder}")
+    def list_pdfs(self) -> List[Path]:
+        """PDFs de la carpeta, ordenados por nombre"""
+        return sorted(self.pdf_folder.glob("*.pdf"))
+
+    def process_pdf(self, pdf_file: Path) -> Optional[Dict]:
+        """Procesa un PDF (una sola lectura del archivo)"""
+        print(f"📄 Procesando: {pdf_file.name}")
+        try:
+            data = pdf_file.read_bytes()
+            reader = pypdf.PdfReader(io.BytesIO(data))
+            text = self._extract_text(reader)
+        except Exception as e:
+            print(f"❌ Error procesando {pdf_file.name}: {e}")
+            return None
+
+        if not text:
+            return None
+
+        print(f"   ✅ {len(text)} caracteres extraídos")
+        return {
+            "source": pdf_file.stem,
+            "content": text,
+            "metadata": {
+                "filename": pdf_file.name,
+                "pages": len(reader.pages),
+                "sha256": hashlib.sha256(data).hexdigest()
+            }
+        }
+
+    def iter_pages(self, pdf_files: Optional[List[Path]] = None) -> Iterator[Dict]:
+        """Extrae páginas en paralelo y las emite a medida que terminan.
+
+        Cada registro trae el número de página en su metadata. El orden de
+        llegada no está garantizado. Con pages_per_task, el proceso principal
+        abre cada PDF solo para contar sus páginas (sin extraer texto ni
+        guardar el lector) y envía todos los rangos de inmediato; cada worker
+        parsea un PDF una vez aunque reciba varios de sus rangos, así que un
+        archivo se parsea como mucho una vez por worker, más el conteo inicial.
+        """
+        pdf_files = self.list_pdfs() if pdf_files is None else pdf_files
+
+        rangos = []
+        for f in pdf_files:
+            if not self.pages_per_task:
+                rangos.append((f, 0, None))
+                continue
+            try:
+                total = len(pypdf.PdfReader(f).pages)
+            except Exception as e:
+                print(f"❌ Error procesando {f.name}: {e}")
+                continue
+            rangos += [(f, desde, desde + self.pages_per_task) for desde in range(0, max(total, 1), self.pages_per_task)]
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            pendientes = {
+                pool.submit(_extract_pages, str(f), inicio, fin): f
+                for f, inicio, fin in rangos
+            }
+
+            while pendientes:
+                terminados, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+                for futuro in terminados:
+                    pdf_file = pendientes.pop(futuro)
+                    try:
+                        total, sha256, paginas = futuro.result()
+                    except Exception as e:
+                        print(f"❌ Error procesando {pdf_file.name}: {e}")
+                        continue
+
+                    for page_num, page_text in paginas:
+                        yield {
+                            "source": pdf_file.stem,
+                            "content": page_text,
+                            "metadata": {
+                                "filename": pdf_file.name,
+                                "page": page_num,
+                                "pages": total,
+                                "sha256": sha256
+                            }
+                        }
+
+    def process_pdfs(self, pdf_files: List[Path]) -> List[Dict]:
+        """Procesa una lista de PDFs (en paralelo si workers > 1)"""
+        if self.workers == 1:
+            documents = []
+            for pdf_file in pdf_files:
+                document = self.process_pdf(pdf_file)
+                if document:
+                    documents.append(document)
             return documents
 
+        print(f"⚡ Extracción paralela: {len(pdf_files)} PDFs, {self.workers} workers")
+        paginas_por_archivo: Dict[str, Dict] = {}
+        for record in self.iter_pages(pdf_files):
+            meta = record["metadata"]
+            entrada = paginas_por_archivo.setdefault(meta["filename"], {
+                "source": record["source"],
+                "pages": meta["pages"],
+                "sha256": meta["sha256"],
+                "textos": {}
+            })
+            entrada["textos"][meta["page"]] = record["content"]
+
+        documents = []
         for pdf_file in pdf_files:
-            print(f"📄 Procesando: {pdf_file.name}")
-            text = self.extract_text_from_pdf(pdf_file)
-
-            if text:
-                documents.append({
-                    "source": pdf_file.stem,
-                    "content": text,
-                    "metadata": {
-                        "filename": pdf_file.name,
-                        "pages": len(pypdf.PdfReader(pdf_file).pages)
-                    }
-                })
-                print(f"   ✅ {len(text)} caracteres extraídos")
+            entrada = paginas_por_archivo.get(pdf_file.name)
+            if not entrada or len(entrada["textos"]) != entrada["pages"]:
+                # Algún rango falló: se descarta el documento incompleto
+                continue
+
+            text = "".join(_format_page(n, entrada["textos"][n]) for n in sorted(entrada["textos"]))
+            if not text:
+                continue
 
+            print(f"   ✅ {pdf_file.name}: {len(text)} caracteres extraídos")
+            documents.append({
+                "source": entrada["source"],
+                "content": text,
+                "metadata": {
+                    "filename": pdf_file.name,
+                    "pages": entrada["pages"],
+                    "sha256": entrada["sha256"]
+                }
+            })
         return documents
 
+    def process_all_pdfs(self) -> List[Dict[str, str]]:
+        """Procesa todos los PDFs de la carpeta"""
+        pdf_files = self.list_pdfs()
+        if not pdf_files:
+            print(f"⚠️  No se encontraron PDFs en {self.pdf_folder}")
+            return []
+
+        return self.process_pdfs(pdf_files)
+
 if __name__ == "__main__":
-    processor = PDFProcessor()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extracción de texto de PDFs de procedimientos")
+    parser.add_argument("--workers", type=int, default=1, help="Procesos de extracción (0 = uno por CPU)")
+    parser.add_argument("--pages-per-task", type=int, default=None, help="Páginas por tarea en modo paralelo")
+    args = parser.parse_args()
+
+    processor = PDFProcessor(workers=args.workers, pages_per_task=args.pages_per_task)
     docs = processor.process_all_pdfs()
     print(f"\n✅ Total procesados: {len(docs)} documentos")
 
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import os
+from typing import Any, Callable, Dict, Optional
+
+# Dónde se ejecutan /risk y /validate: en el proceso (local) o en risk-lambda / validate-lambda
+DISPATCH_MODOS = ("local", "lambda")
+
+FUNCIONES_LAMBDA = {
+    "risk": ("LAMBDA_RISK_ARN", "risk-lambda"),
+    "validate": ("LAMBDA_VALIDATE_ARN", "validate-lambda"),
+}
+
+class ErrorDespacho(Exception):
+    """Error de la función con su código HTTP (422 de validación, 500 de la tool, 502 del invoke)"""
+
+    def __init__(self, status_code: int, detalle: Any):
+        super().__init__(str(detalle))
+        self.status_code = status_code
+        self.detalle = detalle
+
+class DespachoLocal:
+    """Llama a las tools en el mismo proceso (comportamiento anterior)"""
+
+    modo = "local"
+
+    def __init__(self, risk_tool, validate_tool):
+        self.funciones: Dict[str, Callable[..., dict]] = {
+            "risk": risk_tool.estratificar,
+            "validate": validate_tool.validar,
+        }
+
+    async def invocar(self, funcion: str, payload: dict) -> dict:
+        return self.funciones[funcion](**payload)
+
+class DespachoLambda:
+    """Invoca risk-lambda / validate-lambda (RequestResponse) con un solo cliente boto3.
+
+    El cliente y su pool HTTP se crean una vez y se reutilizan (keep-alive);
+    con LAMBDA_ENDPOINT_URL apunta al emulador local (src/lambda_local.py).
+    """
+
+    modo = "lambda"
+
+    def __init__(self, endpoint_url: Optional[str] = None, max_conexiones: int = 10):
+        import boto3
+        from botocore.config import Config
+
+        self.endpoint_url = endpoint_url
+        self.nombres = {funcion: os.getenv(env, defecto) for funcion, (env, defecto) in FUNCIONES_LAMBDA.items()}
+
+        credenciales = {}
+        if endpoint_url and not os.getenv("AWS_ACCESS_KEY_ID"):
+            # El emulador no valida la firma, pero botocore necesita credenciales para firmar
+            credenciales = {"aws_access_key_id": "local", "aws_secret_access_key": "local"}
+
+        self.cliente = boto3.client(
+            "lambda",
+            endpoint_url=endpoint_url,
+            region_name=os.getenv("AWS_REGION", "us-east-1"),
+            config=Config(max_pool_connections=max_conexiones, tcp_keepalive=True),
+            **credenciales
+        )
+
+    def _invocar(self, funcion: str, payload: dict) -> dict:
+        respuesta = self.cliente.invoke(
+            FunctionName=self.nombres[funcion],
+            InvocationType="RequestResponse",
+            Payload=json.dumps(payload)
+        )
+        cuerpo = json.loads(respuesta["Payload"].read() or b"null")
+
+        if respuesta.get("FunctionError"):
+            mensaje = cuerpo.get("errorMessage") if isinstance(cuerpo, dict) else cuerpo
+            raise ErrorDespacho(502, f"{self.nombres[funcion]}: {mensaje}")
+
+        status_code = cuerpo.get("statusCode", 200)
+        if isinstance(cuerpo.get("body"), str):
+            cuerpo = json.loads(cuerpo["body"])
+        if status_code != 200:
+            raise ErrorDespacho(status_code, cuerpo.get("error"))
+        return cuerpo["result"]
+
+    async def invocar(self, funcion: str, payload: dict) -> dict:
+        # boto3 es bloqueante: el invoke va a un hilo (el pool de conexiones es thread-safe)
+        return await asyncio.to_thread(self._invocar, funcion, payload)
+
+def crear_despacho(risk_tool, validate_tool):
+    """Despacho según DISPATCH (local por defecto; lambda usa LAMBDA_ENDPOINT_URL si existe)"""
+    modo = os.getenv("DISPATCH", "local")
+    if modo == "local":
+        return DespachoLocal(risk_tool, validate_tool)
+    if modo == "lambda":
+        return DespachoLambda(
+            endpoint_url=os.getenv("LAMBDA_ENDPOINT_URL") or None,
+            max_conexiones=int(os.getenv("LAMBDA_MAX_CONNECTIONS", "10"))
+        )
+    raise ValueError(f"DISPATCH inválido: {modo} (opciones: {', '.join(DISPATCH_MODOS)})")
@@ -0,0 +1,251 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class EmbeddingCache:
+    """Caché persistente de embeddings direccionada por contenido.
+
+    Cada vector se guarda en SQLite bajo la clave sha256(modelo + texto), como
+    float32. Al superar el límite de entradas o de bytes se eliminan los
+    vectores con acceso más antiguo (LRU).
+    """
+
+    def __init__(
+        self,
+        path: str = "data/embedding_cache.sqlite",
+        max_entradas: int = 50_000,
+        max_bytes: int = 256 * 1024 * 1024
+    ):
+        self.path = path
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicciones = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            # WAL: varios workers pueden leer mientras otro escribe
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                clave TEXT PRIMARY KEY,
+                modelo TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                bytes INTEGER NOT NULL,
+                ultimo_acceso REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ultimo_acceso ON embeddings(ultimo_acceso)")
+
+    @staticmethod
+    def clave(modelo: str, texto: str) -> str:
+        return hashlib.sha256(f"{modelo}\x00{texto}".encode("utf-8")).hexdigest()
+
+    def obtener(self, modelo: str, textos: List[str]) -> List[Optional[List[float]]]:
+        """Retorna el vector cacheado de cada texto (None si no está)"""
+        claves = [self.clave(modelo, t) for t in textos]
+        encontrados: Dict[str, List[float]] = {}
+
+        with self._lock:
+            # Consultas por bloques para respetar el límite de parámetros de SQLite
+            for i in range(0, len(claves), 500):
+                bloque = list(set(claves[i:i + 500]))
+                marcas = ",".join("?" * len(bloque))
+                filas = self._conn.execute(
+                    f"SELECT clave, vector FROM embeddings WHERE clave IN ({marcas})", bloque
+                ).fetchall()
+                for clave, vector in filas:
+                    encontrados[clave] = np.frombuffer(vector, dtype=np.float32).tolist()
+
+            if encontrados:
+                ahora = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET ultimo_acceso = ? WHERE clave = ?",
+                    [(ahora, c) for c in encontrados]
+                )
+
+            resultados = [encontrados.get(c) for c in claves]
+            aciertos = sum(r is not None for r in resultados)
+            self.hits += aciertos
+            self.misses += len(resultados) - aciertos
+
+        return resultados
+
+    def guardar(self, modelo: str, textos: List[str], vectores: List[List[float]]):
+        """Guarda vectores y aplica los límites de tamaño"""
+        ahora = time.time()
+        filas = []
+        for texto, vector in zip(textos, vectores):
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            filas.append((self.clave(modelo, texto), modelo, blob, len(blob), ahora))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (clave, modelo, vector, bytes, ultimo_acceso) VALUES (?, ?, ?, ?, ?)",
+                filas
+            )
+            self._aplicar_limites()
+
+    def _aplicar_limites(self):
+        entradas, total_bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM embeddings"
+        ).fetchone()
+        if entradas <= self.max_entradas and total_bytes <= self.max_bytes:
+            return
+
+        # Eliminar los menos usados recientemente hasta volver a los límites
+        exceso = 0
+        if entradas > self.max_entradas:
+            exceso = entradas - self.max_entradas
+        if total_bytes > self.max_bytes:
+            promedio = total_bytes / entradas
+            exceso = max(exceso, int((total_bytes - self.max_bytes) / promedio) + 1)
+
+        cursor = self._conn.execute(
+            "DELETE FROM embeddings WHERE clave IN "
+            "(SELECT clave FROM embeddings ORDER BY ultimo_acceso ASC LIMIT ?)",
+            (exceso,)
+        )
+        self.evicciones += cursor.rowcount
+
+    def stats(self) -> dict:
+        """Contadores para monitoreo"""
+        with self._lock:
+            entradas, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM embeddings"
+            ).fetchone()
+        consultas = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / consultas, 4) if consultas else 0.0,
+            "evicciones": self.evicciones,
+            "entradas": entradas,
+            "bytes": total_bytes,
+            "max_entradas": self.max_entradas,
+            "max_bytes": self.max_bytes
+        }
+
+class CachedEmbeddings(Embeddings):
+    """Envuelve un modelo de embeddings y solo calcula los textos que no están en caché"""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, modelo: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.modelo = modelo
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectores = self.cache.obtener(self.modelo, texts)
+
+        # Textos faltantes, sin repetir, en una sola llamada al modelo
+        faltantes = list(dict.fromkeys(t for t, v in zip(texts, vectores) if v is None))
+        if faltantes:
+            nuevos = self.embeddings.embed_documents(faltantes)
+            self.cache.guardar(self.modelo, faltantes, nuevos)
+            calculados = dict(zip(faltantes, nuevos))
+            vectores = [v if v is not None else calculados[t] for t, v in zip(texts, vectores)]
+
+        return vectores
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.obtener(self.modelo, [text])[0]
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.guardar(self.modelo, [text], [vector])
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Varias consultas con una sola llamada al modelo para las que no están en caché"""
+        vectores = self.cache.obtener(self.modelo, texts)
+
+        faltantes = list(dict.fromkeys(t for t, v in zip(texts, vectores) if v is None))
+        if faltantes:
+            # OpenAI y hashing embeben igual consultas y documentos; los modelos
+            # con prefijo de consulta (E5) exponen embed_queries
+            embed = getattr(self.embeddings, "embed_queries", self.embeddings.embed_documents)
+            nuevos = embed(faltantes)
+            self.cache.guardar(self.modelo, faltantes, nuevos)
+            calculados = dict(zip(faltantes, nuevos))
+            vectores = [v if v is not None else calculados[t] for t, v in zip(texts, vectores)]
+
+        return vectores
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectores = self.cache.obtener(self.modelo, texts)
+
+        faltantes = list(dict.fromkeys(t for t, v in zip(texts, vectores) if v is None))
+        if faltantes:
+            nuevos = await self.embeddings.aembed_documents(faltantes)
+            self.cache.guardar(self.modelo, faltantes, nuevos)
+            calculados = dict(zip(faltantes, nuevos))
+            vectores = [v if v is not None else calculados[t] for t, v in zip(texts, vectores)]
+
+        return vectores
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = self.cache.obtener(self.modelo, [text])[0]
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self.cache.guardar(self.modelo, [text], [vector])
+        return vector
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+def get_embedding_cache(path: Optional[str] = None) -> EmbeddingCache:
+    """Caché compartida por proceso (una instancia por archivo)"""
+    path = path or os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite")
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = EmbeddingCache(
+                path,
+                max_entradas=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRADAS", 50_000)),
+                max_bytes=int(os.getenv("EMBEDDING_CACHE_MAX_MB", 256)) * 1024 * 1024
+            )
+        return _caches[path]
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("🧪 TEST: CACHÉ DE EMBEDDINGS")
+    print("=" * 80)
+
+    class ContadorEmbeddings(Embeddings):
+        """Embeddings falsos que cuentan las llamadas"""
+
+        def __init__(self):
+            self.llamadas = 0
+
+        def embed_documents(self, texts):
+            self.llamadas += 1
+            return [[float(len(t)), float(sum(map(ord, t)) % 97)] for t in texts]
+
+        def embed_query(self, text):
+            return self.embed_documents([text])[0]
+
+    base = ContadorEmbeddings()
+    cache = EmbeddingCache(":memory:", max_entradas=3)
+    embeddings = CachedEmbeddings(base, cache, "fake-model")
+
+    embeddings.embed_documents(["a", "bb", "a"])
+    embeddings.embed_documents(["a", "bb"])
+    embeddings.embed_query("bb")
+    print(f"\n📞 Llamadas al modelo: {base.llamadas} (esperado: 1)")
+
+    embeddings.embed_documents(["c", "d", "e"])
+    print(f"📊 Stats: {cache.stats()}")
+
+    print("\n" + "=" * 80)
@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+from embedding_cache import EmbeddingCache
+
+class TokenBucket:
+    """Token bucket async: `tasa` unidades por segundo, ráfagas de hasta `capacidad`"""
+
+    def __init__(self, tasa: float, capacidad: float):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self.disponibles = capacidad
+        self.actualizado = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def adquirir(self, cantidad: float = 1):
+        # Una petición más grande que la capacidad espera a tener el bucket lleno
+        cantidad = min(cantidad, self.capacidad)
+        async with self._lock:
+            while True:
+                ahora = time.monotonic()
+                self.disponibles = min(self.capacidad, self.disponibles + (ahora - self.actualizado) * self.tasa)
+                self.actualizado = ahora
+                if self.disponibles >= cantidad:
+                    self.disponibles -= cantidad
+                    return
+                await asyncio.sleep((cantidad - self.disponibles) / self.tasa)
+
+def _reintentable(error: BaseException) -> bool:
+    """429, 5xx, timeouts y errores de conexión; los errores de la petición no se reintentan"""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    nombre = type(error).__name__
+    return isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)) or any(
+        clave in nombre for clave in ("Connection", "Timeout", "RateLimit")
+    )
+
+def _estimar_tokens(texto: str) -> int:
+    return max(1, len(texto) // 4)
+
+class EmbeddingPipeline:
+    """Embeddings de ingesta por lotes: concurrencia acotada, rate limit, reintentos y checkpoints.
+
+    Los textos que ya están en la caché de embeddings no se envían. Cada lote
+    terminado se guarda en `checkpoint_dir`, así que una ejecución interrumpida
+    retoma desde el último lote completo; al terminar se borran sus checkpoints
+    y los de otras ejecuciones que lleven más de `checkpoint_ttl` sin escribirse.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        modelo: str,
+        cache: Optional[EmbeddingCache] = None,
+        tamaño_lote: int = 100,
+        concurrencia: int = 4,
+        rpm: float = 3000,
+        tpm: float = 1_000_000,
+        reintentos: int = 6,
+        checkpoint_dir: str = "data/embedding_checkpoints",
+        checkpoint_ttl: float = 24 * 3600
+    ):
+        self.embeddings = embeddings
+        self.modelo = modelo
+        self.cache = cache
+        self.tamaño_lote = tamaño_lote
+        self.concurrencia = concurrencia
+        self.rpm = rpm
+        self.tpm = tpm
+        self.reintentos = reintentos
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.checkpoint_ttl = checkpoint_ttl
+        self.stats = {"lotes": 0, "lotes_reanudados": 0, "reintentos": 0, "textos_en_cache": 0}
+
+    @classmethod
+    def desde_entorno(cls, embeddings: Embeddings, modelo: str, cache: Optional[EmbeddingCache] = None) -> "EmbeddingPipeline":
+        return cls(
+            embeddings,
+            modelo,
+            cache=cache,
+            tamaño_lote=int(os.getenv("EMBEDDING_LOTE", 100)),
+            concurrencia=int(os.getenv("EMBEDDING_CONCURRENCIA", 4)),
+            rpm=float(os.getenv("EMBEDDING_RPM", 3000)),
+            tpm=float(os.getenv("EMBEDDING_TPM", 1_000_000)),
+            reintentos=int(os.getenv("EMBEDDING_REINTENTOS", 6)),
+            checkpoint_dir=os.getenv("EMBEDDING_CHECKPOINT_DIR", "data/embedding_checkpoints"),
+            checkpoint_ttl=float(os.getenv("EMBEDDING_CHECKPOINT_TTL", 24 * 3600))
+        )
+
+    def _directorio(self, textos: List[str]) -> Path:
+        """Checkpoints de una ejecución: dependen del modelo, el tamaño de lote y los textos"""
+        sha = hashlib.sha256(f"{self.modelo}\x00{self.tamaño_lote}".encode("utf-8"))
+        for texto in textos:
+            sha.update(b"\x00" + texto.encode("utf-8"))
+        return self.checkpoint_dir / sha.hexdigest()[:16]
+
+    async def _embed_lote(self, lote: List[str]) -> List[List[float]]:
+        async for intento in AsyncRetrying(
+            stop=stop_after_attempt(self.reintentos),
+            wait=wait_exponential_jitter(initial=1, max=60),
+            retry=retry_if_exception(_reintentable),
+            reraise=True
+        ):
+            with intento:
+                if intento.retry_state.attempt_number > 1:
+                    self.stats["reintentos"] += 1
+                await self._limite_peticiones.adquirir(1)
+                await self._limite_tokens.adquirir(sum(_estimar_tokens(t) for t in lote))
+                return await self.embeddings.aembed_documents(lote)
+
+    async def aembed(self, textos: List[str]) -> List[List[float]]:
+        """Vectores de `textos`, en el mismo orden"""
+        unicos = list(dict.fromkeys(textos))
+        conocidos: List[Optional[List[float]]] = [None] * len(unicos)
+        if self.cache is not None:
+            conocidos = self.cache.obtener(self.modelo, unicos)
+            self.stats["textos_en_cache"] += sum(v is not None for v in conocidos)
+
+        if any(v is None for v in conocidos):
+            calculados = dict(zip(unicos, await self._embed_pendientes(unicos, conocidos)))
+        else:
+            calculados = dict(zip(unicos, conocidos))
+        return [calculados[t] for t in textos]
+
+    def _limpiar_checkpoints(self, actual: Path):
+        """Borra los checkpoints de esta ejecución y los que llevan más de checkpoint_ttl sin escribirse"""
+        shutil.rmtree(actual, ignore_errors=True)
+        if not self.checkpoint_dir.is_dir():
+            return
+        limite = time.time() - self.checkpoint_ttl
+        for directorio in self.checkpoint_dir.iterdir():
+            # Otra ingesta en curso (o en backoff) o una interrumpida recientemente conserva los suyos
+            if directorio.is_dir() and directorio.stat().st_mtime < limite:
+                shutil.rmtree(directorio, ignore_errors=True)
+
+    async def _embed_pendientes(self, textos: List[str], conocidos: List[Optional[List[float]]]) -> List[List[float]]:
+        self._limite_peticiones = TokenBucket(self.rpm / 60, max(1.0, self.rpm / 60))
+        self._limite_tokens = TokenBucket(self.tpm / 60, max(1.0, self.tpm / 60))
+        semaforo = asyncio.Semaphore(self.concurrencia)
+
+        # Lotes y directorio sobre la entrada completa, no sobre lo que falta en la caché:
+        # así una ejecución reanudada arma los mismos lotes y encuentra sus checkpoints
+        directorio = self._directorio(textos)
+        directorio.mkdir(parents=True, exist_ok=True)
+        os.utime(directorio)  # una ejecución reanudada renueva su TTL
+        rangos = [range(i, min(i + self.tamaño_lote, len(textos))) for i in range(0, len(textos), self.tamaño_lote)]
+
+        async def procesar(numero: int, rango: range) -> np.ndarray:
+            faltan = [i for i in rango if conocidos[i] is None]
+            if not faltan:
+                return np.asarray([conocidos[i] for i in rango], dtype=np.float32)
+
+            checkpoint = directorio / f"lote_{numero:05d}.npy"
+            if checkpoint.exists():
+                self.stats["lotes_reanudados"] += 1
+                return np.load(checkpoint)
+
+            lote = [textos[i] for i in faltan]
+            async with semaforo:
+                nuevos = np.asarray(await self._embed_lote(lote), dtype=np.float32)
+
+            vectores = np.empty((len(rango), nuevos.shape[1]), dtype=np.float32)
+            posiciones = {i: j for j, i in enumerate(faltan)}
+            for j, i in enumerate(rango):
+                vectores[j] = nuevos[posiciones[i]] if i in posiciones else conocidos[i]
+
+            # Escritura atómica: un lote a medio escribir no cuenta como terminado
+            temporal = checkpoint.with_suffix(".tmp.npy")
+            np.save(temporal, vectores)
+            os.replace(temporal, checkpoint)
+            if self.cache is not None:
+                self.cache.guardar(self.modelo, lote, nuevos)
+
+            self.stats["lotes"] += 1
+            print(f"   📦 Lote {numero + 1}/{len(rangos)} ({len(lote)} chunks)")
+            return vectores
+
+        resultados = await asyncio.gather(*(procesar(n, rango) for n, rango in enumerate(rangos)))
+        self._limpiar_checkpoints(directorio)
+        return np.concatenate(resultados).tolist() if resultados else []
+
+    def embed(self, textos: List[str]) -> List[List[float]]:
+        """Versión síncrona (scripts de ingesta); dentro de un event loop usar aembed"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.aembed(textos))
+        raise RuntimeError("EmbeddingPipeline.embed() no puede llamarse con un event loop en curso: usar await aembed()")
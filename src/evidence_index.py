@@ -0,0 +1,104 @@
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+EVIDENCE_FILE = "evidencia.json"
+DOCUMENTO = "PM.2.2.2"
+
+# Criterios de elegibilidad de telecolposcopía (PM.2.2.2 - Público Objetivo)
+# y el texto que los sustenta en el documento fuente
+CRITERIOS = {
+    "edad": re.compile(r"\b25\s*a\s*65\s*años", re.IGNORECASE),
+    "pap": re.compile(r"papanicolau|\bPAP\b", re.IGNORECASE),
+    "pap:AGC": re.compile(r"\bAGC\b"),
+    "pap:ASC-H": re.compile(r"\bASC\s*-\s*H\b"),
+    "pap:LIE-AG": re.compile(r"\bLIE\s*-\s*AG\b"),
+    "pap:CARCINOMA": re.compile(r"\bcarcinoma\b", re.IGNORECASE),
+    "vph": re.compile(r"\bVPH\b[^.]{0,40}positivo", re.IGNORECASE),
+}
+
+PATRON_PAGINA = re.compile(r"--- Página (\d+) ---")
+MAX_CHUNKS = 2
+VENTANA = 400
+
+def clave_pap(pap_resultado: str) -> str:
+    """Clave del criterio PAP: la del valor si es positivo, si no la general"""
+    clave = f"pap:{pap_resultado.upper()}"
+    return clave if clave in CRITERIOS else "pap"
+
+def claves_para(pap_resultado: Optional[str], vph_positivo: Optional[bool]) -> List[str]:
+    """Criterios que intervienen en una validación"""
+    claves = ["edad"]
+    if pap_resultado:
+        claves.append(clave_pap(pap_resultado))
+    if vph_positivo is not None:
+        claves.append("vph")
+    return claves
+
+def _pagina(texto: str, posicion: int) -> Optional[int]:
+    """Última marca de página antes de la posición (si el chunk la incluye)"""
+    paginas = [int(m.group(1)) for m in PATRON_PAGINA.finditer(texto, 0, posicion)]
+    return paginas[-1] if paginas else None
+
+def _fragmento(texto: str, inicio: int) -> str:
+    desde = max(0, inicio - VENTANA // 4)
+    return " ".join(texto[desde:desde + VENTANA].split())
+
+def construir_indice(chunks: Iterable[Tuple[str, Dict]]) -> Dict:
+    """Mapea cada criterio a los chunks de PM.2.2.2 que lo sustentan.
+
+    Se calcula en la ingesta, sin embeddings: los chunks que cubren más
+    criterios (p. ej. la sección Público Objetivo) quedan primero.
+    """
+    candidatos: Dict[str, List[Tuple[int, Dict]]] = {clave: [] for clave in CRITERIOS}
+
+    for texto, metadata in chunks:
+        if not str(metadata.get("source", "")).startswith(DOCUMENTO):
+            continue
+        coincidencias = {clave: patron.search(texto) for clave, patron in CRITERIOS.items()}
+        cubiertos = sum(m is not None for m in coincidencias.values())
+        for clave, match in coincidencias.items():
+            if match is None:
+                continue
+            candidatos[clave].append((cubiertos, {
+                "fuente": metadata.get("source"),
+                "chunk_id": metadata.get("chunk_id"),
+                "pagina": _pagina(texto, match.start()) or metadata.get("page"),
+                "contexto": _fragmento(texto, match.start())
+            }))
+
+    criterios = {}
+    for clave, lista in candidatos.items():
+        # Orden estable: más criterios cubiertos, luego posición en el documento
+        lista.sort(key=lambda c: (-c[0], c[1]["chunk_id"] if c[1]["chunk_id"] is not None else 0))
+        criterios[clave] = [evidencia for _, evidencia in lista[:MAX_CHUNKS]]
+
+    return {"documento": DOCUMENTO, "criterios": criterios}
+
+def leer_evidencia(persist_path: str) -> Optional[Dict]:
+    """evidencia.json de un índice (None si el índice es anterior y no lo tiene)"""
+    path = Path(persist_path) / EVIDENCE_FILE
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("🧪 TEST: ÍNDICE DE EVIDENCIA")
+    print("=" * 80)
+
+    chunks = [
+        ("--- Página 14 ---\nPUBLICO OBJETIVO\nPacientes mujeres entre 25 a 65 años\n"
+         "Pacientes con resultado de Papanicolau (PAP) positivo a lesiones glandulares (AGC), "
+         "ASC -H, LIE-AG y carcinoma y/o aquellas con Test de identificación de ADN para VPH "
+         "positivo de alto riesgo oncogenético.",
+         {"source": "PM.2.2.2 Telecolposcopía", "chunk_id": 39}),
+        ("Pacientes con diabetes y A1C mayor a 9%", {"source": "PM.2.1.2 CENACRON", "chunk_id": 3}),
+    ]
+    indice = construir_indice(chunks)
+    for clave, evidencias in indice["criterios"].items():
+        print(f"\n🔑 {clave}: {[(e['fuente'], e['pagina']) for e in evidencias]}")
+    print(f"\n🔎 Claves para ASC-H + VPH-: {claves_para('asc-h', False)}")
+
+    print("\n" + "=" * 80)
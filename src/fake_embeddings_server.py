@@ -0,0 +1,81 @@
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+def crear_app(dim: int = 1536, tasa_error: float = 0.0, latencia_ms: float = 0.0, semilla: int = 0) -> FastAPI:
+    """Servidor local compatible con POST /v1/embeddings de OpenAI.
+
+    Vectores deterministas por texto; con `tasa_error` responde 429 al azar
+    para probar reintentos y rate limiting de la ingesta.
+    """
+    app = FastAPI(title="Fake Embeddings")
+    azar = random.Random(semilla)
+    app.state.stats = {"peticiones": 0, "errores": 0, "textos": 0}
+
+    def vector(entrada) -> np.ndarray:
+        clave = hashlib.sha256(json.dumps(entrada, ensure_ascii=False).encode("utf-8")).digest()
+        generador = np.random.default_rng(int.from_bytes(clave[:8], "little"))
+        v = generador.standard_normal(dim).astype(np.float32)
+        return v / np.linalg.norm(v)
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        cuerpo = await request.json()
+        app.state.stats["peticiones"] += 1
+        if latencia_ms:
+            await asyncio.sleep(latencia_ms / 1000)
+
+        if azar.random() < tasa_error:
+            app.state.stats["errores"] += 1
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}
+            )
+
+        entradas = cuerpo["input"]
+        # Un solo texto, o una sola lista de tokens, también son válidos
+        if isinstance(entradas, str) or (entradas and isinstance(entradas[0], int)):
+            entradas = [entradas]
+        app.state.stats["textos"] += len(entradas)
+
+        datos = []
+        for indice, entrada in enumerate(entradas):
+            v = vector(entrada)
+            embedding = (
+                base64.b64encode(v.tobytes()).decode("ascii")
+                if cuerpo.get("encoding_format") == "base64" else v.tolist()
+            )
+            datos.append({"object": "embedding", "index": indice, "embedding": embedding})
+
+        tokens = sum(len(e) if isinstance(e, list) else max(1, len(e) // 4) for e in entradas)
+        return {
+            "object": "list",
+            "data": datos,
+            "model": cuerpo.get("model", "fake"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.stats
+
+    return app
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Servidor falso de embeddings (API de OpenAI) para probar la ingesta")
+    parser.add_argument("--puerto", type=int, default=8001)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="Fracción de peticiones que responden 429")
+    parser.add_argument("--latencia-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    print(f"🧪 Fake embeddings en http://localhost:{args.puerto}/v1 (OPENAI_BASE_URL)")
+    uvicorn.run(crear_app(args.dim, args.tasa_error, args.latencia_ms), host="127.0.0.1", port=args.puerto)
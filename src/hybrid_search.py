@@ -0,0 +1,123 @@
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Códigos y siglas se conservan como un solo término ("pm.2.1.2", "lie-ag",
+# "gad-7") y además se indexan sus partes. El separador no admite espacios:
+# "fin. siguiente" son dos términos
+PATRON_TERMINO = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+# Artefacto de extracción de los PDF: "ASC -H", "LIE -AG", "PHQ -9" (espacio solo antes del guion)
+PATRON_GUION_PDF = re.compile(r"(?<=[a-z0-9]) -(?=[a-z0-9])")
+
+STOPWORDS = {
+    "a", "al", "con", "de", "del", "el", "en", "es", "la", "las", "lo", "los",
+    "o", "para", "por", "que", "se", "su", "sus", "un", "una", "y", "como",
+    "cual", "cuales", "son", "le", "les", "mas", "sin", "sobre", "este", "esta"
+}
+
+def _sin_acentos(texto: str) -> str:
+    return "".join(
+        c for c in unicodedata.normalize("NFKD", texto)
+        if not unicodedata.combining(c)
+    )
+
+def tokenizar(texto: str) -> List[str]:
+    """Términos para BM25: minúsculas, sin acentos, códigos completos + partes"""
+    terminos = []
+    texto = PATRON_GUION_PDF.sub("-", _sin_acentos(texto.lower()))
+    for match in PATRON_TERMINO.finditer(texto):
+        termino = match.group(0)
+        partes = re.split(r"[.\-]", termino)
+        if len(partes) > 1:
+            terminos.append(termino)
+        terminos.extend(p for p in partes if p and p not in STOPWORDS)
+    return terminos
+
+class BM25Index:
+    """Índice invertido BM25 en memoria (Okapi BM25, k1/b clásicos)"""
+
+    def __init__(self, textos: Iterable[Tuple[int, str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # término -> [(doc, frecuencia)]
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.longitudes: Dict[int, int] = {}
+
+        for doc_id, texto in textos:
+            terminos = tokenizar(texto)
+            self.longitudes[doc_id] = len(terminos)
+            for termino, frecuencia in Counter(terminos).items():
+                self.postings[termino].append((doc_id, frecuencia))
+
+        self.n_docs = len(self.longitudes)
+        self.longitud_media = (sum(self.longitudes.values()) / self.n_docs) if self.n_docs else 0.0
+        self.idf = {
+            termino: math.log(1 + (self.n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for termino, docs in self.postings.items()
+        }
+
+    def buscar(self, consulta: str, k: int = 10) -> List[Tuple[int, float]]:
+        """[(doc, score)] ordenado por score descendente"""
+        scores: Dict[int, float] = defaultdict(float)
+        for termino in set(tokenizar(consulta)):
+            idf = self.idf.get(termino)
+            if idf is None:
+                continue
+            for doc_id, frecuencia in self.postings[termino]:
+                norma = 1 - self.b + self.b * self.longitudes[doc_id] / self.longitud_media
+                scores[doc_id] += idf * frecuencia * (self.k1 + 1) / (frecuencia + self.k1 * norma)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+def fusion_rrf(rankings: Sequence[Sequence[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Reciprocal rank fusion: sum(1 / (k + rank)) sobre cada ranking"""
+    scores: Dict[int, float] = defaultdict(float)
+    for ranking in rankings:
+        for posicion, doc_id in enumerate(ranking, 1):
+            scores[doc_id] += 1.0 / (k + posicion)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+class CrossEncoderReranker:
+    """Reranker local opcional (cross-encoder de sentence-transformers).
+
+    El modelo se carga en el primer uso; si sentence-transformers no está
+    instalado se lanza ImportError al reordenar.
+    """
+
+    def __init__(self, modelo: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"):
+        self.modelo = modelo
+        self._encoder = None
+
+    def puntuar(self, consulta: str, textos: List[str]) -> List[float]:
+        if self._encoder is None:
+            from sentence_transformers import CrossEncoder
+            self._encoder = CrossEncoder(self.modelo)
+        return [float(s) for s in self._encoder.predict([(consulta, t) for t in textos])]
+
+    def reordenar(self, consulta: str, candidatos: List[Tuple[int, str]], k: Optional[int] = None) -> List[Tuple[int, float]]:
+        """[(doc, score del reranker)] para los candidatos (doc, texto)"""
+        scores = self.puntuar(consulta, [texto for _, texto in candidatos])
+        orden = sorted(zip((doc for doc, _ in candidatos), scores), key=lambda item: item[1], reverse=True)
+        return orden[:k] if k else orden
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("🧪 TEST: BÚSQUEDA HÍBRIDA (BM25 + RRF)")
+    print("=" * 80)
+
+    print(f"\n🔤 Tokens: {tokenizar('Según PM.2.1.2 Anexo 10, el GAD-7 y ASC -H')}")
+
+    textos = [
+        (0, "Pacientes con resultado PAP positivo a lesiones glandulares (AGC), ASC -H, LIE-AG y carcinoma"),
+        (1, "Anexo 10: estratificación de riesgo con PHQ-9 y GAD-7 para salud mental"),
+        (2, "El teleconsultor brinda servicios de telemedicina a la IPRESS consultante"),
+    ]
+    bm25 = BM25Index(textos)
+    for consulta in ["LIE-AG", "GAD-7", "PM.2.1.2 Anexo 10"]:
+        print(f"\n🔍 {consulta}: {bm25.buscar(consulta, k=2)}")
+
+    print(f"\n🔀 RRF: {fusion_rrf([[2, 0, 1], [1, 0]])}")
+
+    print("\n" + "=" * 80)
@@ -0,0 +1,123 @@
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, List
+import faiss
+import numpy as np
+from index_factory import TIPOS_INDICE, configurar_busqueda, crear_indice, descripcion, memoria_bytes
+
+def cargar_vectores(indice_path: str) -> np.ndarray:
+    """Vectores de un índice FAISS existente (p. ej. data/faiss_index)"""
+    index = faiss.read_index(str(Path(indice_path) / "index.faiss"))
+    return index.reconstruct_n(0, index.ntotal)
+
+def vectores_sinteticos(n: int, d: int, semilla: int = 0) -> np.ndarray:
+    """Vectores agrupados en clusters, parecidos a embeddings de texto"""
+    rng = np.random.default_rng(semilla)
+    centros = rng.standard_normal((max(1, n // 50), d)).astype(np.float32)
+    vectores = centros[rng.integers(0, len(centros), n)] + 0.3 * rng.standard_normal((n, d)).astype(np.float32)
+    return vectores.astype(np.float32)
+
+def consultas_desde(vectores: np.ndarray, n: int, ruido: float = 0.05, semilla: int = 1) -> np.ndarray:
+    """Consultas cercanas a vectores de la base (variaciones de chunks existentes)"""
+    rng = np.random.default_rng(semilla)
+    base = vectores[rng.integers(0, len(vectores), n)]
+    escala = ruido * float(np.linalg.norm(vectores, axis=1).mean()) / np.sqrt(vectores.shape[1])
+    return (base + escala * rng.standard_normal(base.shape)).astype(np.float32)
+
+def medir(index: faiss.Index, consultas: np.ndarray, exactos: np.ndarray, k: int) -> Dict:
+    """recall@k contra el índice exacto y latencia por consulta"""
+    latencias = []
+    aciertos = 0
+    for consulta, verdad in zip(consultas, exactos):
+        inicio = time.perf_counter()
+        _, posiciones = index.search(consulta[None, :], k)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        aciertos += len(set(posiciones[0].tolist()) & set(verdad.tolist()))
+
+    return {
+        f"recall@{k}": round(aciertos / (len(consultas) * k), 4),
+        "p50_ms": round(float(np.percentile(latencias, 50)), 4),
+        "p99_ms": round(float(np.percentile(latencias, 99)), 4)
+    }
+
+def benchmark(vectores: np.ndarray, consultas: np.ndarray, tipos: List[str], k: int,
+              nprobes: List[int], ef_searches: List[int]) -> List[Dict]:
+    """Construye cada tipo de índice y lo compara con el flat exacto"""
+    k = min(k, len(vectores))
+    exacto = crear_indice(vectores, {"tipo": "flat"})
+    _, exactos = exacto.search(consultas, k)
+
+    resultados = []
+    for tipo in tipos:
+        config = {"tipo": tipo}
+        inicio = time.perf_counter()
+        index = crear_indice(vectores, config)
+        construccion = time.perf_counter() - inicio
+
+        # Barrido del parámetro de búsqueda de cada familia
+        if tipo in ("ivf", "ivfpq"):
+            barrido = [("nprobe", v) for v in nprobes]
+        elif tipo == "hnsw":
+            barrido = [("ef_search", v) for v in ef_searches]
+        else:
+            barrido = [(None, None)]
+
+        for parametro, valor in barrido:
+            if parametro:
+                configurar_busqueda(index, {parametro: valor})
+            resultados.append({
+                "tipo": tipo,
+                "descripcion": descripcion(config, vectores.shape[1], len(vectores)),
+                "parametro": f"{parametro}={valor}" if parametro else "-",
+                "construccion_s": round(construccion, 3),
+                "memoria_mb": round(memoria_bytes(index) / (1024 * 1024), 3),
+                **medir(index, consultas, exactos, k)
+            })
+
+    return resultados
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de tipos de índice FAISS (recall vs flat, latencia, memoria)")
+    parser.add_argument("--indice-path", default="data/faiss_index", help="Índice del que tomar los vectores")
+    parser.add_argument("--sinteticos", type=int, default=0, help="Usar N vectores sintéticos en lugar del índice")
+    parser.add_argument("--dim", type=int, default=1536, help="Dimensión de los vectores sintéticos")
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--tipos", default=",".join(TIPOS_INDICE))
+    parser.add_argument("--nprobe", default="1,4,16", help="Valores de nprobe a probar (IVF)")
+    parser.add_argument("--ef-search", default="16,64,256", help="Valores de efSearch a probar (HNSW)")
+    parser.add_argument("--json", help="Guardar resultados en este archivo")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("📏 BENCHMARK DE ÍNDICES FAISS")
+    print("=" * 80)
+
+    if args.sinteticos:
+        vectores = vectores_sinteticos(args.sinteticos, args.dim)
+    else:
+        vectores = cargar_vectores(args.indice_path)
+    consultas = consultas_desde(vectores, args.consultas)
+    print(f"\n📦 {len(vectores)} vectores de dimensión {vectores.shape[1]} | {len(consultas)} consultas | k={args.k}\n")
+
+    resultados = benchmark(
+        vectores, consultas,
+        tipos=[t.strip() for t in args.tipos.split(",")],
+        k=args.k,
+        nprobes=[int(v) for v in args.nprobe.split(",")],
+        ef_searches=[int(v) for v in args.ef_search.split(",")]
+    )
+
+    clave_recall = next(c for c in resultados[0] if c.startswith("recall@"))
+    print(f"{'tipo':<7} {'índice':<16} {'parámetro':<14} {clave_recall:>9} {'p50 ms':>8} {'p99 ms':>8} {'MB':>8} {'build s':>8}")
+    for r in resultados:
+        print(f"{r['tipo']:<7} {r['descripcion']:<16} {r['parametro']:<14} {r[clave_recall]:>9.3f} "
+              f"{r['p50_ms']:>8.3f} {r['p99_ms']:>8.3f} {r['memoria_mb']:>8.2f} {r['construccion_s']:>8.2f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(resultados, indent=2), encoding="utf-8")
+        print(f"\n💾 Resultados guardados en {args.json}")
+
+    print("\n" + "=" * 80)
@@ -0,0 +1,108 @@
+import math
+import os
+from typing import Dict
+import faiss
+import numpy as np
+
+TIPOS_INDICE = ("flat", "ivf", "hnsw", "ivfpq")
+
+def config_desde_entorno() -> Dict:
+    """Tipo de índice y parámetros desde variables de entorno"""
+    config = {"tipo": os.getenv("FAISS_INDEX_TYPE", "flat")}
+    for clave, variable in [
+        ("nlist", "FAISS_NLIST"),
+        ("hnsw_m", "FAISS_HNSW_M"),
+        ("pq_m", "FAISS_PQ_M"),
+        ("nprobe", "FAISS_NPROBE"),
+        ("ef_search", "FAISS_EF_SEARCH"),
+    ]:
+        if os.getenv(variable):
+            config[clave] = int(os.getenv(variable))
+    return config
+
+def _nlist(n_vectores: int) -> int:
+    """~4·sqrt(n) listas, con al menos 39 vectores de entrenamiento por lista"""
+    return max(1, min(int(4 * math.sqrt(n_vectores)), n_vectores // 39))
+
+def _pq_m(d: int) -> int:
+    """Subcuantizadores: el mayor divisor de d que deja subvectores de >= 16 dimensiones"""
+    for m in (96, 64, 48, 32, 24, 16, 12, 8, 4, 2, 1):
+        if d % m == 0 and d // m >= 16:
+            return m
+    return 1
+
+def descripcion(config: Dict, d: int, n_vectores: int) -> str:
+    """Cadena de faiss.index_factory para el tipo configurado"""
+    tipo = config.get("tipo", "flat")
+    if tipo not in TIPOS_INDICE:
+        raise ValueError(f"❌ Tipo de índice inválido: {tipo}. Opciones: {', '.join(TIPOS_INDICE)}")
+
+    if tipo == "flat":
+        return "Flat"
+    if tipo == "hnsw":
+        return f"HNSW{config.get('hnsw_m', 32)}"
+
+    nlist = config.get("nlist") or _nlist(n_vectores)
+    if tipo == "ivf":
+        return f"IVF{nlist},Flat"
+
+    # Cada subcuantizador de nbits entrena 2^nbits centroides con >= 39 vectores
+    # cada uno: con pocos datos se reducen los bits (mínimo 4)
+    nbits = max(4, min(8, int(math.log2(max(n_vectores, 1) / 39)) if n_vectores >= 39 else 4))
+    return f"IVF{nlist},PQ{config.get('pq_m') or _pq_m(d)}x{nbits}"
+
+def indice_vacio(vectores: np.ndarray, config: Dict) -> faiss.Index:
+    """Índice entrenado con los vectores pero sin datos (para agregarlos vía LangChain)"""
+    vectores = np.ascontiguousarray(vectores, dtype=np.float32)
+    n, d = vectores.shape
+    index = faiss.index_factory(d, descripcion(config, d, n), faiss.METRIC_L2)
+    if not index.is_trained:
+        index.train(vectores)
+    configurar_busqueda(index, config)
+    return index
+
+def crear_indice(vectores: np.ndarray, config: Dict) -> faiss.Index:
+    """Crea el índice configurado, lo entrena con los vectores y los agrega"""
+    index = indice_vacio(vectores, config)
+    index.add(np.ascontiguousarray(vectores, dtype=np.float32))
+    return index
+
+def configurar_busqueda(index: faiss.Index, config: Dict):
+    """Aplica nprobe (IVF) y efSearch (HNSW) al índice"""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and config.get("nprobe"):
+        ivf.nprobe = min(config["nprobe"], ivf.nlist)
+    if isinstance(index, faiss.IndexHNSW) and config.get("ef_search"):
+        index.hnsw.efSearch = config["ef_search"]
+
+def tipo_de(index: faiss.Index) -> str:
+    """Tipo de un índice ya construido"""
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return "ivfpq" if isinstance(ivf, faiss.IndexIVFPQ) else "ivf"
+    return "flat"
+
+def admite_borrado(index: faiss.Index) -> bool:
+    """HNSW no implementa remove_ids: la ingesta incremental debe reconstruir"""
+    return not isinstance(index, faiss.IndexHNSW)
+
+def memoria_bytes(index: faiss.Index) -> int:
+    """Tamaño serializado del índice (aproxima su huella en memoria)"""
+    return int(faiss.serialize_index(index).nbytes)
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("🧪 TEST: FÁBRICA DE ÍNDICES FAISS")
+    print("=" * 80)
+
+    rng = np.random.default_rng(0)
+    vectores = rng.standard_normal((5000, 64)).astype(np.float32)
+    for tipo in TIPOS_INDICE:
+        config = {"tipo": tipo, "nprobe": 8, "ef_search": 64}
+        index = crear_indice(vectores, config)
+        print(f"\n🧱 {tipo}: {descripcion(config, 64, len(vectores))} | "
+              f"{index.ntotal} vectores | {memoria_bytes(index) / 1024:.0f} KB | borrado: {admite_borrado(index)}")
+
+    print("\n" + "=" * 80)
@@ -0,0 +1,72 @@
+import base64
+import json
+from typing import Callable, Dict, Optional
+from pydantic import BaseModel, ValidationError
+
+# Solo lógica pura: ni LangChain ni FAISS ni NumPy (paquetes chicos, cold start corto).
+# Las tools se construyen en la primera invocación y se reutilizan en las warm.
+_tools: Dict[str, object] = {}
+
+def _risk_tool():
+    if "risk" not in _tools:
+        from tools.risk_tool import RiskStratificationTool
+        _tools["risk"] = RiskStratificationTool()
+    return _tools["risk"]
+
+def _validate_tool():
+    if "validate" not in _tools:
+        from tools.validate_tool import ValidateTelecolposcopiaTool
+        _tools["validate"] = ValidateTelecolposcopiaTool()
+    return _tools["validate"]
+
+def _payload(event) -> dict:
+    """Evento de invoke directo (el payload tal cual) o de API Gateway / Function URL (body)"""
+    if isinstance(event, dict) and isinstance(event.get("body"), str):
+        body = event["body"]
+        if event.get("isBase64Encoded"):
+            body = base64.b64decode(body).decode("utf-8")
+        return json.loads(body or "{}")
+    return event or {}
+
+def _respuesta(status_code: int, cuerpo: dict) -> dict:
+    return {
+        "statusCode": status_code,
+        "headers": {"Content-Type": "application/json"},
+        "body": json.dumps(cuerpo, ensure_ascii=False)
+    }
+
+def _ejecutar(event, modelo: type, funcion: Callable[[BaseModel], dict]) -> dict:
+    try:
+        datos = modelo.model_validate(_payload(event))
+    except json.JSONDecodeError as e:
+        return _respuesta(400, {"error": f"JSON inválido: {e}"})
+    except ValidationError as e:
+        return _respuesta(422, {"error": json.loads(e.json(include_url=False))})
+
+    try:
+        return _respuesta(200, {"result": funcion(datos)})
+    except Exception as e:
+        return _respuesta(500, {"error": str(e)})
+
+def risk_handler(event, context: Optional[object] = None) -> dict:
+    """risk-lambda: estratificación de riesgo PM.2.1.2 Anexo 10"""
+    from tools.risk_tool import RiskInput
+    return _ejecutar(event, RiskInput, lambda datos: _risk_tool().estratificar(**datos.model_dump()))
+
+def validate_handler(event, context: Optional[object] = None) -> dict:
+    """validate-lambda: elegibilidad de telecolposcopía PM.2.2.2 (evidencia desde evidencia.json)"""
+    from tools.validate_tool import ValidateInput
+    return _ejecutar(event, ValidateInput, lambda datos: _validate_tool().validar(**datos.model_dump()))
+
+HANDLERS = {"risk": risk_handler, "validate": validate_handler}
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("🧪 TEST: HANDLERS LAMBDA")
+    print("=" * 80)
+
+    print(f"\n{risk_handler({'a1c': 9.2, 'pa_sistolica': 150, 'pa_diastolica': 95})}")
+    print(f"\n{validate_handler({'body': json.dumps({'edad': 45, 'pap_resultado': 'ASC-H'})})['statusCode']}")
+    print(f"\n{validate_handler({'edad': 'x'})}")
+
+    print("\n" + "=" * 80)
@@ -0,0 +1,208 @@
+import asyncio
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+# Nombre de la función (LAMBDA_RISK_ARN / LAMBDA_VALIDATE_ARN) -> handler empaquetado
+FUNCIONES = {
+    "risk-lambda": RAIZ / "lambda" / "risk_lambda" / "lambda_function.py",
+    "validate-lambda": RAIZ / "lambda" / "validate_lambda" / "lambda_function.py",
+}
+
+PAYLOADS = {
+    "risk-lambda": {"a1c": 9.2, "pa_sistolica": 150, "pa_diastolica": 95, "ldl": 120, "phq9": 6},
+    "validate-lambda": {"edad": 45, "pap_resultado": "ASC-H", "vph_positivo": True},
+}
+
+def cargar_handler(nombre: str):
+    """Importa lambda_function.py de la función como lo hace el runtime (handler = módulo.handler)"""
+    spec = importlib.util.spec_from_file_location(f"lambda_function_{nombre.replace('-', '_')}", FUNCIONES[nombre])
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo.handler
+
+def crear_app() -> FastAPI:
+    """Emulador local de la API Invoke de Lambda (POST /2015-03-31/functions/{nombre}/invocations).
+
+    Cada función se carga en su primera invocación (cold start) y queda en
+    memoria para las siguientes, como un contenedor caliente.
+    """
+    app = FastAPI(title="Lambda local")
+    app.state.handlers = {}
+    app.state.stats = {nombre: {"invocaciones": 0, "errores": 0, "cold_start_ms": None} for nombre in FUNCIONES}
+
+    @app.post("/2015-03-31/functions/{nombre}/invocations")
+    async def invocar(nombre: str, request: Request):
+        if nombre not in FUNCIONES:
+            return JSONResponse(
+                status_code=404,
+                content={"Type": "User", "Message": f"Function not found: {nombre}"},
+                headers={"X-Amzn-ErrorType": "ResourceNotFoundException"}
+            )
+
+        stats = app.state.stats[nombre]
+        stats["invocaciones"] += 1
+        inicio = time.perf_counter()
+        try:
+            evento = json.loads(await request.body() or b"{}")
+            if nombre not in app.state.handlers:
+                app.state.handlers[nombre] = await asyncio.to_thread(cargar_handler, nombre)
+            resultado = await asyncio.to_thread(app.state.handlers[nombre], evento, None)
+        except Exception as e:
+            stats["errores"] += 1
+            return JSONResponse(
+                {"errorMessage": str(e), "errorType": type(e).__name__},
+                headers={"X-Amz-Function-Error": "Unhandled"}
+            )
+
+        if stats["cold_start_ms"] is None:
+            stats["cold_start_ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+        return Response(json.dumps(resultado, ensure_ascii=False), media_type="application/json")
+
+    @app.get("/stats")
+    async def estadisticas():
+        return app.state.stats
+
+    return app
+
+SCRIPT_FRIO = """
+import importlib.util, json, sys, time
+inicio = time.perf_counter()
+spec = importlib.util.spec_from_file_location("lambda_function", sys.argv[1])
+modulo = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(modulo)
+init_ms = (time.perf_counter() - inicio) * 1000
+
+inicio = time.perf_counter()
+respuesta = modulo.handler(json.loads(sys.argv[2]), None)
+primera_ms = (time.perf_counter() - inicio) * 1000
+assert respuesta["statusCode"] == 200, respuesta
+pesados = [m for m in ("langchain", "langchain_core", "faiss", "numpy", "fastapi") if m in sys.modules]
+print(json.dumps({"init_ms": init_ms, "primera_ms": primera_ms, "pesados": pesados}))
+"""
+
+def _percentiles(latencias: List[float]) -> Dict:
+    import numpy as np
+    return {
+        "p50_ms": round(float(np.percentile(latencias, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencias, 99)), 3)
+    }
+
+def medir_frio(nombre: str, repeticiones: int) -> Dict:
+    """Cold start: un proceso nuevo por repetición (init del módulo + primera invocación)"""
+    init, primeras, pesados = [], [], set()
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, "-c", SCRIPT_FRIO, str(FUNCIONES[nombre]), json.dumps(PAYLOADS[nombre])],
+            capture_output=True, text=True, check=True, cwd=RAIZ
+        ).stdout
+        medicion = json.loads(salida.strip().splitlines()[-1])
+        init.append(medicion["init_ms"])
+        primeras.append(medicion["primera_ms"])
+        pesados.update(medicion["pesados"])
+
+    return {
+        "init_ms": _percentiles(init)["p50_ms"],
+        "primera_invocacion_ms": _percentiles(primeras)["p50_ms"],
+        "modulos_pesados": sorted(pesados)
+    }
+
+def medir_caliente(nombre: str, n: int) -> Dict:
+    """Warm: el mismo handler invocado n veces en el proceso"""
+    handler = cargar_handler(nombre)
+    handler(PAYLOADS[nombre], None)
+    latencias = []
+    for _ in range(n):
+        inicio = time.perf_counter()
+        handler(PAYLOADS[nombre], None)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    return _percentiles(latencias)
+
+async def _medir_despacho(despacho, funcion: str, payload: dict, n: int) -> Dict:
+    await despacho.invocar(funcion, payload)
+    latencias = []
+    for _ in range(n):
+        inicio = time.perf_counter()
+        await despacho.invocar(funcion, payload)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    return _percentiles(latencias)
+
+def medir_despacho(n: int, puerto: int) -> Dict:
+    """Extremo a extremo: DespachoLocal frente a DespachoLambda contra el emulador (cliente reutilizado)"""
+    import uvicorn
+    from dispatch import DespachoLambda, DespachoLocal
+    from tools.risk_tool import RiskStratificationTool
+    from tools.validate_tool import ValidateTelecolposcopiaTool
+
+    servidor = uvicorn.Server(uvicorn.Config(crear_app(), host="127.0.0.1", port=puerto, log_level="warning"))
+    hilo = threading.Thread(target=servidor.run, daemon=True)
+    hilo.start()
+    while not servidor.started:
+        time.sleep(0.05)
+
+    despachos = {
+        "local": DespachoLocal(RiskStratificationTool(), ValidateTelecolposcopiaTool()),
+        "lambda": DespachoLambda(endpoint_url=f"http://127.0.0.1:{puerto}"),
+    }
+    try:
+        return {
+            modo: {
+                funcion: asyncio.run(_medir_despacho(despacho, funcion, PAYLOADS[f"{funcion}-lambda"], n))
+                for funcion in ("risk", "validate")
+            }
+            for modo, despacho in despachos.items()
+        }
+    finally:
+        servidor.should_exit = True
+        hilo.join()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Emulador local de risk-lambda / validate-lambda y benchmark de latencia")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    serve = sub.add_parser("serve", help="Emulador de la API Invoke (LAMBDA_ENDPOINT_URL)")
+    serve.add_argument("--puerto", type=int, default=9001)
+    bench = sub.add_parser("bench", help="Latencia cold / warm de los handlers y del despacho")
+    bench.add_argument("--repeticiones", type=int, default=5, help="Procesos nuevos para el cold start")
+    bench.add_argument("-n", type=int, default=1000, help="Invocaciones warm")
+    bench.add_argument("--puerto", type=int, default=9001)
+    bench.add_argument("--sin-despacho", action="store_true", help="Omitir la medición a través del emulador")
+    args = parser.parse_args()
+
+    if args.comando == "serve":
+        import uvicorn
+
+        print(f"🧪 Lambda local en http://127.0.0.1:{args.puerto} (DISPATCH=lambda LAMBDA_ENDPOINT_URL=...)")
+        uvicorn.run(crear_app(), host="127.0.0.1", port=args.puerto)
+        sys.exit(0)
+
+    print("=" * 80)
+    print("🧪 BENCHMARK: HANDLERS LAMBDA")
+    print("=" * 80)
+
+    for nombre in FUNCIONES:
+        frio = medir_frio(nombre, args.repeticiones)
+        caliente = medir_caliente(nombre, args.n)
+        print(f"\n⚡ {nombre}")
+        print(f"   ❄️  cold: init={frio['init_ms']:.1f} ms  primera invocación={frio['primera_invocacion_ms']:.2f} ms"
+              f"  módulos pesados={frio['modulos_pesados'] or 'ninguno'}")
+        print(f"   🔥 warm: p50={caliente['p50_ms']:.3f} ms  p99={caliente['p99_ms']:.3f} ms")
+
+    if not args.sin_despacho:
+        os.environ.setdefault("FAISS_INDEX_PATH", str(RAIZ / "data" / "faiss_index"))
+        for modo, funciones in medir_despacho(args.n, args.puerto).items():
+            for funcion, r in funciones.items():
+                print(f"\n🔀 despacho {modo:6} /{funcion:8} p50={r['p50_ms']:.3f} ms  p99={r['p99_ms']:.3f} ms")
+
+    print("\n" + "=" * 80)
@@ -1,25 +1,91 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
 from tools.risk_tool import RiskStratificationTool
+from tools.risk_batch import BatchRiskStratifier
 from tools.validate_tool import ValidateTelecolposcopiaTool
 from tools.template_tool import GenerateTemplateTool
+from dispatch import ErrorDespacho, crear_despacho
+from stream_processor import StreamScreener, leer_lotes_async, FORMATOS
+from embedding_cache import get_embedding_cache
+from telemetry import TRAZAS, RequestIdMiddleware, configurar_logs, metricas_prometheus
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Precalentamiento en segundo plano al arrancar: 0 (nada), rag (índice FAISS) o agent (índice + agente)
+WARMUP = os.getenv("WARMUP", "agent")
+WARMUP_OPCIONES = ("0", "rag", "agent")
+
+def _cargar_indice():
+    from vectorstore import get_vectorstore
+    return get_vectorstore().vectorstore
+
+async def _precalentar(modo: str):
+    """Carga LangChain/FAISS (y el agente) sin bloquear las peticiones que ya se atienden"""
+    await asyncio.sleep(0)  # ceder el loop: el servidor empieza a escuchar primero
+    inicio = time.perf_counter()
+    try:
+        await asyncio.to_thread(_cargar_indice)
+        if modo == "agent":
+            await get_agent()
+        print(f"🔥 Precalentamiento ({modo}) listo en {time.perf_counter() - inicio:.1f}s")
+    except Exception as e:
+        print(f"⚠️  Precalentamiento ({modo}) falló: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARMUP not in WARMUP_OPCIONES:
+        raise ValueError(f"WARMUP inválido: {WARMUP} (opciones: {', '.join(WARMUP_OPCIONES)})")
+    tarea = asyncio.create_task(_precalentar(WARMUP)) if WARMUP != "0" else None
+    yield
+    if tarea is not None and not tarea.done():
+        tarea.cancel()
+
 app = FastAPI(
     title="CENATE Medical Tools API",
     description="API de herramientas médicas - Proyecto 3",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Request ID por petición (cabecera X-Request-ID) y duración por ruta
+app.add_middleware(RequestIdMiddleware)
+configurar_logs()
+
 # Inicializar tools
 risk_tool = RiskStratificationTool()
+risk_batch = BatchRiskStratifier()
 validate_tool = ValidateTelecolposcopiaTool()
 template_tool = GenerateTemplateTool()
+stream_screener = StreamScreener(risk_tool, validate_tool)
+
+# /risk y /validate en el proceso o en risk-lambda / validate-lambda (DISPATCH)
+despacho = crear_despacho(risk_tool, validate_tool)
+
+# Agente ReAct: se construye al primer uso (requiere OPENAI_API_KEY)
+_agent = None
+_agent_lock = asyncio.Lock()
+
+def _crear_agente():
+    # El import (LangChain, OpenAI) también va fuera del event loop
+    from agent import MedicalAssistantAgent
+    return MedicalAssistantAgent()
+
+async def get_agent():
+    global _agent
+    if _agent is None:
+        async with _agent_lock:
+            if _agent is None:
+                _agent = await asyncio.to_thread(_crear_agente)
+    return _agent
 
 # Servir frontend
 @app.get("/")
@@ -31,13 +97,36 @@ async def root():
     return {
         "message": "CENATE Medical Tools API",
         "status": "operational",
-        "available_endpoints": ["/risk", "/validate", "/template", "/health"]
+        "available_endpoints": ["/risk", "/risk/batch", "/risk/stream", "/validate", "/validate/stream", "/search/batch", "/template", "/template/{tipo}/batch", "/agent", "/agent/stream", "/agent/ws", "/health", "/metrics", "/traces/{request_id}"]
     }
 
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    """Histogramas y contadores en formato de exposición de Prometheus"""
+    return PlainTextResponse(metricas_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/traces/{request_id}")
+async def traza(request_id: str):
+    """Spans (LLM, tools, búsqueda, embeddings) de una petición reciente"""
+    spans = TRAZAS.obtener(request_id)
+    if spans is None:
+        raise HTTPException(status_code=404, detail=f"No hay traza para {request_id}")
+    return {"request_id": request_id, "spans": spans}
+
+@app.get("/stats/embeddings")
+async def embedding_stats():
+    """Hits/misses y tamaño de la caché de embeddings"""
+    return get_embedding_cache().stats()
+
+@app.get("/stats/tools")
+async def tool_stats():
+    """Hits/misses por tool de la caché de resultados del agente (vacía si el agente no se ha creado)"""
+    return _agent.tool_cache.stats() if _agent is not None else {"entradas": 0, "tools": {}}
+
 # Endpoint de estratificación de riesgo
 class RiskRequest(BaseModel):
     a1c: float = None
@@ -51,18 +140,35 @@ class RiskRequest(BaseModel):
 async def estratificar_riesgo(req: RiskRequest):
     """Estratifica riesgo de paciente crónico"""
     try:
-        result = risk_tool.estratificar(
-            a1c=req.a1c,
-            pa_sistolica=req.pa_sistolica,
-            pa_diastolica=req.pa_diastolica,
-            ldl=req.ldl,
-            phq9=req.phq9,
-            gad7=req.gad7
-        )
+        result = await despacho.invocar("risk", req.model_dump())
         return {"result": result}
+    except ErrorDespacho as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detalle)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Endpoint de estratificación en lote (columnar)
+class RiskBatchRequest(BaseModel):
+    a1c: Optional[List[Optional[float]]] = None
+    pa_sistolica: Optional[List[Optional[int]]] = None
+    pa_diastolica: Optional[List[Optional[int]]] = None
+    ldl: Optional[List[Optional[int]]] = None
+    phq9: Optional[List[Optional[int]]] = None
+    gad7: Optional[List[Optional[int]]] = None
+
+@app.post("/risk/batch")
+async def estratificar_riesgo_lote(req: RiskBatchRequest):
+    """Estratifica un lote de pacientes crónicos (una posición por paciente en cada columna)"""
+    try:
+        result = risk_batch.estratificar_lote(**req.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    # JSONResponse directo: evita re-codificar miles de resultados con jsonable_encoder
+    return JSONResponse({"result": result, "total": len(result)})
+
 # Endpoint de validación
 class ValidateRequest(BaseModel):
     edad: int
@@ -73,25 +179,219 @@ class ValidateRequest(BaseModel):
 async def validar_telecolposcopia(req: ValidateRequest):
     """Valida elegibilidad para telecolposcopía"""
     try:
-        result = validate_tool.validar(
-            edad=req.edad,
-            pap_resultado=req.pap_resultado,
-            vph_positivo=req.vph_positivo
-        )
+        result = await despacho.invocar("validate", req.model_dump())
         return {"result": result}
+    except ErrorDespacho as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detalle)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Endpoints de tamizaje masivo (CSV/NDJSON → NDJSON)
+class NDJSONStreamingResponse(StreamingResponse):
+    """StreamingResponse que no escucha desconexiones en receive().
+
+    El StreamingResponse base consume receive() en paralelo y descartaría los
+    bloques del body que todavía se están leyendo durante el stream.
+    """
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+def _stream_ndjson(request: Request, tipo: str, formato: Optional[str], lote: int) -> NDJSONStreamingResponse:
+    """Procesa el body por bloques y responde NDJSON a medida que avanza"""
+    if formato is None:
+        content_type = request.headers.get("content-type", "")
+        formato = "csv" if "csv" in content_type else "ndjson"
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=422, detail=f"Formato '{formato}' no válido (usar: {', '.join(FORMATOS)})")
+    if lote < 1:
+        raise HTTPException(status_code=422, detail="El tamaño de lote debe ser mayor a 0")
+
+    lotes = leer_lotes_async(request.stream(), formato, lote)
+    return NDJSONStreamingResponse(stream_screener.procesar_async(tipo, lotes))
+
+@app.post("/risk/stream")
+async def estratificar_riesgo_stream(request: Request, formato: Optional[str] = None, lote: int = 1000):
+    """Estratifica riesgo para un archivo CSV/NDJSON de pacientes (una línea NDJSON por fila)"""
+    return _stream_ndjson(request, "risk", formato, lote)
+
+@app.post("/validate/stream")
+async def validar_telecolposcopia_stream(request: Request, formato: Optional[str] = None, lote: int = 1000):
+    """Valida elegibilidad para un archivo CSV/NDJSON de pacientes (una línea NDJSON por fila)"""
+    return _stream_ndjson(request, "validate", formato, lote)
+
+# Endpoint de búsqueda en lote
+SEARCH_BATCH_MAX = int(os.getenv("SEARCH_BATCH_MAX", 1000))
+
+class SearchBatchRequest(BaseModel):
+    consultas: List[str]
+    k: int = Field(default=3, ge=1, le=50)
+    modo: Optional[Literal["vector", "hibrido"]] = None
+
+@app.post("/search/batch")
+async def buscar_lote(req: SearchBatchRequest):
+    """Busca varias consultas en los procedimientos con un solo lote de embeddings y una búsqueda FAISS"""
+    if len(req.consultas) > SEARCH_BATCH_MAX:
+        raise HTTPException(status_code=422, detail=f"Máximo {SEARCH_BATCH_MAX} consultas por petición (recibido {len(req.consultas)})")
+
+    try:
+        from vectorstore import get_vectorstore
+        resultados = await asyncio.to_thread(get_vectorstore().search_many, req.consultas, req.k, req.modo)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    result = [{"consulta": c, "resultados": r} for c, r in zip(req.consultas, resultados)]
+    return JSONResponse({"result": result, "total": len(result)})
+
+# Endpoint del agente
+class AgentRequest(BaseModel):
+    pregunta: str
+
+def _serializar_pasos(pasos: list) -> list:
+    """(AgentAction, observación) → dicts JSON"""
+    return [
+        {
+            "tool": accion.tool,
+            "tool_input": accion.tool_input,
+            "observation": observacion if isinstance(observacion, (dict, list, str)) else str(observacion)
+        }
+        for accion, observacion in pasos
+    ]
+
+@app.post("/agent")
+async def consultar_agente(req: AgentRequest):
+    """Consulta al agente ReAct (preguntas idénticas en curso comparten ejecución)"""
+    try:
+        agent = await get_agent()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Agente no disponible: {e}")
+
+    result = await agent.aquery(req.pregunta)
+    # Copia: con coalescing varias solicitudes reciben el mismo dict
+    result = {**result, "intermediate_steps": _serializar_pasos(result.get("intermediate_steps", []))}
+    return {"result": result}
+
+def _evento_json(evento: dict) -> str:
+    if "intermediate_steps" in evento:
+        evento = {**evento, "intermediate_steps": _serializar_pasos(evento["intermediate_steps"])}
+    return json.dumps(evento, ensure_ascii=False, default=str)
+
+@app.get("/agent/stream")
+async def consultar_agente_sse(pregunta: str):
+    """Pasos y tokens del agente como Server-Sent Events (event: <tipo>)"""
+    try:
+        agent = await get_agent()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Agente no disponible: {e}")
+
+    async def eventos():
+        async for evento in agent.astream(pregunta):
+            yield f"event: {evento['tipo']}\ndata: {_evento_json(evento)}\n\n"
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/agent/ws")
+async def consultar_agente_ws(websocket: WebSocket):
+    """WebSocket: enviar {"pregunta": "..."} y recibir un mensaje JSON por evento"""
+    await websocket.accept()
+    try:
+        agent = await get_agent()
+    except Exception as e:
+        await websocket.send_text(json.dumps({"tipo": "error", "error": f"Agente no disponible: {e}"}))
+        await websocket.close(code=1011)
+        return
+
+    try:
+        while True:
+            try:
+                mensaje = json.loads(await websocket.receive_text())
+            except json.JSONDecodeError:
+                await websocket.send_text(json.dumps({"tipo": "error", "error": "Mensaje no es JSON válido"}))
+                continue
+            pregunta = mensaje.get("pregunta") if isinstance(mensaje, dict) else None
+            if not isinstance(pregunta, str) or not pregunta.strip():
+                await websocket.send_text(json.dumps({"tipo": "error", "error": "Falta 'pregunta' (texto)"}))
+                continue
+            async for evento in agent.astream(pregunta):
+                await websocket.send_text(_evento_json(evento))
+    except WebSocketDisconnect:
+        pass
+
 # Endpoint de plantilla
+TEMPLATE_MAX_AGE = int(os.getenv("TEMPLATE_MAX_AGE", 3600))
+
 @app.get("/template/{tipo}")
-async def generar_plantilla(tipo: str):
-    """Genera plantilla HCE: sincrona, asincrona, cenacron"""
+async def generar_plantilla(tipo: str, request: Request):
+    """Genera plantilla HCE: sincrona, asincrona, cenacron (ETag + Cache-Control)"""
     try:
-        result = template_tool.generar(tipo)
-        return {"result": result}
+        plantilla = template_tool.renderer.compilada(tipo)
+    except ValueError:
+        # Tipo inválido: misma respuesta de siempre, con los tipos disponibles
+        return {"result": template_tool.generar(tipo)}
+
+    cabeceras = {"ETag": plantilla.etag, "Cache-Control": f"public, max-age={TEMPLATE_MAX_AGE}"}
+    etags = request.headers.get("if-none-match", "")
+    if plantilla.etag in (e.strip().removeprefix("W/") for e in etags.split(",")) or etags.strip() == "*":
+        return Response(status_code=304, headers=cabeceras)
+    return Response(plantilla.json, media_type="application/json", headers=cabeceras)
+
+class TemplateRiesgo(BaseModel):
+    """Resultado de /risk (la "fuente" y otros campos se ignoran)"""
+    evaluacion: Dict[str, str] = {}
+    recomendaciones: List[str] = []
+
+class TemplatePatient(BaseModel):
+    nombre: Optional[str] = None
+    edad: Optional[int] = None
+    dni: Optional[str] = None
+    fecha: Optional[str] = None
+    hora: Optional[str] = None
+    diagnosticos: Optional[str] = None
+    pap_resultado: Optional[str] = None
+    vph_positivo: Optional[bool] = None
+    # cenacron: resultado de /risk o los valores para estratificar
+    riesgo: Optional[TemplateRiesgo] = None
+    a1c: Optional[float] = None
+    pa_sistolica: Optional[int] = None
+    pa_diastolica: Optional[int] = None
+    ldl: Optional[int] = None
+    phq9: Optional[int] = None
+    gad7: Optional[int] = None
+    marcar: List[str] = []
+
+class TemplateBatchRequest(BaseModel):
+    pacientes: List[TemplatePatient]
+
+@app.post("/template/{tipo}")
+async def llenar_plantilla(tipo: str, req: TemplatePatient):
+    """Plantilla HCE llenada con los datos de un paciente (casillas de riesgo marcadas en cenacron)"""
+    try:
+        result = template_tool.renderer.renderizar(tipo, req.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"result": result}
+
+@app.post("/template/{tipo}/batch")
+async def llenar_plantillas_lote(tipo: str, req: TemplateBatchRequest):
+    """Plantillas HCE de varios pacientes en una sola llamada"""
+    try:
+        result = template_tool.renderer.renderizar_lote(tipo, [p.model_dump() for p in req.pacientes])
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    return JSONResponse({"result": result, "total": len(result)})
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
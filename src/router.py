@@ -0,0 +1,178 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+NUM = r"(\d+(?:[.,]\d+)?)"
+SEP = r"\s*(?:de|:|=|es|en)?\s*"
+
+# Parámetros de riesgo crónico (PM.2.1.2 Anexo 10)
+PATRONES_RIESGO = {
+    "a1c": re.compile(rf"\b(?:hb)?a1c{SEP}{NUM}\s*%?", re.IGNORECASE),
+    "pa": re.compile(rf"\b(?:pa|presi[oó]n(?:\s+arterial)?){SEP}(\d{{2,3}})\s*/\s*(\d{{2,3}})", re.IGNORECASE),
+    "ldl": re.compile(rf"\bldl{SEP}(\d+)", re.IGNORECASE),
+    "phq9": re.compile(rf"\bphq-?9{SEP}(\d+)", re.IGNORECASE),
+    "gad7": re.compile(rf"\bgad-?7{SEP}(\d+)", re.IGNORECASE),
+}
+
+# Criterios de telecolposcopía (PM.2.2.2)
+PATRON_EDAD = re.compile(r"\b(\d{1,3})\s*años|\bedad\s*(?:de|:)?\s*(\d{1,3})\b", re.IGNORECASE)
+CLASES_PAP = r"ASC-H|ASC-US|AGC|LIE-AG|LIE-BG|HSIL|LSIL|CARCINOMA"
+PATRON_CLASE_PAP = re.compile(rf"\b({CLASES_PAP})\b", re.IGNORECASE)
+# El resultado solo cuenta junto a "PAP"/"Papanicolau": "VPH negativo" no es un resultado de PAP
+PATRON_PAP = re.compile(
+    r"\b(?:pap|papanicolao?u)\b(?:\s*(?:resultado|de|:|=|es|con|\())*\s*"
+    rf"({CLASES_PAP}|NEGATIVO|NORMAL)\b",
+    re.IGNORECASE
+)
+PATRON_VPH = re.compile(
+    r"\bvph(?:\s+de\s+alto\s+riesgo)?\s*(\(?\+\)?|\(?-\)?|positivo|negativo)",
+    re.IGNORECASE
+)
+
+# Números que son parte de identificadores, no valores clínicos
+PATRON_IDENTIFICADORES = re.compile(r"\b(?:hb)?a1c\b|\bphq-?9\b|\bgad-?7\b|\bpm\.\d+(?:\.\d+)*", re.IGNORECASE)
+PATRON_NUMERO = re.compile(r"\d+(?:[.,]\d+)?")
+
+# Palabras que indican una consulta de procedimiento (requiere RAG/agente)
+PALABRAS_PROCEDIMIENTO = [
+    "procedimiento", "pasos", "cómo", "como se", "qué es", "que es", "explica",
+    "por qué", "porque", "tratamiento", "medicación", "dosis", "anexo", "responsable",
+    "flujo", "requisitos", "documento"
+]
+
+PLANTILLAS = [
+    ("asincrona", re.compile(r"as[ií]ncron", re.IGNORECASE)),
+    ("sincrona", re.compile(r"s[ií]ncron", re.IGNORECASE)),
+    ("cenacron", re.compile(r"cenacron|cr[oó]nic", re.IGNORECASE)),
+]
+
+def _numero(texto: str) -> float:
+    return float(texto.replace(",", "."))
+
+class FastPathRouter:
+    """Router determinista previo al agente.
+
+    Extrae parámetros estructurados con reglas/regex y decide si la pregunta
+    se puede responder llamando directamente a una tool. La confianza baja si
+    quedan números sin interpretar, si la pregunta mezcla intenciones o si
+    parece una consulta de procedimiento; en esos casos se usa el agente.
+    """
+
+    def __init__(self, confianza_minima: float = 0.9):
+        self.confianza_minima = confianza_minima
+
+    @staticmethod
+    def _cobertura(texto: str, spans: List[Tuple[int, int]]) -> float:
+        """Fracción de números de la pregunta que fueron interpretados"""
+        spans = spans + [m.span() for m in PATRON_IDENTIFICADORES.finditer(texto)]
+        numeros = [m.span() for m in PATRON_NUMERO.finditer(texto)]
+        if not numeros:
+            return 1.0
+        cubiertos = sum(any(a <= i and f <= b for a, b in spans) for i, f in numeros)
+        return cubiertos / len(numeros)
+
+    def _riesgo(self, texto: str) -> Tuple[Dict, List[Tuple[int, int]]]:
+        args: Dict = {}
+        spans = []
+        for nombre, patron in PATRONES_RIESGO.items():
+            match = patron.search(texto)
+            if not match:
+                continue
+            spans.append(match.span())
+            if nombre == "pa":
+                args["pa_sistolica"] = int(match.group(1))
+                args["pa_diastolica"] = int(match.group(2))
+            elif nombre == "a1c":
+                args["a1c"] = _numero(match.group(1))
+            else:
+                args[nombre] = int(match.group(1))
+        return args, spans
+
+    def _validacion(self, texto: str) -> Tuple[Dict, List[Tuple[int, int]], bool]:
+        """Argumentos de validar(), sus spans y si hay más de un resultado de PAP distinto"""
+        args: Dict = {}
+        spans = []
+
+        edad = PATRON_EDAD.search(texto)
+        if edad:
+            args["edad"] = int(edad.group(1) or edad.group(2))
+            spans.append(edad.span())
+
+        vph = PATRON_VPH.search(texto)
+        if vph:
+            valor = vph.group(1).lower()
+            args["vph_positivo"] = "+" in valor or valor == "positivo"
+            spans.append(vph.span())
+
+        paps = [
+            m for m in PATRON_PAP.finditer(texto)
+            if not (vph and m.start(1) < vph.end() and vph.start() < m.end(1))
+        ]
+        if paps:
+            args["pap_resultado"] = paps[0].group(1).upper()
+            spans.extend(m.span() for m in paps)
+
+        return args, spans, len({m.group(1).upper() for m in paps}) > 1
+
+    def route(self, pregunta: str) -> Optional[Dict]:
+        """Retorna {"tool", "args", "confianza"} o None si debe usarse el agente"""
+        texto = pregunta.strip()
+        minusculas = texto.lower()
+        penalizacion = 0.5 if any(p in minusculas for p in PALABRAS_PROCEDIMIENTO) else 1.0
+
+        args_riesgo, spans_riesgo = self._riesgo(texto)
+        args_validacion, spans_validacion, pap_ambiguo = self._validacion(texto)
+        es_validacion = "edad" in args_validacion and (
+            "pap_resultado" in args_validacion or "vph_positivo" in args_validacion
+        )
+
+        candidatos = []
+        if args_riesgo:
+            candidatos.append({
+                "tool": "estratificar_riesgo_cronico",
+                "args": args_riesgo,
+                "confianza": self._cobertura(texto, spans_riesgo) * penalizacion
+            })
+        if es_validacion:
+            candidatos.append({
+                "tool": "validar_criterios_telecolposcopia",
+                "args": args_validacion,
+                # Dos resultados de PAP distintos: que el agente decida cuál aplica
+                "confianza": self._cobertura(texto, spans_validacion) * penalizacion * (0.5 if pap_ambiguo else 1.0)
+            })
+        if not candidatos and "plantilla" in minusculas:
+            for tipo, patron in PLANTILLAS:
+                if patron.search(texto):
+                    candidatos.append({
+                        "tool": "generar_plantilla_hce",
+                        "args": {"tipo": tipo},
+                        "confianza": self._cobertura(texto, []) * penalizacion
+                    })
+                    break
+
+        # Intenciones mezcladas: mejor que decida el agente
+        if len(candidatos) != 1:
+            return None
+
+        ruta = candidatos[0]
+        ruta["confianza"] = round(ruta["confianza"], 2)
+        return ruta if ruta["confianza"] >= self.confianza_minima else None
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("🧪 TEST: ROUTER DETERMINISTA")
+    print("=" * 80)
+
+    router = FastPathRouter()
+    preguntas = [
+        "Tengo un paciente con A1C de 8.5%, presión arterial 155/98 y LDL de 115. ¿Cuál es su nivel de riesgo?",
+        "¿Una paciente de 45 años con PAP resultado ASC-H es elegible para telecolposcopía?",
+        "Paciente de 38 años, VPH positivo, ¿aplica a telecolposcopía?",
+        "Paciente de 40 años con VPH negativo y PAP ASC-H, ¿es elegible para telecolposcopía?",
+        "Genera una plantilla de HCE para atención de pacientes crónicos",
+        "¿Cuáles son los pasos para atender un paciente crónico con diabetes por telemedicina?",
+        "Paciente de 60 años con A1C 9",
+    ]
+    for pregunta in preguntas:
+        print(f"\n❓ {pregunta}\n   → {router.route(pregunta) or 'Agente ReAct'}")
+
+    print("\n" + "=" * 80)
@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+from bisect import bisect_right
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Mapping, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+CRITERIOS_PATH = Path(__file__).resolve().parent.parent / "data" / "criterios" / "criterios.json"
+
+# Código 0 = dato ausente (categoría no evaluada); los niveles van de 1 en adelante
+AUSENTE = 0
+
+# Encabezados de la sección de estratificación en la plantilla HCE
+SECCION_MONITOREO = "FRECUENCIA DE MONITOREO"
+SECCION_DERIVACIONES = "DERIVACIONES NECESARIAS"
+SIN_DERIVACION = "Ninguna"
+
+class ReglaVariable:
+    """Tabla de intervalos de una variable compilada a cortes ordenados.
+
+    Cada tramo es {"menor_que": c} (x < c), {"hasta": c} (x <= c) o el tramo
+    final abierto. "hasta" se compila al siguiente float después de c, así
+    todos los cortes son estrictos y el nivel es codigos[bisect_right(cortes, x)].
+    """
+
+    def __init__(self, nombre: str, tramos: List[dict], codigo_nivel: Mapping[str, int]):
+        if not tramos:
+            raise ValueError(f"Variable '{nombre}' sin tramos")
+
+        cortes, codigos = [], []
+        for i, tramo in enumerate(tramos):
+            if tramo.get("nivel") not in codigo_nivel:
+                raise ValueError(f"Variable '{nombre}': nivel desconocido {tramo.get('nivel')!r}")
+            codigos.append(codigo_nivel[tramo["nivel"]])
+
+            limites = [k for k in ("menor_que", "hasta") if k in tramo]
+            ultimo = i == len(tramos) - 1
+            if ultimo != (not limites) or len(limites) > 1:
+                raise ValueError(f"Variable '{nombre}': solo el último tramo va sin límite y cada tramo lleva uno")
+            if limites:
+                corte = float(tramo[limites[0]])
+                cortes.append(math.nextafter(corte, math.inf) if limites[0] == "hasta" else corte)
+
+        if any(a >= b for a, b in zip(cortes, cortes[1:])):
+            raise ValueError(f"Variable '{nombre}': los límites deben ser crecientes")
+
+        self.nombre = nombre
+        self.cortes = cortes
+        self.codigos = tuple(codigos)
+        self._cortes_np = None
+        self._codigos_np = None
+
+    def nivel(self, valor: float) -> int:
+        return self.codigos[bisect_right(self.cortes, valor)]
+
+    def niveles(self, columna: np.ndarray) -> np.ndarray:
+        """Códigos de nivel de una columna float64 (NaN -> AUSENTE)"""
+        import numpy as np  # solo la ruta en lote: los handlers Lambda no empaquetan NumPy
+        if self._cortes_np is None:
+            self._cortes_np = np.array(self.cortes, dtype=np.float64)
+            self._codigos_np = np.array(self.codigos, dtype=np.uint8)
+        # searchsorted deja los NaN al final: índice válido, se enmascaran después
+        codigos = self._codigos_np[np.searchsorted(self._cortes_np, columna, side="right")]
+        return np.where(np.isnan(columna), np.uint8(AUSENTE), codigos)
+
+class CategoriaRiesgo:
+    """Categoría de riesgo: combina los niveles de sus variables.
+
+    requiere="todas": sin dato si falta alguna variable; "alguna": basta una.
+    El nivel de la categoría es el primero de `prioridad` que tenga alguna
+    variable (por defecto del más alto al más bajo, es decir, el máximo).
+    """
+
+    def __init__(self, config: dict, niveles: List[str]):
+        codigo_nivel = {nivel: i + 1 for i, nivel in enumerate(niveles)}
+        self.nombre = config["nombre"]
+        self.titulo = config.get("titulo", self.nombre.upper())
+        self.variables = [ReglaVariable(v, t, codigo_nivel) for v, t in config["variables"].items()]
+
+        self.requiere = config.get("requiere", "todas")
+        if self.requiere not in ("todas", "alguna"):
+            raise ValueError(f"Categoría '{self.nombre}': requiere debe ser 'todas' o 'alguna'")
+
+        prioridad = config.get("prioridad", list(reversed(niveles)))
+        if sorted(prioridad) != sorted(niveles):
+            raise ValueError(f"Categoría '{self.nombre}': prioridad debe ordenar todos los niveles {niveles}")
+        self.prioridad = tuple(codigo_nivel[n] for n in prioridad)
+
+        etiquetas = config.get("etiquetas", {})
+        desconocidas = set(etiquetas) - set(niveles)
+        if desconocidas:
+            raise ValueError(f"Categoría '{self.nombre}': etiquetas de niveles desconocidos {sorted(desconocidas)}")
+        self.etiquetas = {codigo_nivel[n]: etiquetas.get(n, n) for n in niveles}
+        self.codigo_etiqueta = {etiqueta: codigo for codigo, etiqueta in self.etiquetas.items()}
+
+        derivacion = config.get("derivacion")
+        if derivacion and derivacion.get("nivel") not in codigo_nivel:
+            raise ValueError(f"Categoría '{self.nombre}': nivel de derivación desconocido")
+        self.derivacion = derivacion
+        self.codigo_derivacion = codigo_nivel[derivacion["nivel"]] if derivacion else None
+        self.plantilla = config.get("plantilla", [])
+        if self.plantilla and len(self.plantilla) != len(niveles):
+            raise ValueError(f"Categoría '{self.nombre}': la plantilla lleva una línea por nivel {niveles}")
+
+        # Ruta escalar: tuplas planas para no resolver atributos en cada llamada
+        self._tablas = tuple((v.nombre, v.cortes, v.codigos) for v in self.variables)
+        self._unica = self._tablas[0] if len(self._tablas) == 1 else None
+        self._todas = self.requiere == "todas"
+
+    def _combinar(self, codigos) -> int:
+        for codigo in self.prioridad:
+            if codigo in codigos:
+                return codigo
+        return AUSENTE
+
+    def nivel(self, valores: Mapping[str, Optional[float]]) -> int:
+        if self._unica:
+            nombre, cortes, codigos = self._unica
+            valor = valores.get(nombre)
+            return AUSENTE if valor is None else codigos[bisect_right(cortes, valor)]
+
+        presentes = [
+            codigos[bisect_right(cortes, valor)]
+            for nombre, cortes, codigos in self._tablas
+            if (valor := valores.get(nombre)) is not None
+        ]
+        if not presentes or (self._todas and len(presentes) < len(self._tablas)):
+            return AUSENTE
+        return self._combinar(presentes)
+
+    def niveles(self, columnas: Mapping[str, np.ndarray]) -> np.ndarray:
+        import numpy as np
+        por_variable = [v.niveles(columnas[v.nombre]) for v in self.variables]
+        if len(por_variable) == 1:
+            return por_variable[0]
+
+        condiciones, codigos = [], []
+        if self.requiere == "todas":
+            condiciones.append(np.logical_or.reduce([np.isnan(columnas[v.nombre]) for v in self.variables]))
+            codigos.append(AUSENTE)
+        for codigo in self.prioridad:
+            condiciones.append(np.logical_or.reduce([n == codigo for n in por_variable]))
+            codigos.append(codigo)
+        return np.select(condiciones, codigos, default=AUSENTE).astype(np.uint8)
+
+class MotorRiesgo:
+    """Estratificación de riesgo compilada desde la sección "riesgo" de los criterios"""
+
+    def __init__(self, config: dict):
+        self.fuente = config["fuente"]
+        self.niveles = list(config["niveles"])
+        self.categorias = [CategoriaRiesgo(c, self.niveles) for c in config["categorias"]]
+        self.variables = list(dict.fromkeys(v.nombre for c in self.categorias for v in c.variables))
+
+        codigo_nivel = {nivel: i + 1 for i, nivel in enumerate(self.niveles)}
+        reglas = config["monitoreo"]["reglas"]
+        if not reglas or "si_alguna" in reglas[-1] or any("si_alguna" not in r for r in reglas[:-1]):
+            raise ValueError("Monitoreo: cada regla lleva 'si_alguna' salvo la última (por defecto)")
+        if any(r["si_alguna"] not in codigo_nivel for r in reglas[:-1]):
+            raise ValueError("Monitoreo: nivel desconocido en 'si_alguna'")
+        self.monitoreo = [(codigo_nivel.get(r.get("si_alguna")), r["recomendacion"]) for r in reglas]
+        # Casilla de la plantilla por recomendación (la plantilla va de menor a mayor frecuencia)
+        self.plantilla_monitoreo = {r["recomendacion"]: r["plantilla"] for r in reversed(reglas) if r.get("plantilla")}
+
+        # Base para empaquetar una combinación de códigos en un entero
+        self.base = len(self.niveles) + 1
+        self._resultados: Dict[Tuple[int, ...], Tuple[tuple, tuple]] = {}
+
+    def clasificar(self, **valores) -> Tuple[int, ...]:
+        """Código de nivel por categoría (escalar, bisect)"""
+        return tuple([c.nivel(valores) for c in self.categorias])
+
+    def clasificar_lote(self, **columnas: np.ndarray) -> Dict[str, np.ndarray]:
+        """Códigos de nivel (uint8) por categoría para columnas float64 con NaN"""
+        return {c.nombre: c.niveles(columnas) for c in self.categorias}
+
+    def resultado(self, codigos: Tuple[int, ...]) -> Tuple[tuple, tuple]:
+        """Evaluación y recomendaciones de una combinación de códigos (se arma una vez)"""
+        plantilla = self._resultados.get(codigos)
+        if plantilla is None:
+            evaluacion, recomendaciones = [], []
+            for categoria, codigo in zip(self.categorias, codigos):
+                if codigo == AUSENTE:
+                    continue
+                evaluacion.append((categoria.nombre, categoria.etiquetas[codigo]))
+                if codigo == categoria.codigo_derivacion:
+                    recomendaciones.append(categoria.derivacion["recomendacion"])
+            for nivel, recomendacion in self.monitoreo:
+                if nivel is None or nivel in codigos:
+                    recomendaciones.append(recomendacion)
+                    break
+            plantilla = self._resultados[codigos] = (tuple(evaluacion), tuple(recomendaciones))
+        return plantilla
+
+    def estratificar(self, **valores) -> dict:
+        evaluacion, recomendaciones = self.resultado(tuple([c.nivel(valores) for c in self.categorias]))
+        return {"evaluacion": dict(evaluacion), "recomendaciones": list(recomendaciones), "fuente": self.fuente}
+
+    def empaquetar(self, niveles: Mapping[str, np.ndarray]) -> np.ndarray:
+        """Combinación de códigos por fila como un entero en base len(niveles)+1"""
+        import numpy as np
+        clave = np.zeros(len(next(iter(niveles.values()))), dtype=np.int64)
+        for categoria in self.categorias:
+            clave = clave * self.base + niveles[categoria.nombre]
+        return clave
+
+    def desempaquetar(self, clave: int) -> Tuple[int, ...]:
+        codigos = []
+        for _ in self.categorias:
+            clave, codigo = divmod(clave, self.base)
+            codigos.append(codigo)
+        return tuple(reversed(codigos))
+
+    def casillas(self, evaluacion: Mapping[str, str], recomendaciones: Sequence[str]) -> List[Tuple[str, str]]:
+        """Casillas (sección, línea) de texto_plantilla() que corresponden a un resultado de estratificar()"""
+        marcadas = []
+        for categoria in self.categorias:
+            codigo = categoria.codigo_etiqueta.get(evaluacion.get(categoria.nombre))
+            if codigo and categoria.plantilla:
+                marcadas.append((categoria.titulo, categoria.plantilla[codigo - 1]))
+
+        marcadas.extend(
+            (SECCION_MONITOREO, linea) for recomendacion, linea in self.plantilla_monitoreo.items()
+            if recomendacion in recomendaciones
+        )
+
+        servicios = [
+            c.derivacion["servicio"] for c in self.categorias
+            if c.derivacion and c.derivacion.get("servicio") and c.derivacion["recomendacion"] in recomendaciones
+        ]
+        marcadas.extend((SECCION_DERIVACIONES, s) for s in servicios or [SIN_DERIVACION])
+        return marcadas
+
+    def texto_plantilla(self) -> str:
+        """Sección de estratificación para la plantilla HCE (mismos umbrales que la evaluación)"""
+        bloques = [
+            f"{c.titulo}:\n" + "\n".join(f"☐ {linea}" for linea in c.plantilla)
+            for c in self.categorias if c.plantilla
+        ]
+        bloques.append(f"{SECCION_MONITOREO}:\n" + "\n".join(f"☐ {linea}" for linea in self.plantilla_monitoreo.values()))
+        servicios = [c.derivacion["servicio"] for c in self.categorias if c.derivacion and c.derivacion.get("servicio")]
+        bloques.append(f"{SECCION_DERIVACIONES}:\n" + "\n".join(f"☐ {s}" for s in servicios + [SIN_DERIVACION]))
+        return "ESTRATIFICACIÓN DE RIESGO:\n" + "\n\n".join(bloques)
+
+class CriteriosTelecolposcopia:
+    """Criterios de elegibilidad PM.2.2.2: rango de edad y resultados PAP positivos"""
+
+    def __init__(self, config: dict):
+        self.fuente = config["fuente"]
+        self.edad_min = int(config["edad"]["min"])
+        self.edad_max = int(config["edad"]["max"])
+        if self.edad_min > self.edad_max:
+            raise ValueError("Telecolposcopia: edad.min mayor que edad.max")
+        self.pap_positivos = [p.upper() for p in config["pap_positivos"]]
+        self._pap_positivos = frozenset(self.pap_positivos)
+
+    def edad_valida(self, edad: int) -> bool:
+        return self.edad_min <= edad <= self.edad_max
+
+    def pap_positivo(self, pap_resultado: str) -> bool:
+        return pap_resultado.upper() in self._pap_positivos
+
+class Criterios:
+    """Criterios clínicos versionados (data/criterios/criterios.json) ya compilados"""
+
+    def __init__(self, config: dict, path: str = ""):
+        self.path = path
+        self.version = config.get("version")
+        if not self.version:
+            raise ValueError("Los criterios deben declarar 'version'")
+        self.riesgo = MotorRiesgo(config["riesgo"])
+        self.telecolposcopia = CriteriosTelecolposcopia(config["telecolposcopia"])
+
+_criterios: Dict[str, Criterios] = {}
+
+def cargar_criterios(path: Optional[str] = None) -> Criterios:
+    """Criterios compilados (uno por archivo; CRITERIOS_PATH cambia el archivo por defecto)"""
+    path = str(path or os.getenv("CRITERIOS_PATH") or CRITERIOS_PATH)
+    if path not in _criterios:
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        try:
+            _criterios[path] = Criterios(config, path)
+        except KeyError as e:
+            raise ValueError(f"❌ Criterios inválidos en {path}: falta la clave {e}") from e
+        except ValueError as e:
+            raise ValueError(f"❌ Criterios inválidos en {path}: {e}") from e
+    return _criterios[path]
+
+def recargar_criterios():
+    """Descarta los criterios compilados; el próximo cargar_criterios() relee el archivo"""
+    _criterios.clear()
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("🧪 TEST: MOTOR DE REGLAS")
+    print("=" * 80)
+
+    criterios = cargar_criterios()
+    motor = criterios.riesgo
+    print(f"\n📄 Criterios v{criterios.version} ({criterios.path})")
+    for categoria in motor.categorias:
+        for variable in categoria.variables:
+            print(f"   {categoria.nombre}.{variable.nombre}: cortes {variable.cortes}")
+
+    resultado = motor.estratificar(a1c=11, pa_sistolica=122, pa_diastolica=98, ldl=112, phq9=10, gad7=21)
+    print(f"\n📊 Evaluación: {resultado['evaluacion']}")
+    print(f"⚠️  Recomendaciones: {resultado['recomendaciones']}")
+
+    print("\n" + motor.texto_plantilla())
+    print("\n" + "=" * 80)
@@ -0,0 +1,215 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional
+from pydantic import ValidationError
+from tools.risk_tool import RiskStratificationTool, RiskInput
+from tools.validate_tool import ValidateTelecolposcopiaTool, ValidateInput
+
+FORMATOS = ["csv", "ndjson"]
+TAMANO_BLOQUE = 64 * 1024  # bytes leídos por iteración
+
+class RegistroParser:
+    """Parser incremental de CSV o NDJSON.
+
+    Recibe texto en fragmentos arbitrarios y retorna solo registros completos,
+    guardando el resto para la siguiente llamada. La memoria usada depende del
+    tamaño del fragmento, no del archivo.
+    """
+
+    def __init__(self, formato: str = "csv"):
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato '{formato}' no válido (usar: {', '.join(FORMATOS)})")
+        self.formato = formato
+        self.decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self.resto = ""
+        self.pendiente = ""  # registro CSV con comillas aún abiertas
+        self.columnas: Optional[List[str]] = None
+
+    def alimentar(self, datos: bytes) -> List[dict]:
+        """Procesa un fragmento de bytes y retorna los registros completos"""
+        texto = self.resto + self.decoder.decode(datos)
+
+        # La última parte puede ser una línea incompleta
+        partes = texto.split("\n")
+        self.resto = partes.pop()
+        return self._parsear([p + "\n" for p in partes])
+
+    def cerrar(self) -> List[dict]:
+        """Procesa lo que quede en el buffer al final del stream"""
+        texto = self.resto + self.decoder.decode(b"", final=True)
+        self.resto = ""
+        return self._parsear([texto] if texto else [], final=True)
+
+    def _parsear(self, lineas: List[str], final: bool = False) -> List[dict]:
+        if self.formato == "ndjson":
+            registros = []
+            for linea in lineas:
+                if not linea.strip():
+                    continue
+                try:
+                    registro = json.loads(linea)
+                except json.JSONDecodeError as e:
+                    registro = {"_error": f"JSON inválido: {e}"}
+                if not isinstance(registro, dict):
+                    registro = {"_error": "Cada línea debe ser un objeto JSON"}
+                registros.append(registro)
+            return registros
+
+        # CSV: un registro está completo cuando sus comillas están balanceadas
+        # (las comillas escapadas "" no alteran la paridad)
+        completos = []
+        for linea in lineas:
+            self.pendiente += linea
+            if self.pendiente.count('"') % 2 == 0:
+                completos.append(self.pendiente)
+                self.pendiente = ""
+        if final and self.pendiente:
+            completos.append(self.pendiente)
+            self.pendiente = ""
+
+        registros = []
+        for fila in csv.reader(completos):
+            if not fila:
+                continue
+            if self.columnas is None:
+                self.columnas = [c.strip() for c in fila]
+                continue
+            registros.append(dict(zip(self.columnas, fila)))
+        return registros
+
+def leer_lotes(origen: Iterable[bytes], formato: str, tamano_lote: int = 1000) -> Iterator[List[dict]]:
+    """Agrupa en lotes los registros leídos de un iterable de bytes"""
+    parser = RegistroParser(formato)
+    lote = []
+    for datos in origen:
+        lote.extend(parser.alimentar(datos))
+        while len(lote) >= tamano_lote:
+            yield lote[:tamano_lote]
+            lote = lote[tamano_lote:]
+    lote.extend(parser.cerrar())
+    if lote:
+        yield lote
+
+async def leer_lotes_async(origen: AsyncIterable[bytes], formato: str, tamano_lote: int = 1000) -> AsyncIterator[List[dict]]:
+    """Versión async de leer_lotes (p.ej. para request.stream() de FastAPI)"""
+    parser = RegistroParser(formato)
+    lote = []
+    async for datos in origen:
+        lote.extend(parser.alimentar(datos))
+        while len(lote) >= tamano_lote:
+            yield lote[:tamano_lote]
+            lote = lote[tamano_lote:]
+    lote.extend(parser.cerrar())
+    if lote:
+        yield lote
+
+class StreamScreener:
+    """Tamizaje masivo de riesgo crónico y elegibilidad para telecolposcopía"""
+
+    def __init__(
+        self,
+        risk_tool: Optional[RiskStratificationTool] = None,
+        validate_tool: Optional[ValidateTelecolposcopiaTool] = None
+    ):
+        self.risk_tool = risk_tool
+        self.validate_tool = validate_tool
+
+    @staticmethod
+    def _limpiar(registro: dict) -> dict:
+        """Celdas vacías de CSV = dato ausente"""
+        return {k: (None if v == "" else v) for k, v in registro.items() if k}
+
+    def _riesgo(self, registro: dict) -> dict:
+        datos = RiskInput(**registro)
+        return self.risk_tool.estratificar(**datos.model_dump())
+
+    def _validacion(self, registro: dict) -> dict:
+        datos = ValidateInput(**registro)
+        return self.validate_tool._validar_con_logica(datos.edad, datos.pap_resultado, datos.vph_positivo)
+
+    def procesar_lote(self, tipo: str, lote: List[dict], inicio: int = 0) -> List[dict]:
+        """Evalúa un lote; los errores de una fila no detienen el resto"""
+        evaluar = self._riesgo if tipo == "risk" else self._validacion
+        salida = []
+        for fila, registro in enumerate(lote, inicio + 1):
+            registro = self._limpiar(registro)
+            item: Dict = {"fila": fila}
+            if "id" in registro:
+                item["id"] = registro["id"]
+            if "_error" in registro:
+                item["error"] = registro["_error"]
+                salida.append(item)
+                continue
+            try:
+                item["result"] = evaluar(registro)
+            except ValidationError as e:
+                item["error"] = "; ".join(
+                    f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+                )
+            except Exception as e:
+                item["error"] = str(e)
+            salida.append(item)
+        return salida
+
+    def procesar_ndjson(self, tipo: str, lote: List[dict], inicio: int = 0) -> str:
+        """Evalúa un lote y lo serializa como NDJSON"""
+        resultados = self.procesar_lote(tipo, lote, inicio)
+        return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in resultados)
+
+    def procesar(self, tipo: str, lotes: Iterable[List[dict]]) -> Iterator[str]:
+        """Genera líneas NDJSON a medida que se procesa cada lote"""
+        filas = 0
+        for lote in lotes:
+            yield self.procesar_ndjson(tipo, lote, filas)
+            filas += len(lote)
+
+    async def procesar_async(self, tipo: str, lotes: AsyncIterable[List[dict]]) -> AsyncIterator[str]:
+        """Versión async de procesar"""
+        filas = 0
+        async for lote in lotes:
+            yield self.procesar_ndjson(tipo, lote, filas)
+            filas += len(lote)
+
+def leer_archivo(archivo) -> Iterator[bytes]:
+    """Lee un archivo binario por bloques"""
+    while True:
+        datos = archivo.read(TAMANO_BLOQUE)
+        if not datos:
+            break
+        yield datos
+
+# CLI de tamizaje masivo
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(
+        description="Tamizaje masivo (CSV/NDJSON → NDJSON) de riesgo crónico o elegibilidad telecolposcopía"
+    )
+    parser.add_argument("tipo", choices=["risk", "validate"], help="risk: PM.2.1.2 Anexo 10 | validate: PM.2.2.2")
+    parser.add_argument("entrada", help="Archivo CSV/NDJSON ('-' para stdin)")
+    parser.add_argument("-o", "--salida", default="-", help="Archivo NDJSON de salida ('-' para stdout)")
+    parser.add_argument("-f", "--formato", choices=FORMATOS, help="Por defecto se infiere de la extensión")
+    parser.add_argument("--lote", type=int, default=1000, help="Registros por lote (default: 1000)")
+    args = parser.parse_args()
+
+    formato = args.formato or ("ndjson" if args.entrada.endswith((".ndjson", ".jsonl")) else "csv")
+
+    if args.tipo == "risk":
+        screener = StreamScreener(risk_tool=RiskStratificationTool())
+    else:
+        screener = StreamScreener(validate_tool=ValidateTelecolposcopiaTool())
+
+    entrada = sys.stdin.buffer if args.entrada == "-" else open(args.entrada, "rb")
+    salida = sys.stdout if args.salida == "-" else open(args.salida, "w", encoding="utf-8")
+
+    try:
+        lotes = leer_lotes(leer_archivo(entrada), formato, args.lote)
+        for bloque in screener.procesar(args.tipo, lotes):
+            salida.write(bloque)
+    finally:
+        if entrada is not sys.stdin.buffer:
+            entrada.close()
+        if salida is not sys.stdout:
+            salida.close()
@@ -0,0 +1,295 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Request ID de la petición HTTP en curso (lo fija RequestIdMiddleware)
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Límites de los buckets en segundos: de 1 ms (FAISS, BM25) a 60 s (agente completo)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+logger = logging.getLogger("cenate.trace")
+
+def _etiquetas(etiquetas: Tuple[Tuple[str, str], ...]) -> str:
+    if not etiquetas:
+        return ""
+    valores = ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                       for k, v in etiquetas)
+    return "{" + valores + "}"
+
+class Histogram:
+    """Histograma acumulativo por combinación de etiquetas (formato Prometheus)"""
+
+    def __init__(self, nombre: str, ayuda: str, buckets: Tuple[float, ...] = BUCKETS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.buckets = buckets
+        self._series: Dict[Tuple, List] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, **etiquetas):
+        clave = tuple(sorted(etiquetas.items()))
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * len(self.buckets), 0.0, 0]
+            indice = bisect_left(self.buckets, valor)
+            if indice < len(self.buckets):
+                serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exponer(self) -> List[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._lock:
+            series = [(clave, list(cuentas), suma, total) for clave, (cuentas, suma, total) in self._series.items()]
+        for clave, cuentas, suma, total in sorted(series):
+            acumulado = 0
+            for limite, cuenta in zip(self.buckets, cuentas):
+                acumulado += cuenta
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(clave + (('le', repr(limite)),))} {acumulado}")
+            lineas.append(f"{self.nombre}_bucket{_etiquetas(clave + (('le', '+Inf'),))} {total}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(clave)} {suma:.6f}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(clave)} {total}")
+        return lineas
+
+class Counter:
+    def __init__(self, nombre: str, ayuda: str):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self._series: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, valor: float = 1, **etiquetas):
+        clave = tuple(sorted(etiquetas.items()))
+        with self._lock:
+            self._series[clave] = self._series.get(clave, 0) + valor
+
+    def exponer(self) -> List[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter"]
+        with self._lock:
+            series = sorted(self._series.items())
+        lineas += [f"{self.nombre}{_etiquetas(clave)} {valor:g}" for clave, valor in series]
+        return lineas
+
+SPAN_SECONDS = Histogram("cenate_span_duration_seconds", "Duración de cada etapa (llm, tool, búsqueda, embeddings...)")
+HTTP_SECONDS = Histogram("cenate_http_request_duration_seconds", "Duración de las peticiones HTTP por ruta")
+LLM_TOKENS = Counter("cenate_llm_tokens_total", "Tokens consumidos por el LLM")
+SPAN_ERRORS = Counter("cenate_span_errors_total", "Etapas terminadas con error")
+
+def metricas_prometheus() -> str:
+    """Texto de exposición para GET /metrics"""
+    lineas = []
+    for metrica in (HTTP_SECONDS, SPAN_SECONDS, LLM_TOKENS, SPAN_ERRORS):
+        lineas += metrica.exponer()
+    return "\n".join(lineas) + "\n"
+
+class TraceBuffer:
+    """Spans de las últimas peticiones, por request ID (LRU acotado)"""
+
+    def __init__(self, max_trazas: int = 1000, max_spans: int = 500):
+        self.max_trazas = max_trazas
+        self.max_spans = max_spans
+        self._trazas: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def agregar(self, rid: str, span: Dict):
+        with self._lock:
+            spans = self._trazas.get(rid)
+            if spans is None:
+                spans = self._trazas[rid] = []
+                while len(self._trazas) > self.max_trazas:
+                    self._trazas.popitem(last=False)
+            else:
+                self._trazas.move_to_end(rid)
+            if len(spans) < self.max_spans:
+                spans.append(span)
+
+    def obtener(self, rid: str) -> Optional[List[Dict]]:
+        with self._lock:
+            spans = self._trazas.get(rid)
+            return list(spans) if spans is not None else None
+
+TRAZAS = TraceBuffer(max_trazas=int(os.getenv("TRACE_BUFFER", 1000)))
+
+def logs_activos() -> bool:
+    return os.getenv("TRACE_LOGS", "0") == "1"
+
+def configurar_logs():
+    """Logs estructurados (una línea JSON por span) si TRACE_LOGS=1"""
+    if logs_activos() and not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+def registrar(nombre: str, duracion: float, error: Optional[str] = None, rid: Optional[str] = None,
+              metrica: bool = True, **atributos):
+    """Registra un span ya medido: histograma, traza de la petición y log"""
+    if metrica:
+        SPAN_SECONDS.observar(duracion, span=nombre)
+    if error:
+        SPAN_ERRORS.incrementar(span=nombre)
+
+    rid = rid or request_id.get()
+    span = {"span": nombre, "ms": round(duracion * 1000, 3), "fin": round(time.time(), 3), **atributos}
+    if error:
+        span["error"] = error
+    if rid:
+        TRAZAS.agregar(rid, span)
+    if logs_activos():
+        logger.info(json.dumps({"request_id": rid, **span}, ensure_ascii=False, default=str))
+
+@contextmanager
+def span(nombre: str, **atributos):
+    """Mide un bloque: `with span("faiss.search", k=20): ...`"""
+    inicio = time.perf_counter()
+    error = None
+    try:
+        yield atributos
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        registrar(nombre, time.perf_counter() - inicio, error, **atributos)
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Spans del agente desde los callbacks de LangChain.
+
+    - llm: cada llamada al modelo, con tokens de entrada/salida
+    - tool:<nombre>: cada invocación de tool
+    - agent.iteracion: cada vuelta ReAct (LLM + tool), y agent.total
+    """
+
+    def __init__(self):
+        self._inicios: Dict[UUID, Tuple[float, Optional[str], str]] = {}
+        self._iteraciones: Dict[UUID, List] = {}  # run raíz -> [n, inicio de la vuelta, request ID]
+        self._lock = threading.Lock()
+
+    def _abrir(self, run_id: UUID, nombre: str):
+        with self._lock:
+            self._inicios[run_id] = (time.perf_counter(), request_id.get(), nombre)
+
+    def _cerrar(self, run_id: UUID, error: Optional[BaseException] = None, **atributos):
+        with self._lock:
+            abierto = self._inicios.pop(run_id, None)
+        if abierto is None:
+            return
+        inicio, rid, nombre = abierto
+        registrar(nombre, time.perf_counter() - inicio,
+                  f"{type(error).__name__}: {error}" if error else None, rid=rid, **atributos)
+
+    def _vuelta(self, raiz: Optional[UUID], final: bool = False):
+        """Cierra la iteración ReAct en curso de la ejecución `raiz`"""
+        with self._lock:
+            estado = self._iteraciones.get(raiz)
+            if estado is None:
+                return
+            estado[0] += 1
+            numero, inicio, rid = estado
+            estado[1] = time.perf_counter()
+        registrar("agent.iteracion", estado[1] - inicio, rid=rid, iteracion=numero, final=final)
+
+    # Ejecución del agente (cadena raíz)
+    def on_chain_start(self, serialized, inputs, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs):
+        if parent_run_id is None:
+            self._abrir(run_id, "agent.total")
+            with self._lock:
+                self._iteraciones[run_id] = [0, time.perf_counter(), request_id.get()]
+
+    def on_chain_end(self, outputs, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs):
+        if parent_run_id is None:
+            with self._lock:
+                iteraciones = self._iteraciones.pop(run_id, [0])[0]
+            self._cerrar(run_id, iteraciones=iteraciones)
+
+    def on_chain_error(self, error, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs):
+        if parent_run_id is None:
+            with self._lock:
+                self._iteraciones.pop(run_id, None)
+            self._cerrar(run_id, error)
+
+    def on_agent_finish(self, finish, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs):
+        self._vuelta(run_id, final=True)
+
+    # LLM
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs):
+        self._abrir(run_id, "llm")
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        self._abrir(run_id, "llm")
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        tokens = {"input_tokens": 0, "output_tokens": 0}
+        for generaciones in response.generations:
+            for generacion in generaciones:
+                uso = getattr(getattr(generacion, "message", None), "usage_metadata", None) or {}
+                for clave in tokens:
+                    tokens[clave] += int(uso.get(clave, 0))
+        for clave, valor in tokens.items():
+            if valor:
+                LLM_TOKENS.incrementar(valor, tipo=clave.replace("_tokens", ""))
+        self._cerrar(run_id, **tokens)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        self._cerrar(run_id, error)
+
+    # Tools
+    def on_tool_start(self, serialized, input_str, *, run_id: UUID, **kwargs):
+        self._abrir(run_id, f"tool:{(serialized or {}).get('name', 'desconocida')}")
+
+    def on_tool_end(self, output, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs):
+        self._cerrar(run_id)
+        self._vuelta(parent_run_id)
+
+    def on_tool_error(self, error, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs):
+        self._cerrar(run_id, error)
+        self._vuelta(parent_run_id)
+
+class RequestIdMiddleware:
+    """Middleware ASGI: request ID (X-Request-ID o nuevo) y duración por ruta.
+
+    ASGI puro para no envolver las respuestas en streaming (NDJSON, SSE).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        cabeceras = dict(scope.get("headers") or [])
+        rid = cabeceras.get(b"x-request-id", b"").decode("latin-1")[:64] or uuid.uuid4().hex
+        token = request_id.set(rid)
+        estado = {"status": 500}
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado["status"] = mensaje["status"]
+                mensaje["headers"] = list(mensaje.get("headers", [])) + [(b"x-request-id", rid.encode("latin-1"))]
+            await send(mensaje)
+
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracion = time.perf_counter() - inicio
+            # Plantilla de la ruta (/template/{tipo}), no la URL: cardinalidad acotada
+            ruta = getattr(scope.get("route"), "path", "sin_ruta")
+            metodo = scope.get("method", "WS")
+            HTTP_SECONDS.observar(duracion, ruta=ruta, metodo=metodo, status=str(estado["status"]))
+            registrar("http", duracion, rid=rid, metrica=False, ruta=ruta, metodo=metodo, status=estado["status"])
+            request_id.reset(token)
@@ -0,0 +1,187 @@
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+# Por tool: segundos de vida, argumentos de texto libre que se comparan sin mayúsculas
+# ni espacios extra, y si el resultado depende del índice FAISS
+TOOLS_MEMOIZADAS = {
+    "search_medical_procedures": {"ttl": "busqueda", "plegar": ("query",), "indice": True},
+    "estratificar_riesgo_cronico": {"ttl": "logica"},
+    "validar_criterios_telecolposcopia": {"ttl": "logica"},
+    "generar_plantilla_hce": {"ttl": "logica"},
+}
+
+def _canonico(valor: Any, plegar: bool = False) -> Any:
+    if isinstance(valor, bool) or valor is None:
+        return valor
+    if isinstance(valor, (int, float)):
+        return float(valor)  # 150, 150.0 y "150" (ya validado por el args_schema) son la misma clave
+    if isinstance(valor, str):
+        return " ".join(valor.lower().split()) if plegar else valor
+    if isinstance(valor, (list, tuple)):
+        return tuple(_canonico(v, plegar) for v in valor)
+    return repr(valor)
+
+def _es_error(resultado: Any) -> bool:
+    # search_medical_procedures devuelve el error como observación: no se memoiza
+    return isinstance(resultado, str) and resultado.startswith("❌ Error")
+
+class ToolResultCache:
+    """Resultados de las tools del agente por argumentos normalizados.
+
+    Una llamada repetida (en la misma ejecución ReAct o en otra) devuelve la
+    observación ya calculada, sin volver a buscar ni a formatear. Las entradas
+    expiran según el TTL de su tool, se eliminan por LRU al superar el máximo
+    y las de búsqueda dejan de valer cuando cambia la versión del índice FAISS.
+    """
+
+    def __init__(
+        self,
+        ttls: Dict[str, float],
+        max_entradas: int = 2000,
+        version_indice: Optional[Callable[[], Optional[str]]] = None
+    ):
+        self.ttls = ttls
+        self.max_entradas = max_entradas
+        self.version_indice = version_indice or (lambda: None)
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        # (tool, argumentos normalizados) -> {resultado, expira, version}
+        self._entradas: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def clave(tool: str, argumentos: Dict[str, Any]) -> Tuple:
+        plegar = TOOLS_MEMOIZADAS.get(tool, {}).get("plegar", ())
+        # None equivale a omitir el argumento (todas las tools lo tienen como default)
+        return (tool, tuple(sorted(
+            (nombre, _canonico(valor, nombre in plegar))
+            for nombre, valor in argumentos.items() if valor is not None
+        )))
+
+    def _version(self, tool: str) -> Optional[str]:
+        return self.version_indice() if TOOLS_MEMOIZADAS.get(tool, {}).get("indice") else None
+
+    def buscar(self, tool: str, argumentos: Dict[str, Any]) -> Tuple[bool, Any]:
+        """(True, resultado) si hay una entrada vigente; (False, None) si no"""
+        clave = self.clave(tool, argumentos)
+        version = self._version(tool)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and (entrada["expira"] < time.monotonic() or entrada["version"] != version):
+                del self._entradas[clave]
+                entrada = None
+            if entrada is None:
+                self.misses[tool] = self.misses.get(tool, 0) + 1
+                return False, None
+            self._entradas.move_to_end(clave)
+            self.hits[tool] = self.hits.get(tool, 0) + 1
+            return True, entrada["resultado"]
+
+    def guardar(self, tool: str, argumentos: Dict[str, Any], resultado: Any):
+        if _es_error(resultado):
+            return
+        clave = self.clave(tool, argumentos)
+        # Versión leída después de la llamada: la primera búsqueda es la que carga el índice
+        entrada = {
+            "resultado": resultado,
+            "expira": time.monotonic() + self.ttls.get(tool, 0),
+            "version": self._version(tool)
+        }
+        with self._lock:
+            self._entradas[clave] = entrada
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, tools: Optional[Iterable[str]] = None):
+        """Borra todo, o solo las entradas de las tools indicadas"""
+        with self._lock:
+            if tools is None:
+                self._entradas.clear()
+                return
+            tools = set(tools)
+            for clave in [c for c in self._entradas if c[0] in tools]:
+                del self._entradas[clave]
+
+    def memoizar(self, tool):
+        """Copia del StructuredTool cuya func/coroutine consulta la caché antes de ejecutar"""
+        nombre, func, coroutine = tool.name, tool.func, tool.coroutine
+        if nombre not in self.ttls or self.max_entradas <= 0:
+            return tool
+
+        firma = inspect.signature(func or coroutine)
+
+        def _argumentos(args, kwargs) -> Dict[str, Any]:
+            # El agente ReAct pasa el Action Input como argumento posicional
+            return firma.bind(*args, **kwargs).arguments
+
+        def ejecutar(*args, **kwargs):
+            argumentos = _argumentos(args, kwargs)
+            encontrado, resultado = self.buscar(nombre, argumentos)
+            if not encontrado:
+                resultado = func(*args, **kwargs)
+                self.guardar(nombre, argumentos, resultado)
+            return resultado
+
+        async def aejecutar(*args, **kwargs):
+            argumentos = _argumentos(args, kwargs)
+            encontrado, resultado = self.buscar(nombre, argumentos)
+            if not encontrado:
+                resultado = await coroutine(*args, **kwargs)
+                self.guardar(nombre, argumentos, resultado)
+            return resultado
+
+        return tool.model_copy(update={
+            "func": ejecutar if func else None,
+            "coroutine": aejecutar if coroutine else None
+        })
+
+    def stats(self) -> dict:
+        with self._lock:
+            por_tool = {}
+            for tool in sorted(set(self.hits) | set(self.misses)):
+                hits, misses = self.hits.get(tool, 0), self.misses.get(tool, 0)
+                por_tool[tool] = {"hits": hits, "misses": misses, "hit_rate": round(hits / (hits + misses), 4)}
+            return {"entradas": len(self._entradas), "tools": por_tool}
+
+def crear_tool_cache(version_indice: Optional[Callable[[], Optional[str]]] = None) -> ToolResultCache:
+    """Caché con los TTL de TOOL_CACHE_TTL_BUSQUEDA / TOOL_CACHE_TTL (TOOL_CACHE_MAX_ENTRADAS=0 la desactiva)"""
+    ttls = {
+        "busqueda": float(os.getenv("TOOL_CACHE_TTL_BUSQUEDA", 600)),
+        "logica": float(os.getenv("TOOL_CACHE_TTL", 3600))
+    }
+    return ToolResultCache(
+        {tool: ttls[config["ttl"]] for tool, config in TOOLS_MEMOIZADAS.items()},
+        max_entradas=int(os.getenv("TOOL_CACHE_MAX_ENTRADAS", 2000)),
+        version_indice=version_indice
+    )
+
+if __name__ == "__main__":
+    import sys
+    from pathlib import Path
+    sys.path.append(str(Path(__file__).parent))
+    from tools.risk_tool import RiskStratificationTool
+    from tools.template_tool import GenerateTemplateTool
+
+    print("=" * 80)
+    print("🧪 TEST: CACHÉ DE RESULTADOS DE TOOLS")
+    print("=" * 80)
+
+    cache = crear_tool_cache()
+    risk = cache.memoizar(RiskStratificationTool().as_tool())
+    template = cache.memoizar(GenerateTemplateTool().as_tool())
+
+    for args in ({"a1c": 9.2, "pa_sistolica": 150}, {"a1c": "9.20", "pa_sistolica": 150.0}, {"a1c": 6.5}):
+        inicio = time.perf_counter()
+        resultado = risk.invoke(args)
+        print(f"\n📊 {args} -> {resultado['evaluacion']} ({(time.perf_counter() - inicio) * 1000:.3f} ms)")
+
+    template.invoke({"tipo": "cenacron"})
+    template.invoke({"tipo": "cenacron"})
+    print(f"\n📈 {cache.stats()}")
+
+    print("\n" + "=" * 80)
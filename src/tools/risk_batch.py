@@ -0,0 +1,104 @@
+import numpy as np
+from typing import Optional, List, Sequence, Dict
+import sys
+from pathlib import Path
+
+# Agregar path para imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from tools.risk_tool import RiskStratificationTool
+
+class BatchRiskStratifier:
+    """Motor columnar de estratificación de riesgo (PM.2.1.2 Anexo 10).
+
+    Clasifica columnas completas de A1C/PA/LDL/PHQ-9/GAD-7 con las mismas
+    tablas de intervalos que RiskStratificationTool.estratificar (searchsorted
+    en lugar de bisect). Los valores None se tratan como dato ausente.
+    """
+
+    def __init__(self):
+        self.motor = RiskStratificationTool().motor
+        self.fuente = self.motor.fuente
+
+    @staticmethod
+    def _columna(valores: Optional[Sequence], n: int) -> np.ndarray:
+        """Convierte una columna a float64 con NaN para valores ausentes"""
+        if valores is None:
+            return np.full(n, np.nan)
+        if len(valores) != n:
+            raise ValueError(f"Todas las columnas deben tener {n} valores (recibido {len(valores)})")
+        # NumPy convierte None en NaN al forzar dtype float64
+        return np.array(valores, dtype=np.float64)
+
+    def clasificar(
+        self,
+        a1c: Optional[Sequence[Optional[float]]] = None,
+        pa_sistolica: Optional[Sequence[Optional[int]]] = None,
+        pa_diastolica: Optional[Sequence[Optional[int]]] = None,
+        ldl: Optional[Sequence[Optional[int]]] = None,
+        phq9: Optional[Sequence[Optional[int]]] = None,
+        gad7: Optional[Sequence[Optional[int]]] = None
+    ) -> Dict[str, np.ndarray]:
+        """Retorna un array de códigos de nivel (uint8) por categoría"""
+        columnas = {
+            "a1c": a1c, "pa_sistolica": pa_sistolica, "pa_diastolica": pa_diastolica,
+            "ldl": ldl, "phq9": phq9, "gad7": gad7
+        }
+        n = max((len(c) for c in columnas.values() if c is not None), default=0)
+        return self.motor.clasificar_lote(**{k: self._columna(c, n) for k, c in columnas.items()})
+
+    def estratificar_lote(self, **columnas) -> List[dict]:
+        """Estratifica un lote de pacientes; mismo formato por fila que estratificar()"""
+        niveles = self.clasificar(**columnas)
+
+        # Cada paciente cae en una de las combinaciones de códigos: se arma una sola vez por combinación
+        unicas, inversa = np.unique(self.motor.empaquetar(niveles), return_inverse=True)
+        plantillas = [self.motor.resultado(self.motor.desempaquetar(int(k))) for k in unicas]
+
+        fuente = self.fuente
+        return [
+            {
+                "evaluacion": dict(plantillas[i][0]),
+                "recomendaciones": list(plantillas[i][1]),
+                "fuente": fuente
+            }
+            for i in inversa.tolist()
+        ]
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    print("=" * 80)
+    print("🧪 TEST: ESTRATIFICACIÓN DE RIESGO EN LOTE")
+    print("=" * 80)
+
+    random.seed(0)
+    n = 100_000
+
+    def quizas(valor):
+        return None if random.random() < 0.1 else valor
+
+    columnas = {
+        "a1c": [quizas(round(random.uniform(5, 12), 1)) for _ in range(n)],
+        "pa_sistolica": [quizas(random.randint(100, 190)) for _ in range(n)],
+        "pa_diastolica": [quizas(random.randint(60, 120)) for _ in range(n)],
+        "ldl": [quizas(random.randint(40, 190)) for _ in range(n)],
+        "phq9": [quizas(random.randint(0, 27)) for _ in range(n)],
+        "gad7": [quizas(random.randint(0, 21)) for _ in range(n)]
+    }
+
+    motor = BatchRiskStratifier()
+    inicio = time.perf_counter()
+    resultados = motor.estratificar_lote(**columnas)
+    duracion = time.perf_counter() - inicio
+    print(f"\n⚡ {n} pacientes en {duracion * 1000:.1f} ms")
+
+    # Verificar equivalencia con la versión escalar
+    escalar = RiskStratificationTool()
+    for i in range(n):
+        esperado = escalar.estratificar(**{k: v[i] for k, v in columnas.items()})
+        assert resultados[i] == esperado, (i, resultados[i], esperado)
+    print("✅ Resultados idénticos a estratificar()")
+
+    print("\n" + "=" * 80)
@@ -1,6 +1,12 @@
-from langchain.tools import StructuredTool
 from pydantic import BaseModel, Field
 from typing import Optional, List
+import sys
+from pathlib import Path
+
+# Agregar path para imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from rules_engine import cargar_criterios
 
 class RiskInput(BaseModel):
     a1c: Optional[float] = Field(default=None, description="Hemoglobina A1C (%)")
@@ -12,7 +18,9 @@ class RiskInput(BaseModel):
 
 class RiskStratificationTool:
     def __init__(self):
-        self.fuente = "PM.2.1.2 Anexo 10 - Criterios de Estandarización de Riesgo"
+        # Umbrales, derivaciones y monitoreo compilados desde los criterios versionados
+        self.motor = cargar_criterios().riesgo
+        self.fuente = self.motor.fuente
 
     def estratificar(
         self,
@@ -23,69 +31,26 @@ class RiskStratificationTool:
         phq9: Optional[int] = None,
         gad7: Optional[int] = None
     ) -> dict:
-        """Estratifica riesgo según criterios PM.2.1.2 Anexo 10"""
-
-        evaluacion = {}
-        recomendaciones = []
-
-        # DIABETES (A1C)
-        if a1c is not None:
-            if a1c < 7:
-                evaluacion["diabetes"] = "Bajo"
-            elif 7 <= a1c <= 8:
-                evaluacion["diabetes"] = "Moderado"
-            else:  # a1c > 8
-                evaluacion["diabetes"] = "Alto"
-                recomendaciones.append("Derivar a endocrinología")
-
-        # HIPERTENSIÓN
-        if pa_sistolica is not None and pa_diastolica is not None:
-            if pa_sistolica < 140 and pa_diastolica < 90:
-                evaluacion["hipertension"] = "Controlado"
-            elif (140 <= pa_sistolica < 160) or (90 <= pa_diastolica < 100):
-                evaluacion["hipertension"] = "Moderado"
-            else:  # PA >= 160/100
-                evaluacion["hipertension"] = "Alto"
-                recomendaciones.append("Derivar a cardiología")
-
-        # DISLIPIDEMIA (LDL)
-        if ldl is not None:
-            if ldl < 70:
-                evaluacion["dislipidemia"] = "Bajo"
-            elif 70 <= ldl <= 100:
-                evaluacion["dislipidemia"] = "Moderado"
-            else:  # ldl > 100
-                evaluacion["dislipidemia"] = "Alto"
-
-        # SALUD MENTAL
-        if phq9 is not None or gad7 is not None:
-            scores = [s for s in [phq9, gad7] if s is not None]
-            max_score = max(scores)
-
-            if max_score < 5:
-                evaluacion["psicologico"] = "Bajo"
-            elif 5 <= max_score <= 9:
-                evaluacion["psicologico"] = "Moderado"
-            else:  # >= 10
-                evaluacion["psicologico"] = "Alto"
-                recomendaciones.append("Derivar a psiquiatría")
-
-        # Determinar frecuencia de monitoreo
-        niveles_alto = [v for v in evaluacion.values() if v == "Alto"]
-        if niveles_alto:
-            recomendaciones.append("Control mensual requerido")
-        else:
-            recomendaciones.append("Control trimestral")
+        """Estratifica riesgo según criterios PM.2.1.2 Anexo 10 (data/criterios/criterios.json)"""
+        return self.motor.estratificar(
+            a1c=a1c,
+            pa_sistolica=pa_sistolica,
+            pa_diastolica=pa_diastolica,
+            ldl=ldl,
+            phq9=phq9,
+            gad7=gad7
+        )
 
-        return {
-            "evaluacion": evaluacion,
-            "recomendaciones": recomendaciones,
-            "fuente": self.fuente
-        }
+    async def aestratificar(self, **kwargs) -> dict:
+        """Versión async para el agente (lógica pura, no bloquea el event loop)"""
+        return self.estratificar(**kwargs)
 
     def as_tool(self):
+        # LangChain solo se importa al construir el agente (arranque rápido de la API)
+        from langchain.tools import StructuredTool
         return StructuredTool.from_function(
             func=self.estratificar,
+            coroutine=self.aestratificar,
             name="estratificar_riesgo_cronico",
             description="Estratifica riesgo de pacientes crónicos según PM.2.1.2 Anexo 10: diabetes (A1C), hipertensión (PA), dislipidemia (LDL), salud mental (PHQ-9/GAD-7)",
             args_schema=RiskInput
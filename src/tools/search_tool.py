@@ -7,41 +7,54 @@ import os
 # Añadir path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from vectorstore import MedicalVectorStore
+from vectorstore import get_vectorstore
 
 class SearchInput(BaseModel):
     query: str = Field(description="Consulta médica en lenguaje natural")
 
 class SearchMedicalTool:
     def __init__(self):
-        self.vectorstore = MedicalVectorStore()
+        self.vectorstore = get_vectorstore()
 
     def search(self, query: str) -> str:
         """Busca en procedimientos médicos de CENATE"""
         try:
             results = self.vectorstore.search(query, n_results=3)
+            return self._formatear(results)
 
-            if not results:
-                return "❌ No se encontraron procedimientos relevantes."
+        except Exception as e:
+            return f"❌ Error: {str(e)}"
 
-            response = "📋 Información encontrada:\n\n"
+    async def asearch(self, query: str) -> str:
+        """Versión async de search"""
+        try:
+            results = await self.vectorstore.asearch(query, n_results=3)
+            return self._formatear(results)
 
-            for i, result in enumerate(results, 1):
-                source = result['metadata']['source']
-                score = result['score']
-                content = result['content']
+        except Exception as e:
+            return f"❌ Error: {str(e)}"
 
-                response += f"📄 Fuente {i}: {source} (Score: {score:.2%})\n"
-                response += f"{content[:300]}...\n\n---\n\n"
+    @staticmethod
+    def _formatear(results: List[Dict]) -> str:
+        if not results:
+            return "❌ No se encontraron procedimientos relevantes."
 
-            return response
+        response = "📋 Información encontrada:\n\n"
 
-        except Exception as e:
-            return f"❌ Error: {str(e)}"
+        for i, result in enumerate(results, 1):
+            source = result['metadata']['source']
+            score = result['score']
+            content = result['content']
+
+            response += f"📄 Fuente {i}: {source} (Score: {score:.2%})\n"
+            response += f"{content[:300]}...\n\n---\n\n"
+
+        return response
 
     def as_tool(self):
         return StructuredTool.from_function(
             func=self.search,
+            coroutine=self.asearch,
             name="search_medical_procedures",
             description="""Busca información en procedimientos de telemedicina de CENATE.
             Usa cuando necesites info sobre: pacientes crónicos, telecolposcopía, protocolos.""",
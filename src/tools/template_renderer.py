@@ -0,0 +1,203 @@
+import hashlib
+import json
+import re
+from typing import Dict, List, Mapping, Optional, Tuple
+import sys
+from pathlib import Path
+
+# Agregar path para imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from rules_engine import MotorRiesgo
+
+CASILLA, MARCADA = "☐", "☑"
+
+# Campos en blanco de las plantillas -> clave en los datos del paciente
+CAMPOS = {
+    "FECHA": "fecha",
+    "HORA": "hora",
+    "Nombre": "nombre",
+    "Edad": "edad",
+    "DNI": "dni",
+    "Resultado PAP": "pap_resultado",
+    "Resultado VPH": "vph_positivo",
+    "Diagnósticos": "diagnosticos",
+}
+
+PATRON_SLOT = re.compile(
+    rf"(?P<casilla>{CASILLA})|(?P<campo>{'|'.join(re.escape(c) for c in CAMPOS)}): (?P<blanco>_[_/]*_)"
+)
+PATRON_ETIQUETA = re.compile(rf"\s*([^{CASILLA}\n]*)")
+
+VARIABLES_RIESGO = ("a1c", "pa_sistolica", "pa_diastolica", "ldl", "phq9", "gad7")
+
+# Combinaciones de riesgo recordadas (los resultados del motor son unas pocas centenas)
+MAX_COMBINACIONES = 4096
+
+class PlantillaCompilada:
+    """Plantilla HCE partida en texto fijo y slots (casillas y campos en blanco).
+
+    render() solo sustituye los slots con datos y une las partes: el texto
+    no se vuelve a recorrer por paciente.
+    """
+
+    def __init__(self, tipo: str, texto: str, fuente: str):
+        self.tipo = tipo
+        self.texto = texto
+        self.fuente = fuente
+
+        self.partes: List[str] = []
+        self.blancos: List[str] = []
+        self.campos: Dict[str, int] = {}
+        self.casillas: Dict[Tuple[str, str], int] = {}
+        self.por_etiqueta: Dict[str, List[int]] = {}
+
+        inicio = 0
+        for m in PATRON_SLOT.finditer(texto):
+            desde, hasta = m.span("casilla") if m.group("casilla") else m.span("blanco")
+            self.partes.append(texto[inicio:desde])
+            indice = len(self.blancos)
+            self.blancos.append(texto[desde:hasta])
+            inicio = hasta
+
+            if m.group("campo"):
+                self.campos[CAMPOS[m.group("campo")]] = indice
+            else:
+                etiqueta = PATRON_ETIQUETA.match(texto, hasta).group(1).strip()
+                self.casillas[(self._seccion(texto, desde), etiqueta)] = indice
+                self.por_etiqueta.setdefault(etiqueta, []).append(indice)
+        self.partes.append(texto[inicio:])
+
+        blanco = {"tipo": tipo, "plantilla": texto, "fuente": fuente}
+        self.json = json.dumps({"result": blanco}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.etag = f'"{hashlib.sha256(self.json).hexdigest()[:32]}"'
+
+    @staticmethod
+    def _seccion(texto: str, posicion: int) -> str:
+        """Encabezado ("DIABETES:", "HALLAZGOS:"...) bajo el que está la casilla"""
+        for linea in reversed(texto[:texto.rfind("\n", 0, posicion)].split("\n")):
+            linea = linea.strip()
+            if linea.endswith(":") and not linea.startswith(("-", CASILLA)):
+                return linea[:-1]
+        return ""
+
+    def render(self, valores: Mapping[int, str]) -> str:
+        slots = list(self.blancos)
+        for indice, valor in valores.items():
+            slots[indice] = valor
+        partes = [None] * (len(self.partes) + len(slots))
+        partes[0::2] = self.partes
+        partes[1::2] = slots
+        return "".join(partes)
+
+class TemplateRenderer:
+    """Plantillas HCE precompiladas, en blanco o llenadas con datos del paciente.
+
+    Campos (nombre, edad, DNI, fecha, PAP/VPH...) se escriben en su blanco; las
+    casillas se marcan por etiqueta ("marcar") y, en cenacron, desde el
+    resultado de estratificar() (o desde A1C/PA/LDL/PHQ-9/GAD-7).
+    """
+
+    def __init__(self, plantillas: Mapping[str, str], fuentes: Mapping[str, str], motor: MotorRiesgo):
+        self.motor = motor
+        self.plantillas = {tipo: PlantillaCompilada(tipo, texto, fuentes[tipo]) for tipo, texto in plantillas.items()}
+        self._casillas_riesgo: Dict[tuple, List[int]] = {}
+
+    def compilada(self, tipo: str) -> PlantillaCompilada:
+        plantilla = self.plantillas.get(tipo.lower())
+        if plantilla is None:
+            raise ValueError(f"Tipo '{tipo}' no válido (opciones: {', '.join(self.plantillas)})")
+        return plantilla
+
+    @staticmethod
+    def _texto(campo: str, valor) -> str:
+        if campo == "vph_positivo":
+            return "Positivo" if valor else "Negativo"
+        return str(valor)
+
+    def _riesgo(self, paciente: Mapping) -> Optional[Mapping]:
+        riesgo = paciente.get("riesgo")
+        if riesgo is None and any(paciente.get(v) is not None for v in VARIABLES_RIESGO):
+            riesgo = self.motor.estratificar(**{v: paciente.get(v) for v in VARIABLES_RIESGO})
+        return riesgo
+
+    def _indices_riesgo(self, plantilla: PlantillaCompilada, riesgo: Mapping) -> List[int]:
+        """Casillas del resultado de riesgo (una vez por combinación de evaluación y recomendaciones)"""
+        evaluacion, recomendaciones = riesgo.get("evaluacion", {}), riesgo.get("recomendaciones", [])
+        clave = (plantilla.tipo, tuple(evaluacion.items()), tuple(recomendaciones))
+        indices = self._casillas_riesgo.get(clave)
+        if indices is None:
+            if len(self._casillas_riesgo) >= MAX_COMBINACIONES:
+                self._casillas_riesgo.clear()
+            indices = self._casillas_riesgo[clave] = [
+                plantilla.casillas[casilla]
+                for casilla in self.motor.casillas(evaluacion, recomendaciones)
+                if casilla in plantilla.casillas
+            ]
+        return indices
+
+    def _valores(self, plantilla: PlantillaCompilada, paciente: Mapping) -> Dict[int, str]:
+        valores = {
+            indice: self._texto(campo, paciente[campo])
+            for campo, indice in plantilla.campos.items()
+            if paciente.get(campo) is not None
+        }
+
+        marcadas = []
+        riesgo = self._riesgo(paciente)
+        if riesgo:
+            marcadas.extend(self._indices_riesgo(plantilla, riesgo))
+        for etiqueta in paciente.get("marcar") or []:
+            if etiqueta not in plantilla.por_etiqueta:
+                raise ValueError(f"Casilla '{etiqueta}' no existe en la plantilla {plantilla.tipo}")
+            marcadas.extend(plantilla.por_etiqueta[etiqueta])
+
+        for indice in marcadas:
+            valores[indice] = MARCADA
+        return valores
+
+    def renderizar(self, tipo: str, paciente: Mapping) -> dict:
+        """Plantilla llenada con los datos de un paciente (mismo formato que generar())"""
+        plantilla = self.compilada(tipo)
+        return {
+            "tipo": plantilla.tipo,
+            "plantilla": plantilla.render(self._valores(plantilla, paciente)),
+            "fuente": plantilla.fuente
+        }
+
+    def renderizar_lote(self, tipo: str, pacientes: List[Mapping]) -> List[dict]:
+        """Una plantilla llenada por paciente, en el mismo orden"""
+        plantilla = self.compilada(tipo)
+        return [
+            {
+                "tipo": plantilla.tipo,
+                "plantilla": plantilla.render(self._valores(plantilla, paciente)),
+                "fuente": plantilla.fuente
+            }
+            for paciente in pacientes
+        ]
+
+if __name__ == "__main__":
+    import time
+    from tools.template_tool import GenerateTemplateTool
+
+    print("=" * 80)
+    print("🧪 TEST: PLANTILLAS HCE LLENADAS")
+    print("=" * 80)
+
+    renderer = GenerateTemplateTool().renderer
+    for tipo, plantilla in renderer.plantillas.items():
+        print(f"\n📋 {tipo}: {len(plantilla.blancos)} slots, campos {list(plantilla.campos)}, ETag {plantilla.etag}")
+
+    paciente = {
+        "nombre": "María Pérez", "edad": 58, "dni": "12345678", "fecha": "17/10/2026",
+        "diagnosticos": "DM2, HTA", "a1c": 9.1, "pa_sistolica": 150, "pa_diastolica": 95, "ldl": 90
+    }
+    print("\n" + renderer.renderizar("cenacron", paciente)["plantilla"])
+
+    n = 10_000
+    inicio = time.perf_counter()
+    renderer.renderizar_lote("cenacron", [paciente] * n)
+    print(f"\n⚡ {n} plantillas en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+    print("\n" + "=" * 80)
@@ -1,12 +1,26 @@
-from langchain.tools import StructuredTool
 from pydantic import BaseModel, Field
 from typing import Literal
+import sys
+from pathlib import Path
+
+# Agregar path para imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from rules_engine import cargar_criterios
+from tools.template_renderer import TemplateRenderer
+
+FUENTES = {
+    "sincrona": "PM.2.2.2 Anexo 2",
+    "asincrona": "PM.2.2.2 Anexo 3",
+    "cenacron": "PM.2.1.2 Anexo 10"
+}
 
 class TemplateInput(BaseModel):
     tipo: Literal["sincrona", "asincrona", "cenacron"] = Field(description="Tipo de plantilla")
 
 class GenerateTemplateTool:
     def __init__(self):
+        criterios = cargar_criterios()
         self.plantillas = {
             "sincrona": """📋 PROTOCOLO TELECOLPOSCOPÍA SÍNCRONA - CENATE
 
@@ -90,6 +104,7 @@ Médico evaluador: ________________________
 
 Fuente: PM.2.2.2 Anexo 3""",
 
+            # La estratificación se genera desde los criterios: mismos umbrales que estratificar_riesgo_cronico
             "cenacron": """📋 ATENCIÓN PACIENTES CRÓNICOS - CENACRON
 
 FECHA: ___/___/_____ HORA: _____
@@ -101,36 +116,7 @@ DATOS DEL PACIENTE:
 - Edad: _____ DNI: _______________________
 - Diagnósticos: ___________________________
 
-ESTRATIFICACIÓN DE RIESGO:
-DIABETES:
-☐ A1C <7% (Bajo riesgo)
-☐ A1C 7-8% (Riesgo moderado)
-☐ A1C >8% (Alto riesgo → derivar endocrinología)
-
-HIPERTENSIÓN:
-☐ PA <140/90 (Controlado)
-☐ PA 140-159/90-99 (Riesgo moderado)
-☐ PA ≥160/100 (Alto riesgo → derivar cardiología)
-
-DISLIPIDEMIA:
-☐ LDL <70 (Óptimo)
-☐ LDL 70-100 (Aceptable)
-☐ LDL >100 (Elevado)
-
-SALUD MENTAL:
-☐ PHQ-9 <5 / GAD-7 <5 (Bajo)
-☐ PHQ-9 5-9 / GAD-7 5-9 (Moderado)
-☐ PHQ-9 ≥10 / GAD-7 ≥10 (Alto → derivar psiquiatría)
-
-FRECUENCIA DE MONITOREO:
-☐ Control trimestral (bajo riesgo)
-☐ Control mensual (alto riesgo)
-
-DERIVACIONES NECESARIAS:
-☐ Endocrinología
-☐ Cardiología
-☐ Psiquiatría/Psicología
-☐ Ninguna
+""" + criterios.riesgo.texto_plantilla() + """
 
 PLAN DE ACCIÓN:
 - Ajuste de medicación: ___________________
@@ -143,6 +129,9 @@ Médico tratante: __________________________
 Fuente: PM.2.1.2 Anexo 10"""
         }
 
+        # Compiladas una vez: slots para llenar con datos del paciente y JSON/ETag de la plantilla en blanco
+        self.renderer = TemplateRenderer(self.plantillas, FUENTES, criterios.riesgo)
+
     def generar(self, tipo: str) -> dict:
         """Genera plantilla según tipo"""
         tipo = tipo.lower()
@@ -150,25 +139,25 @@ Fuente: PM.2.1.2 Anexo 10"""
         if tipo not in self.plantillas:
             return {
                 "error": f"Tipo '{tipo}' no válido",
-                "tipos_disponibles": ["sincrona", "asincrona", "cenacron"],
+                "tipos_disponibles": list(self.plantillas),
                 "fuente": "N/A"
             }
 
-        fuente_map = {
-            "sincrona": "PM.2.2.2 Anexo 2",
-            "asincrona": "PM.2.2.2 Anexo 3",
-            "cenacron": "PM.2.1.2 Anexo 10"
-        }
-
         return {
             "tipo": tipo,
             "plantilla": self.plantillas[tipo],
-            "fuente": fuente_map[tipo]
+            "fuente": FUENTES[tipo]
         }
 
+    async def agenerar(self, tipo: str) -> dict:
+        """Versión async para el agente (lógica pura, no bloquea el event loop)"""
+        return self.generar(tipo)
+
     def as_tool(self):
+        from langchain.tools import StructuredTool
         return StructuredTool.from_function(
             func=self.generar,
+            coroutine=self.agenerar,
             name="generar_plantilla_hce",
             description="Genera plantillas de Historia Clínica Electrónica: sincrona (telecolposcopía en tiempo real), asincrona (telecolposcopía diferida), cenacron (pacientes crónicos)",
             args_schema=TemplateInput
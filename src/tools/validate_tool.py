@@ -1,12 +1,15 @@
-from langchain.tools import StructuredTool
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
+import os
 import sys
 from pathlib import Path
 
 # Agregar path para imports
 sys.path.append(str(Path(__file__).parent.parent))
 
+from evidence_index import claves_para, leer_evidencia
+from rules_engine import cargar_criterios
+
 class ValidateInput(BaseModel):
     edad: int = Field(description="Edad del paciente")
     pap_resultado: Optional[str] = Field(default=None, description="Resultado PAP: AGC, ASC-H, LIE-AG, CARCINOMA")
@@ -14,44 +17,63 @@ class ValidateInput(BaseModel):
 
 class ValidateTelecolposcopiaTool:
     def __init__(self):
-        # Criterios base (rápidos, siempre disponibles)
+        # Criterios base (rápidos, siempre disponibles), desde los criterios versionados
+        self.criterios = cargar_criterios().telecolposcopia
         self.criterios_base = {
-            "edad_min": 25,
-            "edad_max": 65,
-            "pap_positivos": ["AGC", "ASC-H", "LIE-AG", "CARCINOMA"],
-            "fuente_base": "PM.2.2.2 - Público Objetivo"
+            "edad_min": self.criterios.edad_min,
+            "edad_max": self.criterios.edad_max,
+            "pap_positivos": self.criterios.pap_positivos,
+            "fuente_base": self.criterios.fuente
         }
 
-        # Intentar cargar vectorstore para verificación
-        self.vectorstore = None
-        self.rag_disponible = False
-        try:
-            from vectorstore import MedicalVectorStore
-            self.vectorstore = MedicalVectorStore()
-            self.vectorstore.load()
-            self.rag_disponible = True
-            print("✅ RAG disponible para verificación")
-        except Exception as e:
-            print(f"⚠️  RAG no disponible: {e}")
+        # Evidencia precalculada en la ingesta (criterio -> chunks de PM.2.2.2): se lee
+        # evidencia.json sin cargar FAISS ni los embeddings
+        self.persist_path = os.getenv("FAISS_INDEX_PATH", "data/faiss_index")
+        self._vectorstore = None
+        self._evidencia = None
+
+    @property
+    def vectorstore(self):
+        """Vector store compartido (solo para índices anteriores sin evidencia.json)"""
+        if self._vectorstore is None:
+            from vectorstore import get_vectorstore
+            self._vectorstore = get_vectorstore(self.persist_path)
+        return self._vectorstore
+
+    @property
+    def evidencia(self) -> dict:
+        """Criterios con su evidencia (se lee una vez, en el primer uso)"""
+        if self._evidencia is None:
+            try:
+                evidencia = leer_evidencia(self.persist_path) or self.vectorstore.evidencia()
+                self._evidencia = evidencia["criterios"]
+            except Exception as e:
+                print(f"⚠️  Índice de evidencia no disponible: {e}")
+                self._evidencia = {}
+        return self._evidencia
+
+    @property
+    def rag_disponible(self) -> bool:
+        return any(self.evidencia.values())
 
     def _validar_con_logica(self, edad: int, pap_resultado: Optional[str], vph_positivo: Optional[bool]) -> dict:
-        """Validación rápida con lógica hardcoded"""
+        """Validación rápida con los criterios compilados"""
         criterios_cumplidos = []
         detalles = []
+        rango = f"{self.criterios.edad_min}-{self.criterios.edad_max}"
 
-        # Validar edad (25-65 años)
-        edad_valida = self.criterios_base["edad_min"] <= edad <= self.criterios_base["edad_max"]
+        # Validar edad
+        edad_valida = self.criterios.edad_valida(edad)
 
         if edad_valida:
-            criterios_cumplidos.append(f"Edad válida: {edad} años (rango 25-65)")
+            criterios_cumplidos.append(f"Edad válida: {edad} años (rango {rango})")
         else:
-            detalles.append(f"Edad fuera de rango: {edad} años (requiere 25-65)")
+            detalles.append(f"Edad fuera de rango: {edad} años (requiere {rango})")
 
         # Validar PAP positivo
         pap_positivo = False
         if pap_resultado:
-            pap_upper = pap_resultado.upper()
-            if pap_upper in self.criterios_base["pap_positivos"]:
+            if self.criterios.pap_positivo(pap_resultado):
                 pap_positivo = True
                 criterios_cumplidos.append(f"PAP positivo: {pap_resultado}")
             else:
@@ -70,77 +92,59 @@ class ValidateTelecolposcopiaTool:
             if not edad_valida:
                 detalles.append("No cumple criterio de edad")
             if not pap_positivo and vph_positivo is not True:
-                detalles.append("Requiere PAP positivo (AGC, ASC-H, LIE-AG, CARCINOMA) O VPH de alto riesgo positivo")
+                detalles.append(f"Requiere PAP positivo ({', '.join(self.criterios.pap_positivos)}) O VPH de alto riesgo positivo")
 
         return {
             "elegible": elegible,
             "criterios_cumplidos": criterios_cumplidos,
             "detalles": " | ".join(detalles) if detalles else "Cumple todos los criterios de elegibilidad",
-            "fuente": self.criterios_base["fuente_base"]
+            "fuente": self.criterios.fuente
         }
 
-    def _verificar_con_rag(self, edad: int, pap_resultado: Optional[str], vph_positivo: Optional[bool]) -> Optional[dict]:
-        """Verificación con RAG del documento fuente"""
-        if not self.rag_disponible:
-            return None
-
-        try:
-            # Construir query contextual
-            query_parts = [f"criterios elegibilidad telecolposcopía edad {edad} años"]
-            if pap_resultado:
-                query_parts.append(f"PAP {pap_resultado}")
-            if vph_positivo is not None:
-                query_parts.append(f"VPH {'positivo' if vph_positivo else 'negativo'}")
-
-            query = " ".join(query_parts)
-
-            # Buscar en vector store
-            resultados = self.vectorstore.search(query, k=2)
-
-            if resultados:
-                # Extraer contexto más relevante
-                contexto = resultados[0][0].page_content
-                score = resultados[0][1]
-
-                return {
-                    "contexto_fuente": contexto[:400],  # Primeros 400 caracteres
-                    "relevancia": f"{score:.2f}",
-                    "verificado_con_rag": True
-                }
-        except Exception as e:
-            print(f"⚠️  Error en verificación RAG: {e}")
-
-        return None
+    def _verificar_con_rag(self, pap_resultado: Optional[str], vph_positivo: Optional[bool]) -> List[dict]:
+        """Evidencia del documento fuente para cada criterio evaluado (lookup, sin embeddings)"""
+        verificacion = []
+        for clave in claves_para(pap_resultado, vph_positivo):
+            evidencias = self.evidencia.get(clave)
+            if evidencias:
+                verificacion.append({"criterio": clave, **evidencias[0]})
+        return verificacion
 
     def validar(self, edad: int, pap_resultado: Optional[str] = None, vph_positivo: Optional[bool] = None) -> dict:
         """
         Validación híbrida:
-        1. Validación rápida con lógica (50ms)
-        2. Verificación con RAG si está disponible (200ms adicionales)
+        1. Validación rápida con lógica
+        2. Evidencia de PM.2.2.2 por criterio, precalculada en la ingesta
         """
 
         # PASO 1: Validación rápida con lógica
         resultado = self._validar_con_logica(edad, pap_resultado, vph_positivo)
 
-        # PASO 2: Verificar con RAG si está disponible
-        if self.rag_disponible:
-            verificacion = self._verificar_con_rag(edad, pap_resultado, vph_positivo)
+        # PASO 2: Adjuntar el texto fuente de cada criterio
+        verificacion = self._verificar_con_rag(pap_resultado, vph_positivo)
 
-            if verificacion:
-                resultado["contexto_pdf"] = verificacion["contexto_fuente"]
-                resultado["fuente"] = f"{self.criterios_base['fuente_base']} (Verificado con RAG - Score: {verificacion['relevancia']})"
-            else:
-                resultado["fuente"] = f"{self.criterios_base['fuente_base']} (Verificación RAG no disponible)"
+        if verificacion:
+            principal = verificacion[0]
+            pagina = f", página {principal['pagina']}" if principal.get("pagina") else ""
+            resultado["contexto_pdf"] = principal["contexto"]
+            resultado["evidencia"] = verificacion
+            resultado["fuente"] = f"{self.criterios.fuente} (Verificado con {principal['fuente']}{pagina})"
         else:
-            resultado["fuente"] = f"{self.criterios_base['fuente_base']} "
+            resultado["fuente"] = f"{self.criterios.fuente} (Verificación RAG no disponible)"
 
         return resultado
 
+    async def avalidar(self, **kwargs) -> dict:
+        """Versión async para el agente"""
+        return self.validar(**kwargs)
+
     def as_tool(self):
+        from langchain.tools import StructuredTool
         return StructuredTool.from_function(
             func=self.validar,
+            coroutine=self.avalidar,
             name="validar_criterios_telecolposcopia",
-            description="Valida elegibilidad para telecolposcopía según PM.2.2.2: edad 25-65 años Y (PAP positivo O VPH+). Usa validación rápida con verificación RAG.",
+            description=f"Valida elegibilidad para telecolposcopía según PM.2.2.2: edad {self.criterios.edad_min}-{self.criterios.edad_max} años Y (PAP positivo O VPH+). Adjunta el texto de PM.2.2.2 que sustenta cada criterio.",
             args_schema=ValidateInput
         )
 
@@ -1,88 +1,594 @@
-from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from typing import List, Dict
+from typing import List, Dict, Tuple, Optional
+import faiss
+import hashlib
+import numpy as np
+import json
 import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import uuid
 from pathlib import Path
 from dotenv import load_dotenv
+from backends import EMBEDDINGS_LEGADO, clave_modelo, config_embeddings, crear_embeddings
+from embedding_cache import CachedEmbeddings, get_embedding_cache
+from embedding_pipeline import EmbeddingPipeline
+from evidence_index import EVIDENCE_FILE, construir_indice, leer_evidencia
+from chunk_store import ChunkStore, Posiciones
+from chunker import ProcedureChunker
+from hybrid_search import BM25Index, CrossEncoderReranker, fusion_rrf
+from telemetry import span
+from index_factory import admite_borrado, config_desde_entorno, configurar_busqueda, descripcion, indice_vacio, tipo_de
+from langchain_community.docstore.in_memory import InMemoryDocstore
 
 load_dotenv()
 
+MANIFEST_FILE = "manifest.json"
+MODOS_BUSQUEDA = ("vector", "hibrido")
+CHUNKERS = ("estructura", "caracteres")
+RRF_K = 60
+
 class MedicalVectorStore:
-    def __init__(self, persist_path: str = "data/faiss_index"):
+    def __init__(
+        self,
+        persist_path: str = "data/faiss_index",
+        lazy: bool = False,
+        mmap: bool = False,
+        config_indice: Optional[Dict] = None,
+        embeddings: Optional[Dict] = None
+    ):
+        """
+        lazy: no carga el índice hasta el primer uso
+        mmap: mapea index.faiss en memoria en solo lectura (las páginas se
+              comparten entre workers vía page cache del SO)
+        config_indice: tipo de índice (flat, ivf, hnsw, ivfpq) y parámetros
+              (nlist, hnsw_m, pq_m, nprobe, ef_search); por defecto FAISS_INDEX_TYPE
+        embeddings: backend y modelo ({"backend", "modelo"}); por defecto
+              EMBEDDING_BACKEND / EMBEDDING_MODEL. Un índice creado con otro
+              modelo no se carga.
+        """
         self.persist_path = persist_path
-        self.embeddings = OpenAIEmbeddings(
-            api_key=os.getenv("OPENAI_API_KEY"),
-            model="text-embedding-3-small"
+        self.mmap = mmap
+        self.config_indice = config_indice or config_desde_entorno()
+        # Chunking por secciones/anexos/tablas del formato PM.x.x.x, o por caracteres (anterior)
+        self.chunker = os.getenv("CHUNKER", "estructura")
+        if self.chunker not in CHUNKERS:
+            raise ValueError(f"CHUNKER inválido: {self.chunker} (opciones: {', '.join(CHUNKERS)})")
+        # Embeddings con caché persistente: consultas repetidas y chunks sin
+        # cambios no vuelven a calcularse
+        self.config_embeddings = embeddings or config_embeddings()
+        self.modelo_embeddings = clave_modelo(self.config_embeddings)
+        self.embedding_cache = get_embedding_cache()
+        self.embeddings = CachedEmbeddings(
+            crear_embeddings(self.config_embeddings),
+            self.embedding_cache,
+            self.modelo_embeddings
         )
-        self.vectorstore = None
+        self.error_carga = None
+        self._vectorstore = None
+        self._cargado = False
+        self._lock = threading.Lock()
+        self.manifest = self._cargar_manifest()
+        self.version = None
+        self._evidencia = None
+
+        # Búsqueda híbrida: BM25 en memoria (se construye en la primera consulta)
+        # fusionado con FAISS por RRF, y reranker local opcional
+        self.modo_busqueda = os.getenv("SEARCH_MODE", "hibrido")
+        self._bm25 = None
+        self._bm25_lock = threading.Lock()
+        modelo_reranker = os.getenv("RERANKER_MODEL")
+        self.reranker = CrossEncoderReranker(modelo_reranker) if modelo_reranker else None
+
+        if not lazy:
+            self._cargar()
+
+    @property
+    def vectorstore(self) -> Optional[FAISS]:
+        """Índice FAISS (se carga de disco en el primer acceso)"""
+        if not self._cargado:
+            self._cargar()
+        return self._vectorstore
 
-        # Intentar cargar índice existente
-        if Path(f"{persist_path}/index.faiss").exists():
-            print("📂 Cargando índice existente...")
+    @vectorstore.setter
+    def vectorstore(self, valor: Optional[FAISS]):
+        self._vectorstore = valor
+        self._cargado = True
+        self._bm25 = None
+        if valor is not None:
+            self.error_carga = None
+
+    def _cargar(self):
+        """Intenta cargar el índice existente (una sola vez, thread-safe)"""
+        with self._lock:
+            if self._cargado:
+                return
             try:
-                self.vectorstore = FAISS.load_local(
-                    persist_path,
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
-                )
-                print("✅ Índice cargado correctamente")
+                if Path(f"{self.persist_path}/index.faiss").exists():
+                    print("📂 Cargando índice existente...")
+                    if not self._embeddings_compatibles():
+                        # Vectores de otro modelo: las búsquedas devolverían resultados sin sentido
+                        self.error_carga = (
+                            f"❌ Índice creado con embeddings {self._embeddings_del_indice()}, "
+                            f"configurados {self.config_embeddings}. Reconstruye el índice "
+                            f"(python src/vectorstore.py --completo) o usa el mismo modelo."
+                        )
+                        print(self.error_carga)
+                        return
+                    try:
+                        self._vectorstore = self._leer_indice()
+                        configurar_busqueda(self._vectorstore.index, self.config_indice)
+                        self.version = self._version_en_disco()
+                        print("✅ Índice cargado correctamente")
+                    except Exception as e:
+                        print(f"⚠️  Error cargando índice: {e}")
+                        self._vectorstore = None
+            finally:
+                self._cargado = True
+
+    def _embeddings_del_indice(self) -> Dict:
+        return self.manifest.get("embeddings") or EMBEDDINGS_LEGADO
+
+    def _embeddings_compatibles(self) -> bool:
+        indice = self._embeddings_del_indice()
+        return (indice.get("backend"), indice.get("modelo")) == (
+            self.config_embeddings["backend"], self.config_embeddings["modelo"]
+        )
+
+    def _leer_indice(self) -> FAISS:
+        path = Path(self.persist_path)
+        if self.mmap:
+            # Vectores mapeados en memoria en lugar de copiados al heap del proceso
+            flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+            index = faiss.read_index(str(path / "index.faiss"), flags)
+        else:
+            index = faiss.read_index(str(path / "index.faiss"))
+
+        if ChunkStore.existe(path):
+            # Chunks mapeados en memoria y leídos por posición, sin deserializar nada al cargar
+            store = ChunkStore(path)
+            return FAISS(self.embeddings, index, store, store.posiciones())
+
+        # Formato anterior: docstore pickle de LangChain (migrar con src/chunk_store.py)
+        print("⚠️  Índice con docstore pickle: ejecuta python src/chunk_store.py para migrarlo")
+        with open(path / "index.pkl", "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        return FAISS(self.embeddings, index, docstore, index_to_docstore_id)
+
+    def _hacer_editable(self):
+        """El índice mapeado y el ChunkStore son de solo lectura: copiarlos a memoria antes de modificarlos"""
+        vectorstore = self.vectorstore
+        if vectorstore is not None:
+            if self.mmap:
+                vectorstore.index = faiss.deserialize_index(faiss.serialize_index(vectorstore.index))
+            if isinstance(vectorstore.docstore, ChunkStore):
+                vectorstore.docstore, vectorstore.index_to_docstore_id = vectorstore.docstore.a_memoria()
+        self.mmap = False
+
+    def _cargar_manifest(self) -> Dict:
+        """Manifest de ingesta: hash y chunk IDs por archivo"""
+        path = Path(self.persist_path) / MANIFEST_FILE
+        if path.exists():
+            try:
+                return json.loads(path.read_text(encoding="utf-8"))
             except Exception as e:
-                print(f"⚠️  Error cargando índice: {e}")
-                self.vectorstore = None
+                print(f"⚠️  Manifest inválido, se ignorará: {e}")
+        return {"archivos": {}}
+
+    def _version_en_disco(self) -> str:
+        """Versión del índice: fecha del manifest o, si no hay, mtime de index.faiss"""
+        if self.manifest.get("actualizado"):
+            return str(self.manifest["actualizado"])
+        return str(Path(f"{self.persist_path}/index.faiss").stat().st_mtime_ns)
+
+    def index_version(self) -> Optional[str]:
+        """Cambia cada vez que se carga o guarda un índice distinto"""
+        return self.version
+
+    def _chunks(self):
+        """(texto, metadata) de todos los chunks del índice"""
+        docstore = self.vectorstore.docstore
+        for doc_id in self.vectorstore.index_to_docstore_id.values():
+            doc = docstore.search(doc_id)
+            if hasattr(doc, "page_content"):
+                yield doc.page_content, doc.metadata
+
+    def evidencia(self) -> Dict:
+        """Índice de evidencia criterio -> chunks de PM.2.2.2 (calculado en la ingesta).
+
+        Índices anteriores sin evidencia.json lo calculan una vez desde el docstore.
+        """
+        if self._evidencia is None:
+            self._evidencia = leer_evidencia(self.persist_path)
+            if self._evidencia is None:
+                if self.vectorstore is None:
+                    return {"criterios": {}}
+                self._evidencia = construir_indice(self._chunks())
+        return self._evidencia
+
+    def _split_document(self, doc: Dict[str, str]) -> Tuple[List[str], List[Dict], List[str]]:
+        """Divide un documento en chunks con metadata e IDs deterministas"""
+        if self.chunker == "estructura":
+            piezas = ProcedureChunker().split(doc['content'])
+        else:
+            text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=1000,
+                chunk_overlap=200,
+                separators=["\n\n", "\n", ". ", " ", ""]
+            )
+            piezas = [(chunk, {}) for chunk in text_splitter.split_text(doc['content'])]
+        print(f"   - {doc['source']}: {len(piezas)} chunks")
+
+        # IDs derivados de archivo + contenido: estables entre ejecuciones
+        metadata = doc.get('metadata', {})
+        firma = f"{metadata.get('filename', doc['source'])}:{metadata.get('sha256') or uuid.uuid4().hex}"
+        prefijo = hashlib.sha256(firma.encode("utf-8")).hexdigest()[:16]
+
+        texts, metadatas, ids = [], [], []
+        for chunk_idx, (chunk, estructura) in enumerate(piezas):
+            texts.append(chunk)
+            metadatas.append({
+                "source": doc['source'],
+                "chunk_id": chunk_idx,
+                **metadata,
+                **estructura
+            })
+            ids.append(f"{prefijo}-{chunk_idx}")
+
+        return texts, metadatas, ids
+
+    @staticmethod
+    def _manifest_entry(doc: Dict[str, str], ids: List[str]) -> Dict:
+        metadata = doc.get('metadata', {})
+        return {
+            "source": doc['source'],
+            "sha256": metadata.get("sha256"),
+            "pages": metadata.get("pages"),
+            "chunk_ids": ids
+        }
+
+    def _registros(self):
+        """(id, documento) en orden de posición FAISS"""
+        ids = self.vectorstore.index_to_docstore_id
+        for posicion in range(self.vectorstore.index.ntotal):
+            doc = self._documento(posicion)
+            yield (doc.id if isinstance(ids, Posiciones) else ids[posicion]), doc
+
+    def _guardar_atomico(self):
+        """Guarda índice + manifest en un directorio temporal y lo intercambia con el actual"""
+        destino = Path(self.persist_path)
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        self.manifest["actualizado"] = time.time()
+
+        tmp = Path(tempfile.mkdtemp(prefix=f".{destino.name}-tmp-", dir=destino.parent))
+        viejo = None
+        try:
+            faiss.write_index(self.vectorstore.index, str(tmp / "index.faiss"))
+            ChunkStore.escribir(tmp, self._registros())
+            (tmp / MANIFEST_FILE).write_text(
+                json.dumps(self.manifest, ensure_ascii=False, indent=2), encoding="utf-8"
+            )
+            evidencia = construir_indice(self._chunks())
+            (tmp / EVIDENCE_FILE).write_text(
+                json.dumps(evidencia, ensure_ascii=False, indent=2), encoding="utf-8"
+            )
+            if destino.exists():
+                viejo = destino.with_name(f".{destino.name}-old-{uuid.uuid4().hex[:8]}")
+                os.replace(destino, viejo)
+            os.replace(tmp, destino)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            if viejo is not None and not destino.exists():
+                os.replace(viejo, destino)
+            raise
+
+        if viejo is not None:
+            shutil.rmtree(viejo, ignore_errors=True)
+        self._evidencia = evidencia
+        self._bm25 = None
+        self.version = str(self.manifest["actualizado"])
+
+    def _embed_chunks(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings de ingesta por lotes (rate limit, reintentos y checkpoints)"""
+        if isinstance(self.embeddings, CachedEmbeddings):
+            pipeline = EmbeddingPipeline.desde_entorno(self.embeddings.embeddings, self.modelo_embeddings, self.embedding_cache)
+        else:
+            pipeline = EmbeddingPipeline.desde_entorno(self.embeddings, self.modelo_embeddings)
+        vectores = pipeline.embed(texts)
+        print(f"   📊 Embeddings: {pipeline.stats}")
+        return vectores
+
+    def _crear_vectorstore(self, texts: List[str], metadatas: List[Dict], ids: List[str]) -> FAISS:
+        """Embeddings + índice del tipo configurado, entrenado con esos mismos vectores"""
+        vectores = self._embed_chunks(texts)
+        matriz = np.asarray(vectores, dtype=np.float32)
+        index = indice_vacio(matriz, self.config_indice)
+        print(f"🧱 Índice FAISS: {descripcion(self.config_indice, matriz.shape[1], len(matriz))}")
+
+        vectorstore = FAISS(self.embeddings, index, InMemoryDocstore(), {})
+        vectorstore.add_embeddings(zip(texts, vectores), metadatas=metadatas, ids=ids)
+        self.manifest["indice"] = {
+            **self.config_indice,
+            "descripcion": descripcion(self.config_indice, matriz.shape[1], len(matriz))
+        }
+        self.manifest["embeddings"] = {**self.config_embeddings, "dim": int(matriz.shape[1])}
+        return vectorstore
 
     def add_documents(self, documents: List[Dict[str, str]]):
-        """Añade documentos al vector store"""
+        """Añade documentos al vector store (reconstrucción completa)"""
         if not documents:
             print("⚠️  No hay documentos para añadir")
             return
 
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
-
         all_texts = []
         all_metadatas = []
+        all_ids = []
+        self.manifest = {"archivos": {}, "chunker": self.chunker}
 
         print("📝 Procesando chunks...")
         for doc in documents:
-            chunks = text_splitter.split_text(doc['content'])
-            print(f"   - {doc['source']}: {len(chunks)} chunks")
+            texts, metadatas, ids = self._split_document(doc)
+            all_texts.extend(texts)
+            all_metadatas.extend(metadatas)
+            all_ids.extend(ids)
 
-            for chunk_idx, chunk in enumerate(chunks):
-                all_texts.append(chunk)
-                all_metadatas.append({
-                    "source": doc['source'],
-                    "chunk_id": chunk_idx,
-                    **doc.get('metadata', {})
-                })
+            filename = doc.get('metadata', {}).get("filename", doc['source'])
+            self.manifest["archivos"][filename] = self._manifest_entry(doc, ids)
 
         print(f"\n🔄 Creando embeddings para {len(all_texts)} chunks...")
 
         # Crear vectorstore
-        self.vectorstore = FAISS.from_texts(
-            texts=all_texts,
-            embedding=self.embeddings,
-            metadatas=all_metadatas
-        )
+        self.vectorstore = self._crear_vectorstore(all_texts, all_metadatas, all_ids)
+        self.mmap = False
 
         # Guardar índice
-        os.makedirs(self.persist_path, exist_ok=True)
-        self.vectorstore.save_local(self.persist_path)
+        self._guardar_atomico()
 
         print(f"✅ Vectorstore creado y guardado en {self.persist_path}")
 
-    def search(self, query: str, n_results: int = 3) -> List[Dict]:
-        """Busca documentos similares"""
+    def sync_documents(self, processor) -> Dict:
+        """Ingesta incremental: solo procesa PDFs nuevos o modificados y
+        elimina los vectores de PDFs borrados (según el manifest)"""
+        actuales = {pdf.name: pdf for pdf in processor.list_pdfs()}
+        hashes = {name: processor.file_hash(path) for name, path in actuales.items()}
+        registrados = dict(self.manifest.get("archivos", {}))
+
+        if self.vectorstore is None and self.error_carga:
+            # Índice de otro modelo de embeddings: no se carga, se reconstruye con el configurado
+            print(f"⚠️  Embeddings {self._embeddings_del_indice()} → {self.config_embeddings}: se reconstruirá completo")
+
+        if self.vectorstore is not None and not registrados:
+            # Índice sin manifest (creado antes de la ingesta incremental): reconstruir
+            print("⚠️  Índice sin manifest: se reconstruirá completo")
+            self.vectorstore = None
+
+        if self.vectorstore is not None and tipo_de(self.vectorstore.index) != self.config_indice["tipo"]:
+            # Cambió el tipo de índice configurado: reentrenar con todos los vectores
+            print(f"⚠️  Índice {tipo_de(self.vectorstore.index)} → {self.config_indice['tipo']}: se reconstruirá completo")
+            self.vectorstore = None
+
+        # Índices sin "chunker" en el manifest se crearon con el splitter por caracteres
+        if self.vectorstore is not None and self.manifest.get("chunker", "caracteres") != self.chunker:
+            print(f"⚠️  Chunker {self.manifest.get('chunker', 'caracteres')} → {self.chunker}: se reconstruirá completo")
+            self.vectorstore = None
+
+        nuevos = [n for n in actuales if n not in registrados or self.vectorstore is None]
+        modificados = [n for n in actuales if n in registrados and n not in nuevos
+                       and registrados[n].get("sha256") != hashes[n]]
+        eliminados = [n for n in registrados if n not in actuales]
+
+        if (modificados or eliminados) and self.vectorstore is not None and not admite_borrado(self.vectorstore.index):
+            print("⚠️  El índice HNSW no admite borrar vectores: se reconstruirá completo")
+            self.vectorstore = None
+            nuevos, modificados = list(actuales), []
+
+        resumen = {
+            "nuevos": nuevos,
+            "modificados": modificados,
+            "eliminados": eliminados,
+            "sin_cambios": len(actuales) - len(nuevos) - len(modificados),
+            "chunks_agregados": 0,
+            "chunks_eliminados": 0
+        }
+
+        if not (nuevos or modificados or eliminados):
+            print("✅ Índice al día, no hay cambios")
+            return resumen
+
+        if self.vectorstore is None:
+            # Sin índice previo no hay vectores que quitar
+            registrados = {}
+
+        self._hacer_editable()
+
+        # 1. Quitar vectores de archivos modificados o eliminados
+        ids_borrar = [i for n in modificados + eliminados for i in registrados.get(n, {}).get("chunk_ids", [])]
+        if ids_borrar:
+            self.vectorstore.delete(ids_borrar)
+            resumen["chunks_eliminados"] = len(ids_borrar)
+        for n in modificados + eliminados:
+            registrados.pop(n, None)
+
+        # 2. Extraer y chunkear solo los archivos nuevos o modificados
+        all_texts, all_metadatas, all_ids = [], [], []
+        for doc in processor.process_pdfs([actuales[n] for n in nuevos + modificados]):
+            name = doc['metadata']['filename']
+            texts, metadatas, ids = self._split_document(doc)
+            all_texts.extend(texts)
+            all_metadatas.extend(metadatas)
+            all_ids.extend(ids)
+            registrados[name] = self._manifest_entry(doc, ids)
+
+        # 3. Embeddings solo para los chunks nuevos
+        if all_texts:
+            print(f"\n🔄 Creando embeddings para {len(all_texts)} chunks...")
+            if self.vectorstore is None:
+                self.vectorstore = self._crear_vectorstore(all_texts, all_metadatas, all_ids)
+            else:
+                vectores = self._embed_chunks(all_texts)
+                self.vectorstore.add_embeddings(zip(all_texts, vectores), metadatas=all_metadatas, ids=all_ids)
+            resumen["chunks_agregados"] = len(all_texts)
+
+        self.manifest["archivos"] = registrados
+        self.manifest["chunker"] = self.chunker
+        if self.vectorstore is not None:
+            self._guardar_atomico()
+            print(f"✅ Índice actualizado en {self.persist_path}")
+
+        return resumen
+
+    def _modo(self, modo: Optional[str]) -> str:
+        modo = modo or self.modo_busqueda
+        if modo not in MODOS_BUSQUEDA:
+            raise ValueError(f"❌ Modo de búsqueda inválido: {modo}. Opciones: {', '.join(MODOS_BUSQUEDA)}")
+        return modo
+
+    def search(self, query: str, n_results: int = 3, modo: Optional[str] = None) -> List[Dict]:
+        """Busca documentos similares (modo "vector" o "hibrido")"""
         if not self.vectorstore:
-            raise ValueError("❌ Vectorstore no inicializado. Ejecuta add_documents() primero.")
+            raise ValueError(self.error_carga or "❌ Vectorstore no inicializado. Ejecuta add_documents() primero.")
 
-        docs_and_scores = self.vectorstore.similarity_search_with_score(
-            query, k=n_results
-        )
+        modo = self._modo(modo)
+        with span("vectorstore.search", modo=modo, k=n_results):
+            with span("embeddings.query"):
+                vector = self.embeddings.embed_query(query)
+
+            if modo == "hibrido":
+                return self._buscar_hibrido(query, vector, n_results)
+
+            with span("faiss.search", k=n_results):
+                docs_and_scores = self.vectorstore.similarity_search_with_score_by_vector(
+                    vector, k=n_results
+                )
+
+            return self._formatear_resultados(docs_and_scores)
+
+    async def asearch(self, query: str, n_results: int = 3, modo: Optional[str] = None) -> List[Dict]:
+        """Versión async de search (embedding de la consulta sin bloquear el event loop)"""
+        if not self.vectorstore:
+            raise ValueError(self.error_carga or "❌ Vectorstore no inicializado. Ejecuta add_documents() primero.")
+
+        modo = self._modo(modo)
+        with span("vectorstore.search", modo=modo, k=n_results):
+            with span("embeddings.query"):
+                vector = await self.embeddings.aembed_query(query)
+
+            if modo == "hibrido":
+                return self._buscar_hibrido(query, vector, n_results)
+
+            with span("faiss.search", k=n_results):
+                docs_and_scores = await self.vectorstore.asimilarity_search_with_score_by_vector(
+                    vector, k=n_results
+                )
+
+            return self._formatear_resultados(docs_and_scores)
+
+    def search_many(self, queries: List[str], n_results: int = 3, modo: Optional[str] = None) -> List[List[Dict]]:
+        """Varias consultas a la vez: un solo lote de embeddings y una sola búsqueda FAISS.
+
+        Retorna una lista de resultados por consulta, en el mismo orden y con el
+        mismo formato que search().
+        """
+        if not self.vectorstore:
+            raise ValueError(self.error_carga or "❌ Vectorstore no inicializado. Ejecuta add_documents() primero.")
+
+        modo = self._modo(modo)
+        if not queries:
+            return []
+
+        candidatos = self._candidatos(n_results) if modo == "hibrido" else n_results
+        with span("vectorstore.search_many", modo=modo, k=n_results, consultas=len(queries)):
+            with span("embeddings.query", consultas=len(queries)):
+                matriz = np.asarray(self.embeddings.embed_queries(queries), dtype=np.float32)
+
+            with span("faiss.search", k=candidatos, consultas=len(queries)):
+                distancias, posiciones = self.vectorstore.index.search(matriz, candidatos)
+
+            if modo == "hibrido":
+                return [
+                    self._fusionar(query, d, p, n_results)
+                    for query, d, p in zip(queries, distancias, posiciones)
+                ]
+
+            return [
+                self._formatear_resultados(
+                    (self._documento(int(posicion)), float(distancia))
+                    for posicion, distancia in zip(p, d) if posicion != -1
+                )
+                for d, p in zip(distancias, posiciones)
+            ]
+
+    def _documento(self, posicion: int):
+        return self.vectorstore.docstore.search(self.vectorstore.index_to_docstore_id[posicion])
+
+    def _indice_bm25(self) -> BM25Index:
+        """Índice BM25 sobre los mismos chunks que FAISS (clave = posición en FAISS)"""
+        with self._bm25_lock:
+            if self._bm25 is None:
+                self._bm25 = BM25Index(
+                    (posicion, self._documento(posicion).page_content)
+                    for posicion in self.vectorstore.index_to_docstore_id
+                )
+            return self._bm25
 
+    @staticmethod
+    def _candidatos(n_results: int) -> int:
+        """Candidatos por ranking antes de fusionar FAISS y BM25"""
+        return max(n_results * 4, 20)
+
+    def _buscar_hibrido(self, query: str, vector: List[float], n_results: int) -> List[Dict]:
+        """FAISS + BM25 fusionados con reciprocal rank fusion (y reranker si está configurado)"""
+        candidatos = self._candidatos(n_results)
+
+        with span("faiss.search", k=candidatos):
+            distancias, posiciones = self.vectorstore.index.search(
+                np.asarray([vector], dtype=np.float32), candidatos
+            )
+        return self._fusionar(query, distancias[0], posiciones[0], n_results)
+
+    def _fusionar(self, query: str, distancias: np.ndarray, posiciones: np.ndarray, n_results: int) -> List[Dict]:
+        """Fusiona una fila de resultados FAISS con BM25 para la misma consulta"""
+        candidatos = len(posiciones)
+        vectoriales = {int(p): float(d) for p, d in zip(posiciones, distancias) if p != -1}
+        with span("bm25.search", k=candidatos):
+            lexicos = dict(self._indice_bm25().buscar(query, candidatos))
+        fusion = fusion_rrf([list(vectoriales), list(lexicos)], k=RRF_K)
+
+        if self.reranker is not None:
+            finalistas = fusion[:max(n_results * 3, 10)]
+            rrf = dict(finalistas)
+            with span("rerank", candidatos=len(finalistas)):
+                orden = self.reranker.reordenar(
+                    query,
+                    [(posicion, self._documento(posicion).page_content) for posicion, _ in finalistas],
+                    n_results
+                )
+            fusion = [(posicion, rrf[posicion]) for posicion, _ in orden]
+
+        # Score normalizado: 1.0 = primer lugar en ambos rankings
+        maximo = 2 / (RRF_K + 1)
+        results = []
+        for posicion, score in fusion[:n_results]:
+            doc = self._documento(posicion)
+            results.append({
+                "content": doc.page_content,
+                "metadata": doc.metadata,
+                "score": score / maximo,
+                "scores": {
+                    "vector": float(1 / (1 + vectoriales[posicion])) if posicion in vectoriales else None,
+                    "bm25": lexicos.get(posicion),
+                    "rrf": score
+                }
+            })
+
+        return results
+
+    @staticmethod
+    def _formatear_resultados(docs_and_scores) -> List[Dict]:
         results = []
         for doc, score in docs_and_scores:
             results.append({
@@ -93,28 +599,85 @@ class MedicalVectorStore:
 
         return results
 
+    def cache_stats(self) -> dict:
+        """Contadores de la caché de embeddings"""
+        return self.embedding_cache.stats()
+
+_stores: Dict[str, MedicalVectorStore] = {}
+_stores_lock = threading.Lock()
+
+def get_vectorstore(persist_path: Optional[str] = None) -> MedicalVectorStore:
+    """Vector store compartido por proceso (una instancia por índice).
+
+    El índice se carga en el primer uso y se mapea en memoria, así que las
+    tools comparten una sola copia y los workers de uvicorn comparten páginas.
+    """
+    path = persist_path or os.getenv("FAISS_INDEX_PATH", "data/faiss_index")
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = MedicalVectorStore(
+                path,
+                lazy=True,
+                mmap=os.getenv("FAISS_MMAP", "1") != "0"
+            )
+        return _stores[path]
+
 # Script de ingesta
 if __name__ == "__main__":
+    import argparse
     from data_processor import PDFProcessor
+    from index_factory import TIPOS_INDICE
+    from backends import EMBEDDING_BACKENDS, MODELOS_EMBEDDINGS
+
+    parser = argparse.ArgumentParser(description="Ingesta de procedimientos CENATE en FAISS")
+    parser.add_argument("--completo", action="store_true",
+                        help="Reconstruir el índice completo en lugar de la ingesta incremental")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Procesos para extraer PDFs en paralelo (0 = uno por CPU)")
+    parser.add_argument("--indice", choices=TIPOS_INDICE, default=None,
+                        help="Tipo de índice FAISS (por defecto FAISS_INDEX_TYPE o flat)")
+    parser.add_argument("--embeddings", choices=EMBEDDING_BACKENDS, default=None,
+                        help="Backend de embeddings (por defecto EMBEDDING_BACKEND u openai)")
+    parser.add_argument("--modo", choices=MODOS_BUSQUEDA, default=None,
+                        help="Modo de búsqueda para las consultas de prueba")
+    args = parser.parse_args()
 
     print("="*80)
     print("🚀 INICIANDO PROCESAMIENTO DE DOCUMENTOS")
     print("="*80)
 
-    # 1. Procesar PDFs
-    processor = PDFProcessor()
-    documents = processor.process_all_pdfs()
-
-    if not documents:
+    processor = PDFProcessor(workers=args.workers)
+    if not processor.list_pdfs():
         print("\n❌ ERROR: Copia tus PDFs a la carpeta data/raw/")
         exit(1)
 
-    # 2. Crear vector store
-    print("\n" + "="*80)
-    print("🔄 CREANDO VECTOR STORE")
-    print("="*80)
-    vectorstore = MedicalVectorStore()
-    vectorstore.add_documents(documents)
+    config_indice = config_desde_entorno()
+    if args.indice:
+        config_indice["tipo"] = args.indice
+    embeddings = None
+    if args.embeddings:
+        embeddings = {"backend": args.embeddings, "modelo": MODELOS_EMBEDDINGS[args.embeddings]}
+    vectorstore = MedicalVectorStore(config_indice=config_indice, embeddings=embeddings)
+    print(f"🧮 Embeddings: {vectorstore.config_embeddings}")
+
+    if args.completo:
+        # 1. Procesar PDFs
+        documents = processor.process_all_pdfs()
+
+        # 2. Crear vector store
+        print("\n" + "="*80)
+        print("🔄 CREANDO VECTOR STORE")
+        print("="*80)
+        vectorstore.add_documents(documents)
+    else:
+        # 1-2. Procesar solo PDFs nuevos/modificados y actualizar el índice
+        print("\n" + "="*80)
+        print("🔄 ACTUALIZANDO VECTOR STORE (INCREMENTAL)")
+        print("="*80)
+        resumen = vectorstore.sync_documents(processor)
+        print(f"\n📊 Nuevos: {len(resumen['nuevos'])} | Modificados: {len(resumen['modificados'])} | "
+              f"Eliminados: {len(resumen['eliminados'])} | Sin cambios: {resumen['sin_cambios']}")
+        print(f"   Chunks agregados: {resumen['chunks_agregados']} | eliminados: {resumen['chunks_eliminados']}")
 
     # 3. Test de búsqueda
     print("\n" + "="*80)
@@ -124,12 +687,14 @@ if __name__ == "__main__":
     test_queries = [
         "¿Cómo atender pacientes crónicos con diabetes?",
         "¿Qué es una telecolposcopía síncrona?",
-        "¿Quiénes son los responsables del procedimiento?"
+        "¿Quiénes son los responsables del procedimiento?",
+        "PM.2.1.2 Anexo 10",
+        "LIE-AG"
     ]
 
     for i, query in enumerate(test_queries, 1):
         print(f"\n--- Test {i}: {query} ---")
-        results = vectorstore.search(query, n_results=2)
+        results = vectorstore.search(query, n_results=2, modo=args.modo)
 
         for j, result in enumerate(results, 1):
             print(f"\n📄 Resultado {j}:")
@@ -137,6 +702,10 @@ if __name__ == "__main__":
             print(f"   Score: {result['score']:.3f}")
             print(f"   Contenido: {result['content'][:150]}...")
 
+    print(f"\n📊 Caché de embeddings: {vectorstore.cache_stats()}")
+    criterios = vectorstore.evidencia()["criterios"]
+    print(f"🧾 Evidencia PM.2.2.2: {sum(bool(v) for v in criterios.values())}/{len(criterios)} criterios con fuente")
+
     print("\n" + "="*80)
     print("✅ PROCESO COMPLETADO")
     print("="*80)